@@ -0,0 +1,215 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from metrics import record_cache
+
+try:
+    import redis.asyncio as redis_asyncio
+    from redis.exceptions import WatchError
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+CACHE_URL = os.getenv("CACHE_URL", "")  # redis://host:6379/0 shares entries between workers; empty keeps them in-process
+CACHE_PREFIX = os.getenv("CACHE_PREFIX", "opticgov")
+CACHE_LOCAL_SIZE = int(os.getenv("CACHE_LOCAL_SIZE", "4096"))
+CACHE_LOCK_TTL = float(os.getenv("CACHE_LOCK_TTL", "30"))  # a loader that dies holding the lock delays others at most this long
+CACHE_LOCK_POLL = float(os.getenv("CACHE_LOCK_POLL", "0.05"))
+
+
+class LocalCache:
+    """Thread-safe in-process LRU with per-entry expiry; locks only exclude callers in this process"""
+
+    name = "local"
+
+    def __init__(self, max_entries: int = CACHE_LOCAL_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._locks = {}  # key -> (expires_at, token)
+        self._lock = threading.Lock()
+
+    async def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    async def set(self, key: str, value, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    async def acquire(self, key: str, ttl: float):
+        now = time.monotonic()
+        with self._lock:
+            held = self._locks.get(key)
+            if held is not None and held[0] > now:
+                return None
+            token = uuid.uuid4().hex
+            self._locks[key] = (now + ttl, token)
+            return token
+
+    async def release(self, key: str, token: str):
+        with self._lock:
+            held = self._locks.get(key)
+            if held is not None and held[1] == token:
+                del self._locks[key]
+
+    async def close(self):
+        pass
+
+
+class RedisCache:
+    """
+    Entries in Redis (or anything speaking its protocol), JSON-encoded, so every
+    worker and host sees the same values. Locks are SET NX PX keys released only
+    by their holder.
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str = None, client=None):
+        if client is None:
+            if not REDIS_AVAILABLE:
+                raise RuntimeError("CACHE_URL is set but the redis package is not installed")
+            client = redis_asyncio.from_url(url)
+        self.client = client
+
+    async def get(self, key: str):
+        raw = await self.client.get(key)
+        return None if raw is None else json.loads(raw)
+
+    async def set(self, key: str, value, ttl: float):
+        await self.client.set(key, json.dumps(value, separators=(",", ":")), px=max(1, int(ttl * 1000)))
+
+    async def delete(self, key: str):
+        await self.client.delete(key)
+
+    async def acquire(self, key: str, ttl: float):
+        token = uuid.uuid4().hex
+        if await self.client.set(key, token, nx=True, px=max(1, int(ttl * 1000))):
+            return token
+        return None
+
+    async def release(self, key: str, token: str):
+        # Compare-and-delete, so a lock that expired and was taken by another worker is left alone
+        async with self.client.pipeline() as pipe:
+            try:
+                await pipe.watch(key)
+                held = await pipe.get(key)
+                if held is not None and held.decode() == token:
+                    pipe.multi()
+                    pipe.delete(key)
+                    await pipe.execute()
+            except WatchError:
+                pass
+
+    async def close(self):
+        await self.client.aclose()
+
+
+def create_backend(url: str = CACHE_URL):
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisCache(url)
+    return LocalCache()
+
+
+class Cache:
+    """
+    One namespace of the shared cache backend.
+
+    get_or_set() is stampede-protected at two levels: concurrent callers in this
+    process share one load (single-flight), and across processes only the
+    holder of the key's backend lock runs the loader while the others poll for
+    its result. If the holder dies, its lock expires after lock_ttl and the next
+    caller loads. Values must be JSON-serializable and not None (None is a miss).
+    A backend outage degrades to calling the loader directly.
+    """
+
+    def __init__(self, backend, namespace: str):
+        self.backend = backend
+        self.namespace = namespace
+        self._inflight = {}
+
+    def _key(self, key: str) -> str:
+        return f"{CACHE_PREFIX}:{self.namespace}:{key}"
+
+    async def _safe(self, operation, default=None):
+        try:
+            return await operation
+        except Exception as e:
+            record_cache(self.namespace, "error")
+            logger.warning("Cache backend %s failed (%s): %s", self.backend.name, self.namespace, e)
+            return default
+
+    async def get(self, key: str):
+        return await self._safe(self.backend.get(self._key(key)))
+
+    async def set(self, key: str, value, ttl: float):
+        await self._safe(self.backend.set(self._key(key), value, ttl))
+
+    async def delete(self, key: str):
+        await self._safe(self.backend.delete(self._key(key)))
+
+    async def get_or_set(self, key: str, loader, ttl: float, lock_ttl: float = CACHE_LOCK_TTL):
+        """Cached value for key, or the result of `await loader()` stored for ttl seconds"""
+        value = await self.get(key)
+        if value is not None:
+            record_cache(self.namespace, "hit")
+            return value
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(self._load(key, loader, ttl, lock_ttl))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _load(self, key: str, loader, ttl: float, lock_ttl: float):
+        full_key, lock_key = self._key(key), self._key(key) + ":lock"
+        while True:
+            token = await self._safe(self.backend.acquire(lock_key, lock_ttl), default="unlocked")
+            if token is not None:
+                try:
+                    # Another worker may have stored it between our miss and taking the lock
+                    value = await self._safe(self.backend.get(full_key))
+                    if value is not None:
+                        record_cache(self.namespace, "hit")
+                        return value
+                    record_cache(self.namespace, "miss")
+                    value = await loader()
+                    await self._safe(self.backend.set(full_key, value, ttl))
+                    return value
+                finally:
+                    if token != "unlocked":
+                        await self._safe(self.backend.release(lock_key, token))
+            await asyncio.sleep(CACHE_LOCK_POLL)
+            value = await self._safe(self.backend.get(full_key))
+            if value is not None:
+                record_cache(self.namespace, "waited")
+                return value
+
+
+shared_cache = create_backend()
+
+
+def cache_namespace(namespace: str) -> Cache:
+    return Cache(shared_cache, namespace)
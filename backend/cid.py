@@ -0,0 +1,153 @@
+"""
+Streaming IPFS CIDv1 computation.
+
+Produces the same root CID as `ipfs add --cid-version=1 --raw-leaves` with the
+default size-262144 chunker and balanced layout: 256 KiB raw leaves, dag-pb
+UnixFS File nodes of up to 174 links, sha2-256 everywhere. Bytes are hashed as
+they arrive; only the current partial chunk and one pending link list per tree
+level are ever held in memory, and that state can be saved and restored so a
+resumable upload keeps hashing across requests.
+"""
+import base64
+import hashlib
+
+CHUNK_SIZE = 256 * 1024
+MAX_LINKS = 174
+
+CID_VERSION = 1
+CODEC_RAW = 0x55
+CODEC_DAG_PB = 0x70
+MULTIHASH_SHA2_256 = 0x12
+UNIXFS_FILE = 2
+
+
+def varint(n: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def pb_bytes(field: int, value: bytes) -> bytes:
+    return varint(field << 3 | 2) + varint(len(value)) + value
+
+
+def pb_varint(field: int, value: int) -> bytes:
+    return varint(field << 3) + varint(value)
+
+
+def make_cid(codec: int, block: bytes) -> bytes:
+    digest = hashlib.sha256(block).digest()
+    return varint(CID_VERSION) + varint(codec) + bytes([MULTIHASH_SHA2_256, len(digest)]) + digest
+
+
+def cid_to_str(cid: bytes) -> str:
+    """Multibase base32 (lowercase, unpadded), the CIDv1 default: 'bafy...' / 'bafk...'"""
+    return "b" + base64.b32encode(cid).decode().lower().rstrip("=")
+
+
+class CidBuilder:
+    """
+    Feed bytes with update(), call finish() for the root CID string.
+
+    Each pending link is (cid_bytes, tsize, filesize): tsize is the cumulative
+    encoded size of the linked subtree (dag-pb Tsize), filesize the file bytes
+    under it (UnixFS blocksizes).
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._levels = [[]]
+        self.size = 0
+
+    def update(self, data: bytes):
+        self.size += len(data)
+        view = memoryview(data)
+        while view:
+            take = min(CHUNK_SIZE - len(self._buffer), len(view))
+            self._buffer += view[:take]
+            view = view[take:]
+            if len(self._buffer) == CHUNK_SIZE:
+                self._emit_leaf()
+
+    def _emit_leaf(self):
+        leaf = bytes(self._buffer)
+        self._buffer.clear()
+        self._push(0, (make_cid(CODEC_RAW, leaf), len(leaf), len(leaf)))
+
+    def _push(self, level: int, link):
+        if level == len(self._levels):
+            self._levels.append([])
+        self._levels[level].append(link)
+        if len(self._levels[level]) == MAX_LINKS:
+            links = self._levels[level]
+            self._levels[level] = []
+            self._push(level + 1, self._make_node(links))
+
+    @staticmethod
+    def _make_node(links):
+        filesize = sum(link[2] for link in links)
+        unixfs = pb_varint(1, UNIXFS_FILE) + pb_varint(3, filesize)
+        for link in links:
+            unixfs += pb_varint(4, link[2])
+        # Canonical dag-pb: Links (field 2) before Data (field 1); go-ipfs writes an empty Name
+        node = b"".join(
+            pb_bytes(2, pb_bytes(1, cid) + pb_bytes(2, b"") + pb_varint(3, tsize))
+            for cid, tsize, _ in links
+        ) + pb_bytes(1, unixfs)
+        return make_cid(CODEC_DAG_PB, node), len(node) + sum(link[1] for link in links), filesize
+
+    def finish(self) -> str:
+        if self._buffer or self.size == 0:
+            self._emit_leaf()
+        # A single leaf is its own root
+        if len(self._levels) == 1 and len(self._levels[0]) == 1:
+            return cid_to_str(self._levels[0][0][0])
+        level = 0
+        while True:
+            pending = self._levels[level]
+            is_top = level == len(self._levels) - 1
+            if is_top and len(pending) == 1 and level > 0:
+                return cid_to_str(pending[0][0])
+            if pending:
+                self._levels[level] = []
+                self._push(level + 1, self._make_node(pending))
+            level += 1
+
+    def state(self) -> dict:
+        """JSON-safe snapshot of everything except the partial chunk, which the caller re-feeds"""
+        return {
+            "size": self.size - len(self._buffer),
+            "levels": [[[cid.hex(), tsize, filesize] for cid, tsize, filesize in level] for level in self._levels],
+        }
+
+    @classmethod
+    def restore(cls, state: dict, partial_chunk: bytes = b""):
+        """Rebuild from state(); `partial_chunk` is the bytes after the last full chunk"""
+        builder = cls()
+        builder.size = state["size"]
+        builder._levels = [
+            [(bytes.fromhex(cid), tsize, filesize) for cid, tsize, filesize in level]
+            for level in state["levels"]
+        ]
+        builder.update(partial_chunk)
+        return builder
+
+
+class CidReader:
+    """File-like wrapper that feeds a CidBuilder with every byte read through it"""
+
+    def __init__(self, fileobj, builder: CidBuilder):
+        self.fileobj = fileobj
+        self.builder = builder
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.fileobj.read(size)
+        if data:
+            self.builder.update(data)
+        return data
@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+
+from metrics import observe_stage, record_outcome
+
+logger = logging.getLogger(__name__)
+
+EVIDENCE_ANCHOR_BATCH_SIZE = int(os.getenv("EVIDENCE_ANCHOR_BATCH_SIZE", "10"))
+EVIDENCE_ANCHOR_INTERVAL = float(os.getenv("EVIDENCE_ANCHOR_INTERVAL", "15"))  # max wait before a partial batch goes out
+EVIDENCE_ANCHOR_RECEIPT_TIMEOUT = int(os.getenv("EVIDENCE_ANCHOR_RECEIPT_TIMEOUT", "180"))
+
+
+class EvidenceAnchor:
+    """
+    Queues evidence CIDs for OpticGov.submitEvidence and sends them in batches.
+
+    The contract takes one (project, milestone, hash) per call and has no multicall,
+    so a batch amortizes the round trips rather than the gas: one nonce and gas
+    price lookup, every transaction signed and broadcast back to back with
+    consecutive nonces, then all receipts awaited together.
+
+    submitEvidence only accepts the project's contractor as sender. Each item is
+    simulated from the oracle first and skipped when it would revert; the CID is
+    still returned to the client so the contractor's wallet can submit it.
+    """
+
+    def __init__(self, w3, contract, private_key: str, chain_id: int = 5003, tx_lock=None):
+        self.w3 = w3
+        self.contract = contract
+        self.private_key = private_key
+        self.address = w3.eth.account.from_key(private_key).address
+        self.chain_id = chain_id
+        self.tx_lock = tx_lock or threading.Lock()  # shared with every other sender of oracle transactions
+        self._queue = asyncio.Queue()
+        self._task = None
+
+    def enqueue(self, project_on_chain_id: int, milestone_index: int, cid: str):
+        """milestone_index is 0-based, as on-chain"""
+        self._queue.put_nowait((int(project_on_chain_id), int(milestone_index), cid))
+
+    def _needs_submission(self, item) -> bool:
+        """Blocking simulation: False when the hash is already on-chain or the oracle may not submit it"""
+        p_id, m_idx, cid = item
+        try:
+            if self.contract.functions.getMilestone(p_id, m_idx).call()[4] == cid:
+                record_outcome("anchor", "already_anchored")
+                return False
+            self.contract.functions.submitEvidence(p_id, m_idx, cid).call({"from": self.address})
+            return True
+        except Exception as e:
+            logger.info("Evidence %s for project %s milestone %s left for the contractor to submit: %s", cid, p_id, m_idx, e)
+            record_outcome("anchor", "contractor_must_submit")
+            return False
+
+    def _broadcast(self, items):
+        """
+        Blocking: sign and send the whole batch under the oracle transaction lock,
+        so no other oracle transaction (e.g. a payout) can take a nonce in between.
+        """
+        with self.tx_lock:
+            return self._broadcast_locked(items)
+
+    def _broadcast_locked(self, items):
+        nonce = self.w3.eth.get_transaction_count(self.address, "pending")
+        gas_price = int(self.w3.eth.gas_price * 1.5)  # same L2 buffer as payouts
+        sent = []
+        for p_id, m_idx, cid in items:
+            call = self.contract.functions.submitEvidence(p_id, m_idx, cid)
+            try:
+                gas = int(call.estimate_gas({"from": self.address, "nonce": nonce}) * 1.5)
+                tx = call.build_transaction({
+                    "from": self.address,
+                    "nonce": nonce,
+                    "gas": gas,
+                    "gasPrice": gas_price,
+                    "chainId": self.chain_id,
+                })
+                signed = self.w3.eth.account.sign_transaction(tx, self.private_key)
+                sent.append(((p_id, m_idx, cid), self.w3.eth.send_raw_transaction(signed.raw_transaction)))
+                nonce += 1
+            except Exception as e:
+                logger.error("Could not submit evidence %s for project %s milestone %s: %s", cid, p_id, m_idx, e)
+                record_outcome("anchor", "rejected")
+        return sent
+
+    def _wait_receipt(self, item, tx_hash):
+        try:
+            receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash, timeout=EVIDENCE_ANCHOR_RECEIPT_TIMEOUT)
+        except Exception as e:
+            logger.error("No receipt for evidence tx %s: %s", tx_hash.hex(), e)
+            record_outcome("anchor", "receipt_timeout")
+            return
+        if receipt.status == 1:
+            logger.info("Evidence %s anchored for project %s milestone %s in block %s", item[2], item[0], item[1], receipt.blockNumber)
+            record_outcome("anchor", "confirmed")
+        else:
+            logger.error("Evidence tx %s reverted", tx_hash.hex())
+            record_outcome("anchor", "reverted")
+
+    async def _flush(self, items):
+        started = time.perf_counter()
+        checks = await asyncio.gather(*(asyncio.to_thread(self._needs_submission, item) for item in items))
+        items = [item for item, needed in zip(items, checks) if needed]
+        observe_stage("anchor", "simulate", started)
+        if not items:
+            return
+
+        started = time.perf_counter()
+        sent = await asyncio.to_thread(self._broadcast, items)
+        observe_stage("anchor", "broadcast", started)
+        logger.info("Broadcast %s evidence anchor transaction(s)", len(sent))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(asyncio.to_thread(self._wait_receipt, item, tx_hash) for item, tx_hash in sent))
+        observe_stage("anchor", "receipt", started)
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.monotonic() + EVIDENCE_ANCHOR_INTERVAL
+            while len(batch) < EVIDENCE_ANCHOR_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            # The same milestone may be queued twice; only its latest hash matters
+            latest = {(p_id, m_idx): cid for p_id, m_idx, cid in batch}
+            try:
+                await self._flush([(p_id, m_idx, cid) for (p_id, m_idx), cid in latest.items()])
+            except Exception as e:
+                logger.exception("Evidence anchoring batch failed: %s", e)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+from database import SessionLocal, EvidenceFile
+from storage import storage, LocalStorage
+
+logger = logging.getLogger(__name__)
+
+EVIDENCE_QUOTA_BYTES = int(os.getenv("EVIDENCE_QUOTA_BYTES", str(20 * 1024 ** 3)))  # hot disk budget
+EVIDENCE_QUOTA_TARGET = float(os.getenv("EVIDENCE_QUOTA_TARGET", "0.9"))  # evict down to 90% of quota
+EVIDENCE_HOT_TTL_DAYS = float(os.getenv("EVIDENCE_HOT_TTL_DAYS", "14"))  # idle evictable files go cold
+EVIDENCE_UNREFERENCED_GRACE_HOURS = float(os.getenv("EVIDENCE_UNREFERENCED_GRACE_HOURS", "24"))
+EVIDENCE_DELETE_AFTER_DAYS = float(os.getenv("EVIDENCE_DELETE_AFTER_DAYS", "30"))  # cold + unreferenced
+EVIDENCE_COLD_COMPRESS = os.getenv("EVIDENCE_COLD_COMPRESS", "false").lower() == "true"
+EVIDENCE_SWEEP_INTERVAL = int(os.getenv("EVIDENCE_SWEEP_INTERVAL", "600"))
+
+EVICTABLE_STATUSES = ("verified", "rejected")
+
+
+class EvidenceManager:
+    """
+    Tracks every stored evidence file (size, last access, verification status) in
+    `evidence_files` and keeps the hot upload directory under EVIDENCE_QUOTA_BYTES.
+
+    The sweeper moves least-recently-used evidence to cold storage when it is
+    already verified/rejected, or unreferenced past a grace period. Evidence
+    pending verification is never moved. Cold files that were never linked to a
+    milestone are deleted after EVIDENCE_DELETE_AFTER_DAYS; linked ones are kept.
+
+    Reads only record a timestamp in memory; the sweeper flushes them in bulk so
+    serving a Range request never costs a DB write.
+    """
+
+    def __init__(self):
+        self._touched = {}
+        self._task = None
+        self._adopted = False
+
+    @property
+    def enabled(self) -> bool:
+        # S3-compatible buckets manage their own lifecycle rules
+        return isinstance(storage, LocalStorage)
+
+    def touch(self, key: str):
+        # Only the local sweeper flushes touches; in S3 mode they would pile up forever
+        if self.enabled:
+            self._touched[key] = time.time()
+
+    def register(self, key: str, size: int, cid: str = None):
+        db = SessionLocal()
+        try:
+            db.add(EvidenceFile(key=key, size_bytes=size, cid=cid))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning("Could not register evidence %s: %s", key, e)
+        finally:
+            db.close()
+
+    def link(self, key: str, project_id: int, milestone_index: int, status: str):
+        """Tie evidence to the milestone it was submitted for and record the verdict"""
+        db = SessionLocal()
+        try:
+            evidence = db.query(EvidenceFile).filter(EvidenceFile.key == key).first()
+            if evidence is None:
+                return
+            evidence.project_id = project_id
+            evidence.milestone_index = milestone_index
+            evidence.status = status
+            evidence.last_accessed_at = datetime.utcnow()
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning("Could not link evidence %s: %s", key, e)
+        finally:
+            db.close()
+
+    def cid_for(self, key: str):
+        db = SessionLocal()
+        try:
+            row = db.query(EvidenceFile.cid).filter(EvidenceFile.key == key).first()
+            return row.cid if row else None
+        finally:
+            db.close()
+
+    def _flush_touches(self, db):
+        touched, self._touched = self._touched, {}
+        for key, accessed in touched.items():
+            tier = "hot" if os.path.exists(storage.path(key)) else "cold"
+            db.query(EvidenceFile).filter(EvidenceFile.key == key).update(
+                {"last_accessed_at": datetime.utcfromtimestamp(accessed), "tier": tier},
+                synchronize_session=False
+            )
+        db.commit()
+
+    def _adopt_untracked(self, db):
+        """Register files uploaded before tracking existed, using their mtime as last access"""
+        known = {k for (k,) in db.query(EvidenceFile.key)}
+        for entry in os.scandir(storage.directory):
+            if entry.is_file() and entry.name not in known and not entry.name.startswith("."):
+                stat = entry.stat()
+                db.add(EvidenceFile(
+                    key=entry.name,
+                    size_bytes=stat.st_size,
+                    last_accessed_at=datetime.utcfromtimestamp(stat.st_mtime),
+                    created_at=datetime.utcfromtimestamp(stat.st_mtime),
+                ))
+        db.commit()
+        self._adopted = True
+
+    def _evict(self, db, evidence: EvidenceFile) -> int:
+        try:
+            freed = storage.to_cold(evidence.key, EVIDENCE_COLD_COMPRESS)
+        except FileNotFoundError:
+            freed = 0
+        evidence.tier = "cold"
+        db.commit()
+        return freed
+
+    def sweep(self) -> dict:
+        """One pass of the lifecycle policy. Blocking; run it in a worker thread."""
+        now = datetime.utcnow()
+        grace_cutoff = now - timedelta(hours=EVIDENCE_UNREFERENCED_GRACE_HOURS)
+        evictable = (
+            EvidenceFile.status.in_(EVICTABLE_STATUSES)
+            | ((EvidenceFile.status == "unreferenced") & (EvidenceFile.created_at < grace_cutoff))
+        )
+        stats = {"expired": 0, "evicted": 0, "deleted": 0, "freed_bytes": 0}
+
+        db = SessionLocal()
+        try:
+            if not self._adopted:
+                self._adopt_untracked(db)
+            self._flush_touches(db)
+            hot = db.query(EvidenceFile).filter(EvidenceFile.tier == "hot")
+
+            # 1. TTL: idle evictable evidence goes cold regardless of disk pressure
+            idle_cutoff = now - timedelta(days=EVIDENCE_HOT_TTL_DAYS)
+            for evidence in hot.filter(evictable, EvidenceFile.last_accessed_at < idle_cutoff).all():
+                stats["freed_bytes"] += self._evict(db, evidence)
+                stats["expired"] += 1
+
+            # 2. Quota: least recently used first until under the target
+            used = db.query(func.coalesce(func.sum(EvidenceFile.size_bytes), 0)).filter(
+                EvidenceFile.tier == "hot"
+            ).scalar()
+            if used > EVIDENCE_QUOTA_BYTES:
+                target = EVIDENCE_QUOTA_BYTES * EVIDENCE_QUOTA_TARGET
+                candidates = hot.filter(evictable).order_by(EvidenceFile.last_accessed_at).all()
+                for evidence in candidates:
+                    if used <= target:
+                        break
+                    self._evict(db, evidence)
+                    used -= evidence.size_bytes or 0
+                    stats["freed_bytes"] += evidence.size_bytes or 0
+                    stats["evicted"] += 1
+                if used > target:
+                    logger.warning(
+                        "Evidence storage still over target after eviction: %.1f MB used (pending verifications are kept)",
+                        used / 1024 / 1024
+                    )
+
+            # 3. Delete cold evidence that never became part of a verification
+            delete_cutoff = now - timedelta(days=EVIDENCE_DELETE_AFTER_DAYS)
+            stale = db.query(EvidenceFile).filter(
+                EvidenceFile.tier == "cold",
+                EvidenceFile.status == "unreferenced",
+                EvidenceFile.last_accessed_at < delete_cutoff,
+            ).all()
+            for evidence in stale:
+                for path in (storage.cold_path(evidence.key), storage.cold_path(evidence.key, True)):
+                    if os.path.exists(path):
+                        os.remove(path)
+                db.delete(evidence)
+                stats["deleted"] += 1
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        return stats
+
+    async def _run(self):
+        while True:
+            try:
+                stats = await asyncio.to_thread(self.sweep)
+                if any(stats.values()):
+                    logger.info("Evidence sweep: %s", stats)
+            except Exception as e:
+                logger.exception("Evidence sweep failed: %s", e)
+            await asyncio.sleep(EVIDENCE_SWEEP_INTERVAL)
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+evidence_manager = EvidenceManager()
@@ -0,0 +1,233 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import google.generativeai as genai
+
+from database import SessionLocal, GeminiFile
+from metrics import observe_stage, record_outcome
+from progress import progress_bus
+
+logger = logging.getLogger(__name__)
+
+GEMINI_FILE_TTL_HOURS = float(os.getenv("GEMINI_FILE_TTL_HOURS", "48"))  # used when the API omits expiration_time
+GEMINI_FILE_REUSE_MARGIN = float(os.getenv("GEMINI_FILE_REUSE_MARGIN", "600"))  # never reuse a file this close to expiry
+GEMINI_FILE_IDLE_HOURS = float(os.getenv("GEMINI_FILE_IDLE_HOURS", "12"))  # unused files are deleted early to free quota
+GEMINI_PROCESSING_TIMEOUT = float(os.getenv("GEMINI_PROCESSING_TIMEOUT", "60"))
+GEMINI_FILE_SWEEP_INTERVAL = int(os.getenv("GEMINI_FILE_SWEEP_INTERVAL", "900"))
+PROCESSING_POLL_INTERVAL = 3
+
+
+def _utc_naive(value: datetime) -> datetime:
+    """Columns hold naive UTC (datetime.utcnow)"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class GeminiFileRegistry:
+    """
+    Maps video content hashes to files already uploaded to Gemini, persisted in
+    `gemini_files` so every worker and restart shares them.
+
+    A retry or re-verification of the same evidence reuses the remote file (one
+    metadata call to confirm it still exists) instead of paying the upload and
+    PROCESSING wait again. Gemini deletes uploads 48h after creation; rows are
+    dropped before that, and files nobody used for GEMINI_FILE_IDLE_HOURS are
+    deleted early by the sweeper so they don't count against the project quota.
+    """
+
+    def __init__(self):
+        self._locks = {}
+        self._task = None
+
+    def _lookup(self, sha256: str):
+        db = SessionLocal()
+        try:
+            row = db.query(GeminiFile).filter(GeminiFile.sha256 == sha256).first()
+            if row is None:
+                return None
+            if row.expires_at and row.expires_at - datetime.utcnow() < timedelta(seconds=GEMINI_FILE_REUSE_MARGIN):
+                db.delete(row)
+                db.commit()
+                return None
+            return row.name
+        finally:
+            db.close()
+
+    def _record(self, sha256: str, video_file, size_bytes: int):
+        expires = getattr(video_file, "expiration_time", None)
+        expires_at = _utc_naive(expires) if expires else datetime.utcnow() + timedelta(hours=GEMINI_FILE_TTL_HOURS)
+        db = SessionLocal()
+        try:
+            row = db.query(GeminiFile).filter(GeminiFile.sha256 == sha256).first()
+            if row is None:
+                row = GeminiFile(sha256=sha256, uses=0)
+                db.add(row)
+            row.name = video_file.name
+            row.uri = getattr(video_file, "uri", None)
+            row.mime_type = getattr(video_file, "mime_type", None)
+            row.size_bytes = size_bytes
+            row.uses = (row.uses or 0) + 1
+            row.created_at = datetime.utcnow()
+            row.expires_at = expires_at
+            row.last_used_at = row.created_at
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning("Could not record Gemini file %s: %s", video_file.name, e)
+        finally:
+            db.close()
+
+    def _mark_used(self, sha256: str):
+        db = SessionLocal()
+        try:
+            db.query(GeminiFile).filter(GeminiFile.sha256 == sha256).update(
+                {"uses": GeminiFile.uses + 1, "last_used_at": datetime.utcnow()},
+                synchronize_session=False
+            )
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning("Could not update Gemini file usage: %s", e)
+        finally:
+            db.close()
+
+    def _forget(self, sha256: str):
+        db = SessionLocal()
+        try:
+            db.query(GeminiFile).filter(GeminiFile.sha256 == sha256).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    async def _wait_active(self, video_file):
+        waited = 0.0
+        while video_file.state.name == "PROCESSING":
+            if waited >= GEMINI_PROCESSING_TIMEOUT:
+                raise Exception(f"Video processing timeout ({GEMINI_PROCESSING_TIMEOUT:.0f}s)")
+            await asyncio.sleep(PROCESSING_POLL_INTERVAL)
+            waited += PROCESSING_POLL_INTERVAL
+            video_file = await asyncio.to_thread(genai.get_file, video_file.name)
+            logger.debug("Gemini file status: %s (%ss)", video_file.state.name, waited)
+            progress_bus.publish("gemini_processing", file=video_file.name, waited_s=waited)
+        if video_file.state.name == "FAILED":
+            raise Exception(f"Gemini video processing failed: {video_file.state}")
+        return video_file
+
+    async def _reuse(self, sha256: str):
+        """The registered remote file if it still exists and is usable, else None"""
+        try:
+            name = await asyncio.to_thread(self._lookup, sha256)
+        except Exception as e:
+            logger.warning("Gemini file lookup failed: %s", e)
+            return None
+        if name is None:
+            return None
+        try:
+            video_file = await asyncio.to_thread(genai.get_file, name)
+            video_file = await self._wait_active(video_file)
+        except Exception as e:
+            # Deleted remotely, expired early or failed processing: upload afresh
+            logger.info("Registered Gemini file %s is unusable, re-uploading: %s", name, e)
+            await asyncio.to_thread(self._forget, sha256)
+            return None
+        await asyncio.to_thread(self._mark_used, sha256)
+        return video_file
+
+    async def get_or_upload(self, path: str, sha256: str, display_name: str, pipeline: str = "verification"):
+        """Returns (active Gemini file, reused). Concurrent calls for the same content share one upload."""
+        lock = self._locks.setdefault(sha256, asyncio.Lock())
+        try:
+            async with lock:
+                video_file = await self._reuse(sha256)
+                if video_file is not None:
+                    logger.info("Reusing Gemini file %s for %s", video_file.name, sha256[:12])
+                    record_outcome("gemini_file", "reused")
+                    return video_file, True
+
+                progress_bus.publish("gemini_uploading")
+                stage_started = time.perf_counter()
+                try:
+                    video_file = await asyncio.to_thread(genai.upload_file, path=path, display_name=display_name)
+                except Exception as upload_error:
+                    logger.error("Gemini upload failed: %s", upload_error)
+                    raise Exception(f"Failed to upload video to AI: {str(upload_error)}")
+                observe_stage(pipeline, "gemini_upload", stage_started)
+                logger.info("Uploaded to Gemini: %s", video_file.name)
+                progress_bus.publish("gemini_uploaded", file=video_file.name)
+
+                stage_started = time.perf_counter()
+                try:
+                    video_file = await self._wait_active(video_file)
+                except Exception:
+                    await asyncio.to_thread(self._delete_remote, video_file.name)
+                    raise
+                observe_stage(pipeline, "gemini_processing", stage_started)
+
+                await asyncio.to_thread(self._record, sha256, video_file, os.path.getsize(path))
+                record_outcome("gemini_file", "uploaded")
+                return video_file, False
+        finally:
+            if not lock.locked() and self._locks.get(sha256) is lock:
+                del self._locks[sha256]
+
+    @staticmethod
+    def _delete_remote(name: str):
+        try:
+            genai.delete_file(name)
+        except Exception as e:
+            logger.debug("Could not delete Gemini file %s: %s", name, e)
+
+    def sweep(self) -> dict:
+        """Blocking: drop expired rows and delete remote files that sat idle"""
+        now = datetime.utcnow()
+        stats = {"expired": 0, "idle_deleted": 0}
+        db = SessionLocal()
+        try:
+            stats["expired"] = db.query(GeminiFile).filter(
+                GeminiFile.expires_at < now + timedelta(seconds=GEMINI_FILE_REUSE_MARGIN)
+            ).delete(synchronize_session=False)
+            db.commit()
+
+            idle = db.query(GeminiFile.sha256, GeminiFile.name).filter(
+                GeminiFile.last_used_at < now - timedelta(hours=GEMINI_FILE_IDLE_HOURS)
+            ).all()
+            for sha256, name in idle:
+                if sha256 in self._locks:
+                    continue  # a verification is using it right now
+                self._delete_remote(name)
+                db.query(GeminiFile).filter(GeminiFile.sha256 == sha256).delete(synchronize_session=False)
+                db.commit()
+                stats["idle_deleted"] += 1
+        finally:
+            db.close()
+        return stats
+
+    async def _run(self):
+        while True:
+            try:
+                stats = await asyncio.to_thread(self.sweep)
+                if any(stats.values()):
+                    logger.info("Gemini file sweep: %s", stats)
+            except Exception as e:
+                logger.exception("Gemini file sweep failed: %s", e)
+            await asyncio.sleep(GEMINI_FILE_SWEEP_INTERVAL)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+gemini_files = GeminiFileRegistry()
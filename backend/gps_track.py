@@ -0,0 +1,240 @@
+"""
+GPS tracks embedded in evidence videos, and how much of a track lies inside a
+project's geofence.
+
+Sources, best first:
+  - GoPro GPMF telemetry ('gpmd' stream): GPS5 (or GPS9 on newer cameras) at
+    ~18 Hz, with fix and precision per one-second payload;
+  - QuickTime timed metadata ('mebx' stream) carrying ISO 6709 location
+    samples, as written by phones that record location continuously;
+  - a single static location tag (ISO 6709 or lat/lon keys) in the container.
+"""
+import json
+import logging
+import os
+import re
+import subprocess
+
+import numpy as np
+
+from spatial_index import haversine_km, DEFAULT_TOLERANCE_KM
+
+logger = logging.getLogger(__name__)
+
+GPS_MIN_ON_SITE = float(os.getenv("GPS_MIN_ON_SITE", "0.8"))  # share of recording time that must be on site
+GPS_MAX_GAP = float(os.getenv("GPS_MAX_GAP", "5"))  # a fix stands for at most this many seconds
+GPS_MAX_DOP = float(os.getenv("GPS_MAX_DOP", "5"))  # GoPro payloads with worse precision are dropped
+
+# "+06.5244+003.3792+012.000/" (QuickTime/Android location tags)
+ISO6709_RE = re.compile(r"([+-]\d+(?:\.\d+)?)([+-]\d+(?:\.\d+)?)")
+ISO6709_TAGS = ("com.apple.quicktime.location.ISO6709", "location", "location-eng")
+
+GPMF_DTYPES = {
+    "b": "i1", "B": "u1", "s": ">i2", "S": ">u2", "l": ">i4", "L": ">u4",
+    "f": ">f4", "d": ">f8", "j": ">i8", "J": ">u8",
+}
+
+
+class GpsTrack:
+    def __init__(self, t, lat, lon, source: str):
+        self.t = np.asarray(t, dtype=np.float64)  # seconds from the start of the video
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.source = source
+
+    def __len__(self):
+        return len(self.t)
+
+
+def location_from_tags(tags: dict):
+    """Single (lat, lon) from container tags, or (None, None)"""
+    for key in ISO6709_TAGS:
+        match = ISO6709_RE.match(tags.get(key, ""))
+        if match:
+            return float(match.group(1)), float(match.group(2))
+    lat = tags.get("location-lat", tags.get("GPS_LATITUDE"))
+    lon = tags.get("location-lon", tags.get("GPS_LONGITUDE"))
+    if lat is None or lon is None:
+        return None, None
+    return float(lat), float(lon)
+
+
+def probe(video_path: str) -> dict:
+    result = subprocess.run(
+        ["ffprobe", "-v", "quiet", "-print_format", "json", "-show_format", "-show_streams", video_path],
+        capture_output=True, text=True, timeout=30
+    )
+    return json.loads(result.stdout or "{}")
+
+
+def extract_video_location(video_path: str):
+    try:
+        return location_from_tags(probe(video_path).get("format", {}).get("tags", {}))
+    except Exception:
+        return None, None
+
+
+def read_packets(video_path: str, stream_index: int):
+    """[(pts_seconds, duration_seconds, payload)] for one data stream, copied out by ffmpeg"""
+    listing = subprocess.run(
+        ["ffprobe", "-v", "quiet", "-select_streams", str(stream_index), "-print_format", "json",
+         "-show_entries", "packet=pts_time,duration_time,size", video_path],
+        capture_output=True, text=True, timeout=60
+    )
+    packets = json.loads(listing.stdout or "{}").get("packets", [])
+    raw = subprocess.run(
+        ["ffmpeg", "-v", "error", "-copy_unknown", "-i", video_path, "-map", f"0:{stream_index}",
+         "-c", "copy", "-f", "data", "-"],
+        capture_output=True, timeout=120
+    )
+    if raw.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {raw.stderr.decode(errors='replace')[:200]}")
+    data = raw.stdout
+    out, offset = [], 0
+    for i, packet in enumerate(packets):
+        size = int(packet.get("size", 0))
+        pts = float(packet.get("pts_time", 0) or 0)
+        duration = packet.get("duration_time")
+        if duration is None and i + 1 < len(packets):
+            duration = float(packets[i + 1].get("pts_time", pts) or pts) - pts
+        out.append((pts, float(duration or 1.0), data[offset:offset + size]))
+        offset += size
+    return out
+
+
+def _klv(buf: bytes, start: int, end: int):
+    """GPMF key-length-value entries: (key, type, struct size, repeat, data offset)"""
+    pos = start
+    while pos + 8 <= end:
+        key = buf[pos:pos + 4]
+        type_char, size = chr(buf[pos + 4]), buf[pos + 5]
+        repeat = int.from_bytes(buf[pos + 6:pos + 8], "big")
+        yield key, type_char, size, repeat, pos + 8
+        pos += 8 + ((size * repeat + 3) & ~3)
+
+
+def _values(buf: bytes, type_char: str, size: int, repeat: int, start: int):
+    dtype = np.dtype(GPMF_DTYPES[type_char])
+    return np.frombuffer(buf, dtype, size * repeat // dtype.itemsize, start).astype(np.float64)
+
+
+def parse_gpmf_payload(buf: bytes):
+    """(lat, lon) arrays of usable fixes in one GPMF payload"""
+    lats, lons = [], []
+    for key, type_char, size, repeat, start in _klv(buf, 0, len(buf)):
+        if key != b"DEVC" or type_char != "\0":
+            continue
+        for s_key, s_type, s_size, s_repeat, s_start in _klv(buf, start, start + size * repeat):
+            if s_key != b"STRM" or s_type != "\0":
+                continue
+            scale, struct_type, fix, dop = None, None, 3, 0.0
+            for f_key, f_type, f_size, f_repeat, f_start in _klv(buf, s_start, s_start + s_size * s_repeat):
+                if f_key == b"SCAL":
+                    scale = _values(buf, f_type, f_size, f_repeat, f_start)
+                elif f_key == b"TYPE":
+                    struct_type = buf[f_start:f_start + f_size * f_repeat].decode("ascii", "ignore").rstrip("\0")
+                elif f_key == b"GPSF":
+                    fix = int(_values(buf, f_type, f_size, f_repeat, f_start)[0])
+                elif f_key == b"GPSP":
+                    dop = _values(buf, f_type, f_size, f_repeat, f_start)[0] / 100
+                elif f_key == b"GPS5" and f_type == "l":
+                    rows = _values(buf, f_type, f_size, f_repeat, f_start).reshape(f_repeat, -1)
+                    if fix >= 2 and dop <= GPS_MAX_DOP and scale is not None:
+                        rows = rows / scale
+                        lats.append(rows[:, 0])
+                        lons.append(rows[:, 1])
+                elif f_key == b"GPS9" and f_type == "?" and struct_type:
+                    dtype = np.dtype([(f"f{i}", GPMF_DTYPES[c]) for i, c in enumerate(struct_type)])
+                    if dtype.itemsize != f_size or scale is None:
+                        continue
+                    records = np.frombuffer(buf, dtype, f_repeat, f_start)
+                    scale = np.broadcast_to(scale, (len(struct_type),))
+                    good = np.ones(f_repeat, dtype=bool)
+                    if len(struct_type) > 8:  # GPS9: ..., DOP, fix
+                        good = (records["f8"] >= 2) & (records["f7"] / scale[7] <= GPS_MAX_DOP)
+                    lats.append(records["f0"][good] / scale[0])
+                    lons.append(records["f1"][good] / scale[1])
+    if not lats:
+        return np.empty(0), np.empty(0)
+    return np.concatenate(lats), np.concatenate(lons)
+
+
+def parse_mebx_payload(buf: bytes):
+    """ISO 6709 values in one QuickTime metadata sample: [size][local key id][value] items"""
+    lats, lons, pos = [], [], 0
+    while pos + 8 <= len(buf):
+        size = int.from_bytes(buf[pos:pos + 4], "big")
+        if size < 8:
+            break
+        match = ISO6709_RE.match(buf[pos + 8:pos + size].decode("ascii", "ignore"))
+        if match:
+            lats.append(float(match.group(1)))
+            lons.append(float(match.group(2)))
+        pos += size
+    return np.array(lats), np.array(lons)
+
+
+def _track_from_packets(packets, parse, source: str):
+    ts, lats, lons = [], [], []
+    for pts, duration, payload in packets:
+        lat, lon = parse(payload)
+        if len(lat):
+            # Samples are spread evenly over the packet's duration
+            ts.append(pts + np.arange(len(lat)) * (duration / len(lat)))
+            lats.append(lat)
+            lons.append(lon)
+    if not ts:
+        return None
+    return GpsTrack(np.concatenate(ts), np.concatenate(lats), np.concatenate(lons), source)
+
+
+def extract_gps_track(video_path: str):
+    """Blocking: the richest GPS track in the video, or None"""
+    info = probe(video_path)
+    for stream in info.get("streams", []):
+        tag = stream.get("codec_tag_string")
+        parse = {"gpmd": parse_gpmf_payload, "mebx": parse_mebx_payload}.get(tag)
+        if parse is None:
+            continue
+        try:
+            track = _track_from_packets(read_packets(video_path, stream["index"]), parse, tag)
+        except Exception as e:
+            logger.warning("Could not read %s track: %s", tag, e)
+            continue
+        if track is not None:
+            return track
+    lat, lon = location_from_tags(info.get("format", {}).get("tags", {}))
+    if lat is None:
+        return None
+    return GpsTrack([0.0], [lat], [lon], "tag")
+
+
+def validate_track(track: GpsTrack, project_lat: float, project_lon: float, tolerance_km) -> dict:
+    """
+    Time-weighted share of the recording spent inside the geofence, and how far
+    the track strays. Each fix stands until the next one (capped at GPS_MAX_GAP
+    seconds), so dense and sparse stretches of a track count by time, not samples.
+    """
+    tolerance = tolerance_km or DEFAULT_TOLERANCE_KM
+    distances = haversine_km(project_lat, project_lon, track.lat, track.lon)
+    if len(track) > 1:
+        gaps = np.diff(track.t)
+        weights = np.clip(np.append(gaps, np.median(gaps)), 0, GPS_MAX_GAP)
+    else:
+        weights = np.ones(1)
+    on_site = distances <= tolerance
+    total = weights.sum()
+    fraction = float(weights[on_site].sum() / total) if total > 0 else float(on_site.mean())
+    centre = int(np.argpartition(distances, len(distances) // 2)[len(distances) // 2])
+    return {
+        "source": track.source,
+        "points": len(track),
+        "duration_s": round(float(track.t[-1] - track.t[0]), 1),
+        "latitude": float(track.lat[centre]),
+        "longitude": float(track.lon[centre]),
+        "distance_km": round(float(distances[centre]), 3),  # median distance
+        "max_deviation_km": round(float(distances.max()), 3),
+        "on_site_fraction": round(fraction, 3),
+        "tolerance_km": tolerance,
+        "within": fraction >= GPS_MIN_ON_SITE,
+    }
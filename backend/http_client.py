@@ -0,0 +1,93 @@
+import asyncio
+import hashlib
+import os
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+
+import httpx
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+HTTP_PER_HOST_LIMIT = int(os.getenv("HTTP_PER_HOST_LIMIT", "10"))
+DOWNLOAD_CHUNK_SIZE = int(os.getenv("DOWNLOAD_CHUNK_SIZE", str(1024 * 1024)))  # 1 MiB
+
+
+class HttpClient:
+    """
+    One pooled httpx.AsyncClient for all outbound calls, opened and closed by the
+    app lifespan. httpx only caps connections globally, so per-host concurrency
+    is bounded with a semaphore per host.
+    """
+
+    def __init__(self):
+        self._client = None
+        self._host_slots = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            raise RuntimeError("HTTP client not started; it is opened in the app lifespan")
+        return self._client
+
+    async def start(self):
+        if self._client is not None:
+            return
+        self._client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(10.0, connect=5.0),
+            follow_redirects=True,
+        )
+
+    async def stop(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @asynccontextmanager
+    async def _host_slot(self, url: str):
+        host = urlsplit(url).netloc
+        slot = self._host_slots.get(host)
+        if slot is None:
+            slot = self._host_slots[host] = asyncio.Semaphore(HTTP_PER_HOST_LIMIT)
+        async with slot:
+            yield
+
+    async def get_json(self, url: str, timeout: float = 5):
+        """GET and decode JSON. Returns (status_code, body); body is None for non-200 responses."""
+        async with self._host_slot(url):
+            response = await self.client.get(url, timeout=timeout)
+        if response.status_code != 200:
+            return response.status_code, None
+        return response.status_code, response.json()
+
+    async def download(self, url: str, dest_path: str, timeout: float = 60):
+        """
+        Stream `url` to `dest_path` in large chunks, hashing as the bytes arrive.
+        Disk writes run in a worker thread. Returns (size_bytes, sha256_hex).
+        """
+        digest = hashlib.sha256()
+        size = 0
+        async with self._host_slot(url):
+            async with self.client.stream("GET", url, timeout=timeout) as response:
+                response.raise_for_status()
+                with open(dest_path, "wb", buffering=DOWNLOAD_CHUNK_SIZE) as f:
+                    async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                        digest.update(chunk)
+                        await asyncio.to_thread(f.write, chunk)
+                        size += len(chunk)
+        return size, digest.hexdigest()
+
+
+http_client = HttpClient()
@@ -1,6 +1,23 @@
+"""
+Inspect the Optic-Gov database without loading it into memory.
+
+Rows are read through a server-side cursor (stream_results + yield_per) and
+written as they arrive, so CSV/JSON-lines output runs in constant memory on any
+table size. Table output renders one page of --batch-size rows at a time.
+
+    python list_db.py                                   # all tables, grid output
+    python list_db.py milestones --project-id 4 --status pending
+    python list_db.py projects --since 2025-01-01 --format csv > projects.csv
+    python list_db.py milestones --format jsonl --limit 1000
+"""
+import argparse
+import csv
+import json
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import sys
+from datetime import datetime
+
+from sqlalchemy import create_engine, select
 from tabulate import tabulate
 from dotenv import load_dotenv
 
@@ -9,50 +26,178 @@ from database import Contractor, Project, Milestone
 
 load_dotenv()
 
-def list_database_contents():
-    # 1. Setup Connection
-    DATABASE_URL = os.getenv("DATABASE_URL")
-    engine = create_engine(DATABASE_URL)
-    Session = sessionmaker(bind=engine)
-    session = Session()
-
-    print("\n" + "="*80)
-    print("📊 OPTIC-GOV DATABASE OVERVIEW")
-    print("="*80)
-
-    # 2. List Contractors
-    contractors = session.query(Contractor).all()
-    contractor_data = [[c.id, c.company_name, c.wallet_address[:10]+"..."+c.wallet_address[-6:], c.email] for c in contractors]
-    print("\n👷 CONTRACTORS")
-    print(tabulate(contractor_data, headers=["ID", "Company Name", "Wallet", "Email"], tablefmt="grid"))
-
-    # 3. List Projects
-    projects = session.query(Project).all()
-    project_data = []
-    for p in projects:
-        # Format MNT budget
-        budget = f"{p.total_budget:.8f} MNT" if p.total_budget else "0.00 MNT"
-        on_chain = p.on_chain_id if p.on_chain_id else "❌ NONE"
-        project_data.append([p.id, p.name, budget, p.contractor_id, on_chain])
-    
-    print("\n🏗️  PROJECTS")
-    print(tabulate(project_data, headers=["ID", "Project Name", "Budget", "Contr. ID", "On-Chain ID"], tablefmt="grid"))
-
-    # 4. List Milestones
-    milestones = session.query(Milestone).all()
-    milestone_data = []
-    for m in milestones:
-        status_icon = "✅" if m.status == "verified" else "⏳"
-        milestone_data.append([m.id, m.project_id, m.order_index, m.description[:30]+"...", f"{m.amount:.8f} MNT", f"{status_icon} {m.status}"])
-    
-    print("\n🎯 MILESTONES")
-    print(tabulate(milestone_data, headers=["ID", "Proj ID", "Idx", "Description", "Amount", "Status"], tablefmt="grid"))
-
-    print("\n" + "="*80)
-    session.close()
+TABLES = {
+    "contractors": {
+        "title": "👷 CONTRACTORS",
+        "model": Contractor,
+        "columns": ["id", "company_name", "wallet_address", "email", "is_active", "created_at"],
+        "headers": ["ID", "Company Name", "Wallet", "Email"],
+        "row": lambda r: [r.id, r.company_name, short_wallet(r.wallet_address), r.email],
+    },
+    "projects": {
+        "title": "🏗️  PROJECTS",
+        "model": Project,
+        "columns": ["id", "name", "total_budget", "contractor_id", "on_chain_id", "gov_wallet", "created_at"],
+        "headers": ["ID", "Project Name", "Budget", "Contr. ID", "On-Chain ID"],
+        "row": lambda r: [
+            r.id, r.name,
+            f"{r.total_budget:.8f} MNT" if r.total_budget else "0.00 MNT",
+            r.contractor_id,
+            r.on_chain_id if r.on_chain_id else "❌ NONE",
+        ],
+    },
+    "milestones": {
+        "title": "🎯 MILESTONES",
+        "model": Milestone,
+        "columns": ["id", "project_id", "order_index", "description", "amount", "status", "created_at"],
+        "headers": ["ID", "Proj ID", "Idx", "Description", "Amount", "Status"],
+        "row": lambda r: [
+            r.id, r.project_id, r.order_index,
+            (r.description or "")[:30] + "...",
+            f"{(r.amount or 0):.8f} MNT",
+            f"{'✅' if r.status == 'verified' else '⏳'} {r.status}",
+        ],
+    },
+}
+
+
+def short_wallet(wallet):
+    return wallet[:10] + "..." + wallet[-6:] if wallet else ""
+
+
+def build_query(name: str, args):
+    spec = TABLES[name]
+    model = spec["model"]
+    query = select(*(getattr(model, c) for c in spec["columns"]))
+
+    if args.project_id is not None:
+        if model is Project:
+            query = query.where(Project.id == args.project_id)
+        elif model is Milestone:
+            query = query.where(Milestone.project_id == args.project_id)
+    if args.contractor_id is not None:
+        if model is Contractor:
+            query = query.where(Contractor.id == args.contractor_id)
+        elif model is Project:
+            query = query.where(Project.contractor_id == args.contractor_id)
+    if args.status and model is Milestone:
+        query = query.where(Milestone.status == args.status)
+    if args.since:
+        query = query.where(model.created_at >= args.since)
+    if args.until:
+        query = query.where(model.created_at < args.until)
+
+    query = query.order_by(model.id)
+    if args.limit:
+        query = query.limit(args.limit)
+    return query
+
+
+def stream_rows(conn, query, batch_size: int):
+    # Server-side cursor: Postgres hands rows over batch_size at a time
+    result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(query)
+    for partition in result.partitions():
+        yield from partition
+
+
+def json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def write_table(name, rows, out, batch_size):
+    spec = TABLES[name]
+    print(f"\n{spec['title']}", file=out)
+    page = []
+    count = 0
+    for row in rows:
+        page.append(spec["row"](row))
+        count += 1
+        if len(page) >= batch_size:
+            print(tabulate(page, headers=spec["headers"], tablefmt="grid"), file=out)
+            page = []
+    if page or not count:
+        print(tabulate(page, headers=spec["headers"], tablefmt="grid"), file=out)
+    return count
+
+
+def write_csv(name, rows, out, first):
+    writer = csv.writer(out)
+    if not first:
+        out.write("\n")
+    writer.writerow(TABLES[name]["columns"])
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def write_jsonl(name, rows, out):
+    count = 0
+    for row in rows:
+        record = {"table": name, **row._asdict()}
+        out.write(json.dumps(record, default=json_default) + "\n")
+        count += 1
+    return count
+
+
+def list_database_contents(args):
+    engine = create_engine(os.getenv("DATABASE_URL"))
+    out = open(args.output, "w", newline="") if args.output else sys.stdout
+    try:
+        if args.format == "table":
+            print("\n" + "="*80, file=out)
+            print("📊 OPTIC-GOV DATABASE OVERVIEW", file=out)
+            print("="*80, file=out)
+
+        with engine.connect() as conn:
+            for i, name in enumerate(args.tables):
+                rows = stream_rows(conn, build_query(name, args), args.batch_size)
+                if args.format == "csv":
+                    count = write_csv(name, rows, out, first=(i == 0))
+                elif args.format == "jsonl":
+                    count = write_jsonl(name, rows, out)
+                else:
+                    count = write_table(name, rows, out, args.batch_size)
+                print(f"{name}: {count} rows", file=sys.stderr)
+
+        if args.format == "table":
+            print("\n" + "="*80, file=out)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        engine.dispose()
+
+
+def parse_date(value: str) -> datetime:
+    return datetime.fromisoformat(value)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("tables", nargs="*", help=f"Tables to list: {', '.join(TABLES)} (default: all)")
+    parser.add_argument("--project-id", type=int, help="Project id (projects) / parent project (milestones)")
+    parser.add_argument("--contractor-id", type=int, help="Contractor id (contractors) / owner (projects)")
+    parser.add_argument("--status", help="Milestone status, e.g. pending, verified, completed")
+    parser.add_argument("--since", type=parse_date, help="created_at >= this ISO date/datetime")
+    parser.add_argument("--until", type=parse_date, help="created_at < this ISO date/datetime")
+    parser.add_argument("--limit", type=int, help="Max rows per table")
+    parser.add_argument("--format", choices=["table", "csv", "jsonl"], default="table")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows fetched per round trip / per table page")
+    parser.add_argument("--output", "-o", help="Write to this file instead of stdout")
+    args = parser.parse_args(argv)
+    unknown = [t for t in args.tables if t not in TABLES]
+    if unknown:
+        parser.error(f"unknown table(s): {', '.join(unknown)}")
+    args.tables = args.tables or list(TABLES)
+    return args
+
 
 if __name__ == "__main__":
     try:
-        list_database_contents()
+        list_database_contents(parse_args())
     except Exception as e:
-        print(f"❌ Error: {e}")
\ No newline at end of file
+        print(f"❌ Error: {e}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,405 @@
+"""
+Offline stand-in for the Gemini (generative-language v1beta) API: the discovery
+document and resumable media upload the SDK's file service uses, files.get /
+files.delete, models.get and models:generateContent.
+
+Point the backend at it with GEMINI_API_ENDPOINT=http://127.0.0.1:9200 (any
+GEMINI_API_KEY works) and run with:
+
+    uvicorn loadtest.fake_gemini:app --port 9200
+
+Behaviour is configured through environment variables, or changed while
+running with POST /_fake/config (same keys, lower-case, JSON):
+
+    FAKE_GEMINI_SEED              RNG seed, for reproducible runs (default 7)
+    FAKE_GEMINI_LATENCY           median:sigma of a lognormal, seconds ("1.5:0.4")
+    FAKE_GEMINI_MODEL_LATENCY     per-model overrides ("gemini-3-flash-preview=6:0.8,gemini-2.5-flash=2:0.3")
+    FAKE_GEMINI_ERRORS            injection rates per generateContent call
+                                  ("429=0.05,500=0.02,timeout=0.01,malformed=0.02,garbled=0.02")
+    FAKE_GEMINI_HANG_SECONDS      how long a "timeout" hangs before answering (default 600)
+    FAKE_GEMINI_PROCESSING        seconds an uploaded file stays PROCESSING (default 4)
+    FAKE_GEMINI_PROCESSING_FAIL   share of uploads that end FAILED instead of ACTIVE (default 0)
+    FAKE_GEMINI_SCRIPT            JSON file of scripted replies, see below
+
+A script is a list of rules; the first whose "match" substring occurs in the
+prompt (and whose optional "model" equals the model) answers, either with
+"text" or an injected "error" (429, 500, "timeout", "malformed", "garbled").
+"times" limits how often a rule fires:
+
+    [{"match": "Milestone:", "error": 429, "times": 2},
+     {"match": "Milestone:", "text": "{\\"verified\\": false, \\"confidence_score\\": 20, \\"reasoning\\": \\"blank\\"}"}]
+
+Without a matching rule, milestone prompts get a milestone list and
+verification prompts a passing verdict. GET /_fake/stats counts every call by
+outcome; POST /_fake/reset clears files, stats and rule counters.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+
+
+def parse_latency(value: str):
+    median, _, sigma = value.partition(":")
+    return float(median), float(sigma or 0)
+
+
+def parse_pairs(value: str) -> dict:
+    pairs = {}
+    for item in filter(None, (p.strip() for p in value.split(","))):
+        key, _, rate = item.partition("=")
+        pairs[key.strip()] = rate.strip()
+    return pairs
+
+
+def load_script(path: str) -> list:
+    if not path:
+        return []
+    with open(path) as f:
+        return json.load(f)
+
+
+CONFIG = {
+    "latency": parse_latency(os.getenv("FAKE_GEMINI_LATENCY", "1.5:0.4")),
+    "model_latency": {
+        model: parse_latency(spec) for model, spec in parse_pairs(os.getenv("FAKE_GEMINI_MODEL_LATENCY", "")).items()
+    },
+    "errors": {kind: float(rate) for kind, rate in parse_pairs(os.getenv("FAKE_GEMINI_ERRORS", "")).items()},
+    "hang_seconds": float(os.getenv("FAKE_GEMINI_HANG_SECONDS", "600")),
+    "processing": float(os.getenv("FAKE_GEMINI_PROCESSING", "4")),
+    "processing_fail": float(os.getenv("FAKE_GEMINI_PROCESSING_FAIL", "0")),
+    "script": load_script(os.getenv("FAKE_GEMINI_SCRIPT", "")),
+}
+FILE_TTL = timedelta(hours=48)  # matches the real API
+
+rng = random.Random(int(os.getenv("FAKE_GEMINI_SEED", "7")))
+files = {}  # file id -> metadata, as returned by files.get
+sessions = {}  # upload session id -> {"file", "length", "received", "digest"}
+rule_hits = Counter()
+stats = Counter()
+
+app = FastAPI(title="Optic-Gov fake Gemini")
+
+STATUS_NAMES = {400: "INVALID_ARGUMENT", 404: "NOT_FOUND", 429: "RESOURCE_EXHAUSTED", 500: "INTERNAL", 503: "UNAVAILABLE"}
+
+
+def api_error(code: int, message: str) -> JSONResponse:
+    return JSONResponse(
+        {"error": {"code": code, "message": message, "status": STATUS_NAMES.get(code, "UNKNOWN")}},
+        status_code=code,
+    )
+
+
+def rfc3339(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def base_url(request: Request) -> str:
+    return str(request.base_url).rstrip("/")
+
+
+# --- Files ---
+
+@app.get("/$discovery/rest")
+async def discovery(request: Request):
+    """Just enough of the v1beta discovery document for googleapiclient to build media.upload"""
+    root = base_url(request) + "/"
+    return {
+        "kind": "discovery#restDescription",
+        "discoveryVersion": "v1",
+        "id": "generativelanguage:v1beta",
+        "name": "generativelanguage",
+        "version": "v1beta",
+        "rootUrl": root,
+        "baseUrl": root,
+        "servicePath": "",
+        "batchPath": "batch",
+        "parameters": {
+            "key": {"type": "string", "location": "query"},
+            "alt": {"type": "string", "location": "query", "default": "json"},
+        },
+        "schemas": {
+            "File": {"id": "File", "type": "object", "properties": {
+                "name": {"type": "string"}, "displayName": {"type": "string"},
+            }},
+            "CreateFileRequest": {"id": "CreateFileRequest", "type": "object", "properties": {
+                "file": {"$ref": "File"},
+            }},
+            "CreateFileResponse": {"id": "CreateFileResponse", "type": "object", "properties": {
+                "file": {"$ref": "File"},
+            }},
+        },
+        "resources": {"media": {"methods": {"upload": {
+            "id": "generativelanguage.media.upload",
+            "path": "v1beta/files",
+            "flatPath": "v1beta/files",
+            "httpMethod": "POST",
+            "parameters": {},
+            "parameterOrder": [],
+            "request": {"$ref": "CreateFileRequest"},
+            "response": {"$ref": "CreateFileResponse"},
+            "supportsMediaUpload": True,
+            "mediaUpload": {
+                "accept": ["*/*"],
+                "maxSize": "2GB",
+                "protocols": {
+                    "simple": {"multipart": True, "path": "/upload/v1beta/files"},
+                    "resumable": {"multipart": True, "path": "/resumable/upload/v1beta/files"},
+                },
+            },
+        }}}},
+    }
+
+
+def new_file(request: Request, display_name: str, mime_type: str) -> dict:
+    file_id = uuid.uuid4().hex[:12]
+    now = datetime.now(timezone.utc)
+    return {
+        "name": f"files/{file_id}",
+        "displayName": display_name or "",
+        "mimeType": mime_type or "application/octet-stream",
+        "sizeBytes": "0",
+        "createTime": rfc3339(now),
+        "updateTime": rfc3339(now),
+        "expirationTime": rfc3339(now + FILE_TTL),
+        "uri": f"{base_url(request)}/v1beta/files/{file_id}",
+        "state": "PROCESSING",
+        "_ready_at": time.monotonic() + CONFIG["processing"],
+        "_fails": rng.random() < CONFIG["processing_fail"],
+    }
+
+
+def public(meta: dict) -> dict:
+    if meta["state"] == "PROCESSING" and time.monotonic() >= meta["_ready_at"]:
+        meta["state"] = "FAILED" if meta["_fails"] else "ACTIVE"
+        meta["updateTime"] = rfc3339(datetime.now(timezone.utc))
+    return {k: v for k, v in meta.items() if not k.startswith("_")}
+
+
+def store_file(meta: dict, data_length: int, digest) -> dict:
+    meta["sizeBytes"] = str(data_length)
+    meta["sha256Hash"] = base64.b64encode(digest.digest()).decode()
+    files[meta["name"].split("/", 1)[1]] = meta
+    stats["upload"] += 1
+    return {"file": public(meta)}
+
+
+@app.post("/upload/v1beta/files")
+async def start_upload(request: Request):
+    upload_type = request.query_params.get("uploadType", "resumable")
+    body = await request.body()
+    if upload_type != "resumable":
+        # Simple/multipart uploads: metadata is not needed for the stand-in, only the bytes
+        meta = new_file(request, "", request.headers.get("content-type"))
+        return store_file(meta, len(body), hashlib.sha256(body))
+
+    info = json.loads(body or b"{}").get("file", {})
+    meta = new_file(request, info.get("displayName"), request.headers.get("x-upload-content-type"))
+    session_id = uuid.uuid4().hex
+    sessions[session_id] = {
+        "file": meta,
+        "length": int(request.headers.get("x-upload-content-length", -1)),
+        "received": 0,
+        "digest": hashlib.sha256(),
+    }
+    location = f"{base_url(request)}/upload/v1beta/files/sessions/{session_id}"
+    return Response(status_code=200, headers={"Location": location})
+
+
+CONTENT_RANGE_RE = re.compile(r"bytes (?:(\d+)-(\d+)|\*)/(\d+|\*)")
+
+
+@app.put("/upload/v1beta/files/sessions/{session_id}")
+async def upload_chunk(session_id: str, request: Request):
+    session = sessions.get(session_id)
+    if session is None:
+        return api_error(404, "Upload session not found")
+    chunk = await request.body()
+    match = CONTENT_RANGE_RE.fullmatch(request.headers.get("content-range", ""))
+    total = session["length"]
+    if match:
+        if match.group(3) != "*":
+            total = int(match.group(3))
+        if match.group(1) is not None and int(match.group(1)) != session["received"]:
+            return api_error(400, f"Chunk starts at {match.group(1)}, expected {session['received']}")
+    session["digest"].update(chunk)
+    session["received"] += len(chunk)
+
+    if total < 0 or session["received"] < total:
+        headers = {"Range": f"bytes=0-{session['received'] - 1}"} if session["received"] else {}
+        return Response(status_code=308, headers=headers)
+    del sessions[session_id]
+    return store_file(session["file"], session["received"], session["digest"])
+
+
+@app.get("/v1beta/files/{file_id}")
+async def get_file(file_id: str):
+    stats["files.get"] += 1
+    meta = files.get(file_id)
+    if meta is None:
+        return api_error(404, f"File files/{file_id} not found")
+    return public(meta)
+
+
+@app.delete("/v1beta/files/{file_id}")
+async def delete_file(file_id: str):
+    stats["files.delete"] += 1
+    if files.pop(file_id, None) is None:
+        return api_error(404, f"File files/{file_id} not found")
+    return {}
+
+
+# --- Models ---
+
+@app.get("/v1beta/models/{model}")
+async def get_model(model: str):
+    return {
+        "name": f"models/{model}",
+        "baseModelId": model,
+        "version": "fake",
+        "displayName": f"{model} (offline stand-in)",
+        "inputTokenLimit": 1048576,
+        "outputTokenLimit": 65536,
+        "supportedGenerationMethods": ["generateContent"],
+    }
+
+
+def pick_rule(prompt: str, model: str):
+    for i, rule in enumerate(CONFIG["script"]):
+        if rule.get("model") not in (None, model) or rule.get("match", "") not in prompt:
+            continue
+        if "times" in rule and rule_hits[i] >= rule["times"]:
+            continue
+        rule_hits[i] += 1
+        return rule
+    return None
+
+
+def injected_error():
+    roll = rng.random()
+    for kind, rate in CONFIG["errors"].items():
+        if roll < rate:
+            return kind
+        roll -= rate
+    return None
+
+
+def default_reply(prompt: str) -> str:
+    if "milestones" in prompt and "JSON array" in prompt:
+        return json.dumps([
+            "Site clearing and foundation excavation",
+            "Foundation and substructure works",
+            "Superstructure and roofing",
+            "Finishing, fittings and handover",
+        ])
+    if "Milestone:" in prompt:
+        return json.dumps({
+            "verified": True,
+            "confidence_score": 85,
+            "reasoning": "Offline stand-in: construction activity consistent with the milestone",
+        })
+    return "OK"
+
+
+def latency_for(model: str) -> float:
+    median, sigma = CONFIG["model_latency"].get(model, CONFIG["latency"])
+    return median * math.exp(rng.gauss(0, sigma)) if sigma else median
+
+
+@app.post("/v1beta/models/{model}:generateContent")
+async def generate_content(model: str, request: Request):
+    body = await request.json()
+    prompt_parts, file_refs = [], []
+    for content in body.get("contents", []):
+        for part in content.get("parts", []):
+            if "text" in part:
+                prompt_parts.append(part["text"])
+            file_data = part.get("fileData") or part.get("file_data")
+            if file_data:
+                file_refs.append(file_data.get("fileUri") or file_data.get("file_uri", ""))
+    prompt = "\n".join(prompt_parts)
+
+    for uri in file_refs:
+        meta = files.get(uri.rstrip("/").rsplit("/", 1)[-1])
+        if meta is None or public(meta)["state"] != "ACTIVE":
+            stats[f"{model}:file_not_active"] += 1
+            return api_error(400, f"The File {uri} is not in an ACTIVE state and usage is not allowed.")
+
+    rule = pick_rule(prompt, model)
+    error = rule.get("error") if rule else injected_error()
+    await asyncio.sleep(latency_for(model))
+
+    stats[f"{model}:{error or 'ok'}"] += 1
+    if error == "timeout":
+        await asyncio.sleep(CONFIG["hang_seconds"])
+    elif error == "malformed":
+        return Response('{"candidates": [{"content": {"parts": [{"text": "{\\"verif', media_type="application/json")
+    elif error not in (None, "garbled"):
+        return api_error(int(error), f"Injected {error} from the offline stand-in")
+
+    text = rule["text"] if rule and "text" in rule else default_reply(prompt)
+    if error == "garbled":
+        text = "The video appears to show some construction work, verified I think."
+    return {
+        "candidates": [{
+            "content": {"parts": [{"text": text}], "role": "model"},
+            "finishReason": "STOP",
+            "index": 0,
+        }],
+        "usageMetadata": {
+            "promptTokenCount": len(prompt) // 4,
+            "candidatesTokenCount": len(text) // 4,
+            "totalTokenCount": (len(prompt) + len(text)) // 4,
+        },
+        "modelVersion": model,
+    }
+
+
+# --- Control ---
+
+@app.post("/_fake/config")
+async def update_config(request: Request):
+    changes = await request.json()
+    unknown = set(changes) - set(CONFIG) - {"seed"}
+    if unknown:
+        return api_error(400, f"Unknown setting(s): {', '.join(sorted(unknown))}")
+    for key, value in changes.items():
+        if key == "latency":
+            CONFIG[key] = parse_latency(value) if isinstance(value, str) else tuple(value)
+        elif key == "model_latency":
+            CONFIG[key] = {m: parse_latency(v) if isinstance(v, str) else tuple(v) for m, v in value.items()}
+        elif key == "errors":
+            CONFIG[key] = {kind: float(rate) for kind, rate in value.items()}
+        elif key == "script":
+            CONFIG[key] = value
+            rule_hits.clear()
+        elif key in ("hang_seconds", "processing", "processing_fail"):
+            CONFIG[key] = float(value)
+        elif key == "seed":
+            rng.seed(int(value))
+    return {"config": {k: v for k, v in CONFIG.items() if k != "script"}, "script_rules": len(CONFIG["script"])}
+
+
+@app.get("/_fake/stats")
+async def get_stats():
+    return {"calls": dict(stats), "files": len(files), "upload_sessions": len(sessions)}
+
+
+@app.post("/_fake/reset")
+async def reset():
+    files.clear()
+    sessions.clear()
+    stats.clear()
+    rule_hits.clear()
+    return {"reset": True}
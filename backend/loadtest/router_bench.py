@@ -0,0 +1,117 @@
+"""
+Offline benchmark of the Gemini model router (hedging, fallback, error
+handling) against loadtest/fake_gemini.py, so latency and retry behaviour can
+be measured without an API key or quota.
+
+    python -m loadtest.router_bench --requests 200 --concurrency 20
+    python -m loadtest.router_bench --latency 3:0.6 --errors 429=0.1,timeout=0.02
+    python -m loadtest.router_bench --model-latency gemini-3-flash-preview=8:0.8,gemini-2.5-flash=2:0.2
+
+Starts the fake on --gemini-port unless --target points at one already running.
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+from loadtest.run import percentile, stop_process, wait_until_up
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROMPT = "Milestone: Foundation and substructure works\nReturn ONLY valid JSON"
+
+
+async def bench(router, requests: int, concurrency: int) -> dict:
+    from model_router import has_text
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, failures, winners = [], 0, {}
+
+    async def one():
+        nonlocal failures
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                _, model_name = await router.generate(
+                    PROMPT, validate=lambda r: has_text(r) and "{" in r.text, pipeline="bench"
+                )
+                winners[model_name] = winners.get(model_name, 0) + 1
+            except Exception:
+                failures += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": requests,
+        "failures": failures,
+        "elapsed_s": round(elapsed, 2),
+        "p50_s": round(percentile(latencies, 50), 3),
+        "p95_s": round(percentile(latencies, 95), 3),
+        "p99_s": round(percentile(latencies, 99), 3),
+        "winners": winners,
+        "router": dict(router.stats),
+    }
+
+
+async def main(opts) -> int:
+    process = None
+    target = opts.target or f"http://127.0.0.1:{opts.gemini_port}"
+    try:
+        if not opts.target:
+            process = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "loadtest.fake_gemini:app", "--host", "127.0.0.1",
+                 "--port", str(opts.gemini_port), "--log-level", "warning"],
+                cwd=BACKEND_DIR, env=dict(os.environ, FAKE_GEMINI_SEED=str(opts.seed)),
+            )
+        await wait_until_up(f"{target}/_fake/stats")
+        settings = {"latency": opts.latency, "errors": {}, "seed": opts.seed}
+        if opts.errors:
+            settings["errors"] = {k: float(v) for k, v in (p.split("=") for p in opts.errors.split(","))}
+        if opts.model_latency:
+            settings["model_latency"] = dict(p.split("=") for p in opts.model_latency.split(","))
+        async with httpx.AsyncClient() as client:
+            (await client.post(f"{target}/_fake/reset")).raise_for_status()
+            (await client.post(f"{target}/_fake/config", json=settings)).raise_for_status()
+
+        # model_router reads its configuration at import time
+        os.environ["GEMINI_API_ENDPOINT"] = target
+        from model_router import ModelRouter, configure_gemini
+        configure_gemini("offline")
+        router = ModelRouter()
+        result = await bench(router, opts.requests, opts.concurrency)
+
+        async with httpx.AsyncClient() as client:
+            result["fake"] = (await client.get(f"{target}/_fake/stats")).json()["calls"]
+    finally:
+        if process is not None:
+            stop_process(process)
+
+    print(f"{result['requests']} requests in {result['elapsed_s']}s, {result['failures']} failed")
+    print(f"latency p50 {result['p50_s']}s  p95 {result['p95_s']}s  p99 {result['p99_s']}s")
+    print(f"router  {result['router']}")
+    print(f"winners {result['winners']}")
+    print(f"fake    {result['fake']}")
+    return 1 if result["failures"] else 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", help="Base URL of an already running fake_gemini")
+    parser.add_argument("--gemini-port", type=int, default=9200)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--latency", default="1.5:0.4", help="median:sigma (seconds) of the fake's lognormal latency")
+    parser.add_argument("--model-latency", help="Per-model overrides, model=median:sigma,...")
+    parser.add_argument("--errors", help="Injection rates, e.g. 429=0.05,500=0.02,timeout=0.01,malformed=0.02")
+    parser.add_argument("--seed", type=int, default=7)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
@@ -0,0 +1,304 @@
+"""
+Mixed read/write load test for the backend API.
+
+By default this starts the stub services (loadtest/stubs.py), the offline
+Gemini stand-in (loadtest/fake_gemini.py) and the backend under uvicorn against DATABASE_URL (use a local, disposable Postgres), seeds
+contractors and projects, drives weighted traffic for a fixed duration and
+compares the results with loadtest/baseline.json.
+
+    python -m loadtest.run --duration 60 --concurrency 32
+    python -m loadtest.run --update-baseline       # record a new baseline
+    python -m loadtest.run --target http://localhost:8000   # existing server
+    python -m loadtest.run --no-baseline            # report only, no regression gate
+
+Exits 1 when throughput or any endpoint's p95 regresses past --tolerance, or
+when there is no baseline to compare with (unless --no-baseline). Baselines
+depend on the machine and database, so record one on the host that runs the
+gate rather than committing it.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(BACKEND_DIR, "loadtest", "baseline.json")
+PASSWORD = "loadtest-password"
+
+# Relative weight of each operation in the traffic mix
+WEIGHTS = {
+    "GET /projects": 35,
+    "GET /projects/{id}": 25,
+    "GET /exchange-rate": 15,
+    "POST /login": 10,
+    "POST /create-project": 8,
+    "POST /milestones": 7,
+}
+
+
+def percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[idx]
+
+
+class LoadTest:
+    def __init__(self, client: httpx.AsyncClient, seed: int):
+        self.client = client
+        self.rng = random.Random(seed)
+        self.run_id = uuid.uuid4().hex[:8]
+        self.contractors = []  # (email, wallet)
+        self.project_ids = []
+        self.latencies = {op: [] for op in WEIGHTS}
+        self.errors = {op: 0 for op in WEIGHTS}
+
+    def wallet(self) -> str:
+        return "0x" + "".join(self.rng.choice("0123456789abcdef") for _ in range(40))
+
+    def project_body(self, wallet: str) -> dict:
+        return {
+            "name": f"Load test road {self.rng.randint(1, 10 ** 6)}",
+            "description": "Resurface 2km of road with drainage on both sides",
+            "total_budget": self.rng.randint(1, 500) * 100_000,
+            "budget_currency": "NGN",
+            "contractor_wallet": wallet,
+            # Manual milestones keep /create-project off the Gemini path
+            "use_ai_milestones": False,
+            "manual_milestones": ["Site clearing", "Base course", "Asphalt and markings"],
+            "project_latitude": 6.5244 + self.rng.uniform(-0.5, 0.5),
+            "project_longitude": 3.3792 + self.rng.uniform(-0.5, 0.5),
+            "location_tolerance_km": 1.0,
+            "gov_wallet": "0x" + "0" * 40,
+        }
+
+    async def seed(self, contractors: int, projects: int):
+        for i in range(contractors):
+            email = f"loadtest-{self.run_id}-{i}@example.com"
+            wallet = self.wallet()
+            response = await self.client.post("/register", json={
+                "wallet_address": wallet,
+                "company_name": f"Load Test Works {i}",
+                "email": email,
+                "password": PASSWORD,
+            })
+            response.raise_for_status()
+            self.contractors.append((email, wallet))
+        for _ in range(projects):
+            _, wallet = self.rng.choice(self.contractors)
+            response = await self.client.post("/create-project", json=self.project_body(wallet))
+            response.raise_for_status()
+            self.project_ids.append(response.json()["project_id"])
+
+    def request_for(self, op: str):
+        if op == "GET /projects":
+            return "GET", "/projects", None
+        if op == "GET /projects/{id}":
+            return "GET", f"/projects/{self.rng.choice(self.project_ids)}", None
+        if op == "GET /exchange-rate":
+            return "GET", "/exchange-rate", None
+        if op == "POST /login":
+            email, _ = self.rng.choice(self.contractors)
+            return "POST", "/login", {"email": email, "password": PASSWORD}
+        if op == "POST /create-project":
+            _, wallet = self.rng.choice(self.contractors)
+            return "POST", "/create-project", self.project_body(wallet)
+        return "POST", "/milestones", {
+            "project_id": self.rng.choice(self.project_ids),
+            "description": "Additional drainage work",
+            "amount": self.rng.randint(1, 50) * 10_000,
+            "order_index": self.rng.randint(4, 20),
+        }
+
+    async def worker(self, deadline: float):
+        ops, weights = list(WEIGHTS), list(WEIGHTS.values())
+        while time.perf_counter() < deadline:
+            op = self.rng.choices(ops, weights)[0]
+            method, path, body = self.request_for(op)
+            started = time.perf_counter()
+            try:
+                response = await self.client.request(method, path, json=body)
+                ok = response.status_code < 400
+                if op == "POST /create-project" and ok:
+                    self.project_ids.append(response.json()["project_id"])
+            except httpx.HTTPError:
+                ok = False
+            self.latencies[op].append(time.perf_counter() - started)
+            if not ok:
+                self.errors[op] += 1
+
+    async def run(self, duration: float, concurrency: int) -> dict:
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(self.worker(deadline) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        return self.summary(elapsed)
+
+    def summary(self, elapsed: float) -> dict:
+        endpoints = {}
+        total = 0
+        for op, values in self.latencies.items():
+            values.sort()
+            total += len(values)
+            endpoints[op] = {
+                "requests": len(values),
+                "errors": self.errors[op],
+                "p50_ms": round(percentile(values, 50) * 1000, 2),
+                "p95_ms": round(percentile(values, 95) * 1000, 2),
+                "p99_ms": round(percentile(values, 99) * 1000, 2),
+            }
+        return {
+            "duration_s": round(elapsed, 2),
+            "requests": total,
+            "errors": sum(self.errors.values()),
+            "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+            "endpoints": endpoints,
+        }
+
+
+def print_report(result: dict):
+    print(f"{'operation':<24}{'reqs':>8}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for op, stats in result["endpoints"].items():
+        print(f"{op:<24}{stats['requests']:>8}{stats['errors']:>8}"
+              f"{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}")
+    print(f"\n{result['requests']} requests in {result['duration_s']}s "
+          f"= {result['throughput_rps']} req/s, {result['errors']} errors")
+
+
+def compare_with_baseline(result: dict, baseline: dict, tolerance: float) -> list:
+    """Regressions as human-readable strings; empty when the run is within tolerance"""
+    failures = []
+    floor = baseline["throughput_rps"] * (1 - tolerance)
+    if result["throughput_rps"] < floor:
+        failures.append(f"throughput {result['throughput_rps']} req/s < {floor:.2f} "
+                        f"(baseline {baseline['throughput_rps']})")
+    for op, base in baseline["endpoints"].items():
+        current = result["endpoints"].get(op)
+        if not current or not current["requests"]:
+            continue
+        ceiling = base["p95_ms"] * (1 + tolerance)
+        if current["p95_ms"] > ceiling:
+            failures.append(f"{op} p95 {current['p95_ms']}ms > {ceiling:.2f}ms (baseline {base['p95_ms']}ms)")
+    if result["errors"] > baseline.get("errors", 0):
+        failures.append(f"{result['errors']} errors (baseline {baseline.get('errors', 0)})")
+    return failures
+
+
+def start_process(args, env, port: int) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", *args, "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+
+
+def stop_process(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        # uvicorn waits on the client's keep-alive connections during graceful shutdown
+        process.kill()
+        process.wait()
+
+
+async def wait_until_up(url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(url)).status_code < 500:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.25)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+async def main(opts) -> int:
+    processes = []
+    target = opts.target
+    try:
+        if not target:
+            stub_url = f"http://127.0.0.1:{opts.stub_port}"
+            env = dict(os.environ)
+            env.update({
+                "COINGECKO_URL": f"{stub_url}/rates/coingecko",
+                "USD_RATES_URL": f"{stub_url}/rates/usd",
+                "MANTLE_RPC_URL": f"{stub_url}/rpc",
+                # Any well-formed key works; the stub chain never checks signatures
+                "ETHEREUM_PRIVATE_KEY": env.get("LOADTEST_PRIVATE_KEY", "0x" + "11" * 32),
+                "CONTRACT_ADDRESS": env.get("LOADTEST_CONTRACT_ADDRESS", "0x" + "22" * 20),
+                "GEMINI_API_KEY": env.get("LOADTEST_GEMINI_API_KEY", "loadtest"),
+                "LOG_LEVEL": env.get("LOG_LEVEL", "WARNING"),
+            })
+            env["GEMINI_API_ENDPOINT"] = f"http://127.0.0.1:{opts.gemini_port}"
+            processes.append(start_process(["loadtest.stubs:app"], env, opts.stub_port))
+            processes.append(start_process(["loadtest.fake_gemini:app"], env, opts.gemini_port))
+            await wait_until_up(f"{stub_url}/rates/usd")
+            await wait_until_up(f"{env['GEMINI_API_ENDPOINT']}/_fake/stats")
+            processes.append(start_process(["main:app", "--workers", str(opts.workers)], env, opts.port))
+            target = f"http://127.0.0.1:{opts.port}"
+        await wait_until_up(f"{target}/health")
+
+        limits = httpx.Limits(max_connections=opts.concurrency, max_keepalive_connections=opts.concurrency)
+        async with httpx.AsyncClient(base_url=target, limits=limits, timeout=30) as client:
+            test = LoadTest(client, opts.seed)
+            await test.seed(opts.contractors, opts.projects)
+            result = await test.run(opts.duration, opts.concurrency)
+    finally:
+        for process in reversed(processes):
+            stop_process(process)
+
+    print_report(result)
+
+    if opts.update_baseline:
+        with open(opts.baseline, "w") as f:
+            json.dump(result, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {opts.baseline}")
+        return 0
+
+    if opts.no_baseline:
+        return 0
+    if not os.path.exists(opts.baseline):
+        # A gate with nothing to compare against must not pass silently
+        print(f"No baseline at {opts.baseline}; run with --update-baseline to record one, or pass --no-baseline")
+        return 1
+
+    with open(opts.baseline) as f:
+        baseline = json.load(f)
+    failures = compare_with_baseline(result, baseline, opts.tolerance)
+    for failure in failures:
+        print(f"REGRESSION: {failure}")
+    return 1 if failures else 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", help="Base URL of an already running backend (skips starting stubs/backend)")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--stub-port", type=int, default=9100)
+    parser.add_argument("--gemini-port", type=int, default=9200)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the spawned backend")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of traffic after seeding")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--contractors", type=int, default=20)
+    parser.add_argument("--projects", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed regression, 0.2 = 20%%")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--no-baseline", action="store_true", help="Only report; skip the regression comparison")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
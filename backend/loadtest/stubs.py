@@ -0,0 +1,58 @@
+"""
+Stand-ins for the third-party services the backend talks to, so a load test
+measures our code and never hits CoinGecko, the FX API or Mantle RPC.
+
+Run with: uvicorn loadtest.stubs:app --port 9100
+"""
+import os
+
+from fastapi import FastAPI, Request
+
+STUB_MNT_USD = float(os.getenv("STUB_MNT_USD", "0.8"))
+STUB_USD_NGN = float(os.getenv("STUB_USD_NGN", "1500"))
+STUB_CHAIN_ID = int(os.getenv("STUB_CHAIN_ID", "5003"))  # Mantle Sepolia
+
+app = FastAPI(title="Optic-Gov load-test stubs")
+
+
+@app.get("/rates/coingecko")
+async def coingecko():
+    return {"mantle": {"usd": STUB_MNT_USD}}
+
+
+@app.get("/rates/usd")
+async def usd_rates():
+    return {"base": "USD", "rates": {"NGN": STUB_USD_NGN}}
+
+
+# Minimal JSON-RPC: enough for web3.py reads; writes are accepted and never mined
+RPC_RESULTS = {
+    "eth_chainId": hex(STUB_CHAIN_ID),
+    "net_version": str(STUB_CHAIN_ID),
+    "eth_blockNumber": "0x1",
+    "eth_gasPrice": hex(20_000_000),
+    "eth_estimateGas": hex(200_000),
+    "eth_getTransactionCount": "0x0",
+    "eth_getBalance": hex(10 ** 18),
+    "eth_call": "0x" + "00" * 32,
+    "eth_sendRawTransaction": "0x" + "ab" * 32,
+    "eth_getTransactionReceipt": None,
+}
+
+
+def rpc_reply(call: dict) -> dict:
+    reply = {"jsonrpc": "2.0", "id": call.get("id")}
+    method = call.get("method")
+    if method in RPC_RESULTS:
+        reply["result"] = RPC_RESULTS[method]
+    else:
+        reply["error"] = {"code": -32601, "message": f"stub: method {method} not supported"}
+    return reply
+
+
+@app.post("/rpc")
+async def rpc(request: Request):
+    body = await request.json()
+    if isinstance(body, list):
+        return [rpc_reply(call) for call in body]
+    return rpc_reply(body)
@@ -2,33 +2,96 @@
 import asyncio
 import os
 import json
+import logging
 import time
-import requests
 import tempfile
-import shutil
+import threading
 import uuid
 import subprocess
+from contextlib import asynccontextmanager
 from datetime import datetime
 from typing import List, Optional
 
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File # <--- Ensure UploadFile and File are here
+from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Request # <--- Ensure UploadFile and File are here
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 from web3 import Web3
 from web3.middleware import ExtraDataToPOAMiddleware
 from geopy.distance import geodesic
+import numpy as np
 import google.generativeai as genai
 from dotenv import load_dotenv
 
 # Local imports (ensure these files exist in your directory)
-from database import get_db, Contractor, Project, Milestone
+from database import get_db, engine, SessionLocal, Contractor, Project, Milestone
 from auth import hash_password, verify_password, create_access_token, verify_token
+from response_cache import response_cache, cached_json_response, invalidate_project, project_tags
+from rates import rate_service, RateSnapshot
+from cache_backend import shared_cache
+from http_client import http_client
+from metrics import metrics_middleware, metrics_response, observe_stage, record_retry, record_fallback, record_outcome
+from rate_history import rate_history, to_epoch, convert_amounts, DIRECTIONS, MNT_TO_NGN
+from logging_config import setup_logging, shutdown_logging, request_context_middleware, verification_id_var
+from profiling import profiling_middleware, profile_store, require_profile_token, profile_as_text, profile_as_pstats
+from readiness import ReadinessChecker, READINESS_PROBE_TIMEOUT
+from resumable_uploads import resumable_uploads, UploadError, parse_checksum, file_sha256, RESUMABLE_CHUNK_SIZE
+from storage import storage, new_key, key_from_url, evidence_url
+from evidence_lifecycle import evidence_manager
+from evidence_anchor import EvidenceAnchor
+from cid import CidBuilder, CidReader
+from video_fingerprint import fingerprint_index, video_phashes, ffmpeg_available, PHASH_ENABLED, PHASH_MODE
+from milestone_cache import milestone_cache, MILESTONE_CACHE_WARMUP
+from gemini_files import gemini_files
+from model_router import model_router, has_text, configure_gemini
+from progress import progress_bus, TERMINAL_STAGES
+from spatial_index import project_locations, GEOFENCE_MODE
+from gps_track import extract_gps_track, validate_track
 
 load_dotenv()
+setup_logging()
+logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Optic-Gov Mantle AI Oracle", redirect_slashes=False)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        await asyncio.to_thread(rate_history.load)
+        rate_service.seed(rate_history.latest())
+    except Exception as e:
+        logger.warning("Could not load exchange rate history: %s", e)
+    try:
+        await asyncio.to_thread(fingerprint_index.load)
+    except Exception as e:
+        logger.warning("Could not load evidence fingerprints: %s", e)
+    try:
+        await asyncio.to_thread(project_locations.load)
+    except Exception as e:
+        logger.warning("Could not load project locations: %s", e)
+    if MILESTONE_CACHE_WARMUP:
+        try:
+            await asyncio.to_thread(milestone_cache.warm_up)
+        except Exception as e:
+            logger.warning("Milestone template warm-up failed: %s", e)
+    await http_client.start()
+    await rate_service.start()
+    evidence_manager.start()
+    gemini_files.start()
+    project_locations.start()
+    evidence_anchor.start()
+    yield
+    await evidence_anchor.stop()
+    await gemini_files.stop()
+    await project_locations.stop()
+    await evidence_manager.stop()
+    await rate_service.stop()
+    await shared_cache.close()
+    await http_client.stop()
+    shutdown_logging()
+
+app = FastAPI(title="Optic-Gov Mantle AI Oracle", redirect_slashes=False, lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -36,7 +99,11 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Upload-Offset", "Upload-Length", "Location", "X-Request-ID"],
 )
+app.middleware("http")(profiling_middleware)
+app.middleware("http")(metrics_middleware)
+app.middleware("http")(request_context_middleware)
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -44,8 +111,8 @@ os.makedirs(os.path.join(BASE_DIR, "static", "uploads"), exist_ok=True)
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 # --- CONFIGURATION ---
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-model = genai.GenerativeModel('gemini-3-flash-preview')
+configure_gemini(os.getenv("GEMINI_API_KEY"))
+model = model_router.primary
 
 # Mantle Setup
 MANTLE_RPC_URL = os.getenv("MANTLE_RPC_URL", "https://rpc.sepolia.mantle.xyz")
@@ -63,110 +130,73 @@ with open(ABI_FILE_PATH, "r") as f:
     contract_abi = contract_json["abi"]
 
 optic_gov_contract = w3.eth.contract(address=CONTRACT_ADDRESS, abi=contract_abi)
+# Held from nonce lookup to broadcast by every oracle transaction (payouts, evidence anchoring)
+oracle_tx_lock = threading.Lock()
+evidence_anchor = EvidenceAnchor(w3, optic_gov_contract, ORACLE_PRIVATE_KEY, tx_lock=oracle_tx_lock)
+
+# --- READINESS PROBES ---
+# Probes get their own provider with a short HTTP timeout so a hung RPC returns the probe thread
+probe_w3 = Web3(Web3.HTTPProvider(MANTLE_RPC_URL, request_kwargs={"timeout": READINESS_PROBE_TIMEOUT}))
+probe_w3.middleware_onion.inject(ExtraDataToPOAMiddleware, layer=0)
+
+def probe_rpc():
+    return {"block": probe_w3.eth.block_number}
+
+def probe_contract():
+    if not probe_w3.eth.get_code(CONTRACT_ADDRESS):
+        raise RuntimeError(f"No contract code at {CONTRACT_ADDRESS}")
+
+def probe_oracle_balance():
+    balance = probe_w3.eth.get_balance(ORACLE_ADDRESS)
+    if balance == 0:
+        raise RuntimeError("Oracle wallet is empty; payouts will fail gas checks")
+    return {"mnt": float(probe_w3.from_wei(balance, 'ether'))}
+
+def probe_postgres():
+    # New connections are bounded by DB_CONNECT_TIMEOUT; the query by statement_timeout
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            conn.execute(text(f"SET LOCAL statement_timeout = {int(READINESS_PROBE_TIMEOUT * 1000)}"))
+        conn.execute(text("SELECT 1"))
+
+def probe_gemini():
+    genai.get_model(model.model_name, request_options={"timeout": READINESS_PROBE_TIMEOUT})
+
+readiness = ReadinessChecker({
+    "rpc": probe_rpc,
+    "contract": probe_contract,
+    "oracle_balance": probe_oracle_balance,
+    "postgres": probe_postgres,
+    "gemini": probe_gemini,
+})
 
 # --- HELPERS ---
-mnt_ngn_cache = {"rate": None, "timestamp": None}
-CACHE_DURATION = 300  # 5 minutes
-
-def get_mnt_ngn_rate():
-    """Fetch MNT to NGN exchange rate with caching"""
-    current_time = time.time()
-    
-    # Check if cache is valid
-    if (mnt_ngn_cache["rate"] is not None and 
-        mnt_ngn_cache["timestamp"] is not None and 
-        current_time - mnt_ngn_cache["timestamp"] < CACHE_DURATION):
-        return mnt_ngn_cache["rate"]
-    
-    try:
-        # Get MNT price in USD from CoinGecko
-        mnt_response = requests.get(
-            "https://api.coingecko.com/api/v3/simple/price?ids=mantle&vs_currencies=usd",
-            timeout=5
-        )
-        
-        # Handle API errors gracefully
-        if mnt_response.status_code != 200:
-            print(f"⚠️ CoinGecko Error: {mnt_response.status_code}")
-            return mnt_ngn_cache["rate"] if mnt_ngn_cache["rate"] else 1200  # Default fallback
-            
-        data = mnt_response.json()
-        if "mantle" not in data or "usd" not in data["mantle"]:
-            print("⚠️ CoinGecko malformed response")
-            return mnt_ngn_cache["rate"] if mnt_ngn_cache["rate"] else 1200
+# Cached views embed NGN figures computed from the old rate
+rate_service.on_update.append(lambda snapshot: response_cache.clear())
+rate_service.on_update.append(rate_history.record)
 
-        mnt_usd = data["mantle"]["usd"]
-        
-        # Get USD to NGN rate
-        usd_ngn_response = requests.get(
-            "https://api.exchangerate-api.com/v4/latest/USD",
-            timeout=5
-        )
-        
-        if usd_ngn_response.status_code != 200:
-            return mnt_ngn_cache["rate"] if mnt_ngn_cache["rate"] else 1200
-             
-        usd_ngn = usd_ngn_response.json().get("rates", {}).get("NGN", 1500)
-        
-        # Calculate MNT to NGN rate
-        mnt_ngn_rate = mnt_usd * usd_ngn
-        
-        # Update cache
-        mnt_ngn_cache["rate"] = mnt_ngn_rate
-        mnt_ngn_cache["timestamp"] = current_time
-        
-        return mnt_ngn_rate
-        
-    except Exception as e:
-        print(f"⚠️ Exchange rate fetch failed (using cache/fallback): {str(e)[:50]}")
-        return mnt_ngn_cache["rate"] if mnt_ngn_cache["rate"] else 1200
+def get_mnt_ngn_rate() -> float:
+    """Current MNT to NGN rate from memory; never waits on the upstream APIs"""
+    return rate_service.snapshot().mnt_ngn
 
-def convert_ngn_to_mnt(ngn_amount: float) -> float:
+def convert_ngn_to_mnt(ngn_amount: float, snapshot: Optional[RateSnapshot] = None) -> float:
     """Convert NGN amount to MNT"""
-    rate = get_mnt_ngn_rate()
-    if rate == 0: return 0
-    return ngn_amount / rate
+    return (snapshot or rate_service.snapshot()).ngn_to_mnt(ngn_amount)
 
-def convert_mnt_to_ngn(mnt_amount: float) -> float:
+def convert_mnt_to_ngn(mnt_amount: float, snapshot: Optional[RateSnapshot] = None) -> float:
     """Convert MNT amount to NGN"""
-    rate = get_mnt_ngn_rate()
-    return mnt_amount * rate
-
-async def release_funds_mantle(project_on_chain_id: int, milestone_index: int):
-    """
-    Release milestone funds on Mantle blockchain
-    
-    Args:
-        project_on_chain_id: The on-chain project ID (integer)
-        milestone_index: The milestone index FROM YOUR DB (1-based)
-    """
-    try:
-        # Convert to pure integers
-        p_id = int(project_on_chain_id)
-        m_idx = int(milestone_index) - 1  # DB uses 1-based, blockchain uses 0-based
-        
-        print(f"🔄 RELEASING: Project {p_id}, Milestone {m_idx} (DB index: {milestone_index})")
-
-        # 1. CRITICAL: Check if milestone exists on-chain first
-        try:
-            milestone_info = optic_gov_contract.functions.getMilestone(p_id, m_idx).call()
-            print(f"📋 Milestone Info: Amount={milestone_info[1]}, Completed={milestone_info[2]}, Released={milestone_info[3]}")
-            
-            if milestone_info[2]:  # isCompleted
-                print(f"⚠️ WARNING: Milestone already marked as completed on-chain")
-                if milestone_info[3]:  # isReleased
-                    print(f"❌ ERROR: Funds already released for this milestone")
-                    return None
-        except Exception as e:
-            print(f"❌ ERROR: Could not fetch milestone info: {e}")
-            print(f"💡 TIP: Make sure project {p_id} exists on-chain with at least {m_idx + 1} milestones")
-            return None
+    return (snapshot or rate_service.snapshot()).mnt_to_ngn(mnt_amount)
 
+def send_release_transaction(p_id: int, m_idx: int):
+    """Blocking: build, sign and broadcast releaseMilestone; returns the tx hash"""
+    with oracle_tx_lock:
         # 2. Get the current nonce
-        nonce = w3.eth.get_transaction_count(ORACLE_ADDRESS)
+        # 'pending' as well as the lock: transactions sent by another process still count
+        nonce = w3.eth.get_transaction_count(ORACLE_ADDRESS, 'pending')
 
         # 3. FIXED: Let Web3 estimate the gas properly
         # First, try to estimate gas to see what's actually needed
+        stage_started = time.perf_counter()
         try:
             estimated_gas = optic_gov_contract.functions.releaseMilestone(
                 p_id,
@@ -176,20 +206,20 @@ async def release_funds_mantle(project_on_chain_id: int, milestone_index: int):
                 'from': ORACLE_ADDRESS,
                 'nonce': nonce
             })
-            print(f"⛽ Estimated Gas: {estimated_gas}")
+            logger.debug("Estimated gas: %s", estimated_gas)
             # Add 50% buffer to be safe
             gas_limit = int(estimated_gas * 1.5)
         except Exception as est_error:
-            print(f"⚠️ Gas estimation failed: {est_error}")
-            print(f"💡 Using fallback gas limit of 2,000,000")
+            logger.warning("Gas estimation failed, using fallback gas limit of 2,000,000: %s", est_error)
             gas_limit = 2_000_000
+            record_fallback("payout", "gas_limit_default")
 
         # 4. Get current gas price and add buffer for L2
         base_gas_price = w3.eth.gas_price
         gas_price = int(base_gas_price * 1.5)  # 50% buffer for L2 data fees
-        
-        print(f"⛽ Gas Limit: {gas_limit:,}")
-        print(f"💰 Gas Price: {gas_price:,} wei ({w3.from_wei(gas_price, 'gwei'):.2f} gwei)")
+        observe_stage("payout", "gas_estimation", stage_started)
+
+        logger.debug("Gas limit: %s, gas price: %s wei", gas_limit, gas_price)
 
         # 5. Build the transaction (Legacy style for Mantle compatibility)
         tx_data = optic_gov_contract.functions.releaseMilestone(
@@ -205,44 +235,89 @@ async def release_funds_mantle(project_on_chain_id: int, milestone_index: int):
         })
 
         # 6. Sign and Broadcast
+        stage_started = time.perf_counter()
         signed_tx = w3.eth.account.sign_transaction(tx_data, ORACLE_PRIVATE_KEY)
         tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+        observe_stage("payout", "broadcast", stage_started)
+        return tx_hash
+
+async def release_funds_mantle(project_on_chain_id: int, milestone_index: int):
+    """
+    Release milestone funds on Mantle blockchain
+    
+    Args:
+        project_on_chain_id: The on-chain project ID (integer)
+        milestone_index: The milestone index FROM YOUR DB (1-based)
+    """
+    try:
+        # Convert to pure integers
+        p_id = int(project_on_chain_id)
+        m_idx = int(milestone_index) - 1  # DB uses 1-based, blockchain uses 0-based
+        
+        logger.info("Releasing funds: project=%s milestone=%s (DB index %s)", p_id, m_idx, milestone_index)
+
+        # 1. CRITICAL: Check if milestone exists on-chain first
+        stage_started = time.perf_counter()
+        try:
+            milestone_info = await asyncio.to_thread(optic_gov_contract.functions.getMilestone(p_id, m_idx).call)
+            observe_stage("payout", "precheck", stage_started)
+            logger.debug("Milestone info: amount=%s completed=%s released=%s", milestone_info[1], milestone_info[2], milestone_info[3])
+            
+            if milestone_info[2]:  # isCompleted
+                logger.warning("Milestone already marked as completed on-chain")
+                if milestone_info[3]:  # isReleased
+                    logger.error("Funds already released for this milestone")
+                    record_outcome("payout", "already_released")
+                    return None
+        except Exception as e:
+            logger.error(
+                "Could not fetch milestone info: %s. Make sure project %s exists on-chain with at least %s milestones",
+                e, p_id, m_idx + 1
+            )
+            record_outcome("payout", "precheck_failed")
+            return None
+
+        # 2-6. Nonce, gas, sign and broadcast, off the event loop and under the oracle nonce lock
+        tx_hash = await asyncio.to_thread(send_release_transaction, p_id, m_idx)
+        tx_hash_hex = "0x" + tx_hash.hex() if not tx_hash.hex().startswith("0x") else tx_hash.hex()
         
-        print(f"🚀 BROADCASTED: {tx_hash.hex()}")
-        print(f"🔗 View on Explorer: https://sepolia.mantlescan.xyz/tx/{tx_hash.hex()}")
+        logger.info("Broadcasted %s (https://sepolia.mantlescan.xyz/tx/%s), waiting for confirmation", tx_hash_hex, tx_hash_hex)
+        progress_bus.publish("payout_broadcast", tx_hash=tx_hash_hex)
         
-        # 7. Wait for receipt with longer timeout
-        print(f"⏳ Waiting for confirmation...")
-        receipt = w3.eth.wait_for_transaction_receipt(tx_hash, timeout=180)
+        # 7. Wait for receipt with longer timeout (in a thread: polling must not stall the event loop)
+        stage_started = time.perf_counter()
+        receipt = await asyncio.to_thread(w3.eth.wait_for_transaction_receipt, tx_hash, timeout=180)
+        observe_stage("payout", "receipt", stage_started)
         
         if receipt.status == 1:
-            print(f"✅ BLOCKCHAIN CONFIRMED")
-            print(f"   Gas Used: {receipt.gasUsed:,}")
-            print(f"   Block: {receipt.blockNumber}")
-            return tx_hash.hex()
+            logger.info("Blockchain confirmed: gas_used=%s block=%s", receipt.gasUsed, receipt.blockNumber)
+            record_outcome("payout", "confirmed")
+            progress_bus.publish("payout_confirmed", tx_hash=tx_hash_hex, block=receipt.blockNumber)
+            return "0x" + tx_hash.hex() if not tx_hash.hex().startswith("0x") else tx_hash.hex()
         else:
-            print(f"❌ TRANSACTION REVERTED ON-CHAIN")
-            print(f"   Receipt: {receipt}")
+            logger.error("Transaction reverted on-chain: %s", receipt)
+            record_outcome("payout", "reverted")
+            progress_bus.publish("payout_reverted", tx_hash=tx_hash_hex)
             return None
 
     except ValueError as e:
         error_data = str(e)
-        print(f"❌ TRANSACTION REJECTED: {error_data}")
+        logger.error("Transaction rejected: %s", error_data)
         
         # Parse common errors
         if "insufficient funds" in error_data.lower():
-            print(f"💡 FIX: Add more MNT to oracle wallet: {ORACLE_ADDRESS}")
+            logger.error("Fix: add more MNT to oracle wallet %s", ORACLE_ADDRESS)
         elif "nonce too low" in error_data.lower():
-            print(f"💡 FIX: Another transaction is pending. Wait or increase nonce.")
+            logger.error("Fix: another transaction is pending. Wait or increase nonce.")
         elif "already known" in error_data.lower():
-            print(f"💡 FIX: Transaction already submitted. Check mempool.")
+            logger.error("Fix: transaction already submitted. Check mempool.")
         
+        record_outcome("payout", "rejected")
         return None
         
     except Exception as e:
-        print(f"❌ MANTLE FATAL ERROR: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Mantle fatal error: %s", e)
+        record_outcome("payout", "error")
         return None
 
 
@@ -252,44 +327,32 @@ async def check_project_on_chain(project_on_chain_id: int, db: Session):
     try:
         p_id = int(project_on_chain_id)
         
-        print(f"\n{'='*60}")
-        print(f"🔍 CHECKING ON-CHAIN STATE: Project {p_id}")
-        print(f"{'='*60}")
-        
         # Get project from contract
         project_data = optic_gov_contract.functions.projects(p_id).call()
         
-        print(f"📊 Project Data:")
-        print(f"   Funder: {project_data[0]}")
-        print(f"   Contractor: {project_data[1]}")
-        print(f"   Total Budget: {w3.from_wei(project_data[2], 'ether')} MNT")
-        print(f"   Funds Released: {w3.from_wei(project_data[3], 'ether')} MNT")
-        print(f"   Milestone Count: {project_data[4]}")
+        logger.info(
+            "On-chain project %s: funder=%s contractor=%s budget=%s MNT released=%s MNT milestones=%s",
+            p_id, project_data[0], project_data[1],
+            w3.from_wei(project_data[2], 'ether'), w3.from_wei(project_data[3], 'ether'), project_data[4]
+        )
         
         # Check each milestone
         milestone_count = project_data[4]
-        print(f"\n📋 Milestones:")
         for i in range(milestone_count):
             m = optic_gov_contract.functions.getMilestone(p_id, i).call()
-            print(f"   [{i}] {m[0][:50]}...")
-            print(f"       Amount: {w3.from_wei(m[1], 'ether')} MNT")
-            print(f"       Completed: {m[2]} | Released: {m[3]}")
+            logger.info(
+                "  [%s] %s amount=%s MNT completed=%s released=%s",
+                i, m[0][:50], w3.from_wei(m[1], 'ether'), m[2], m[3]
+            )
         
         # Check oracle address
         contract_oracle = optic_gov_contract.functions.oracleAddress().call()
         oracle_match = contract_oracle.lower() == ORACLE_ADDRESS.lower()
         
-        print(f"\n🔑 Oracle Check:")
-        print(f"   Contract Oracle: {contract_oracle}")
-        print(f"   Backend Oracle: {ORACLE_ADDRESS}")
-        print(f"   Match: {'✅' if oracle_match else '❌'}")
+        logger.info("Oracle check: contract=%s backend=%s match=%s", contract_oracle, ORACLE_ADDRESS, oracle_match)
         
         if not oracle_match:
-            print(f"\n❌ CRITICAL: Oracle address mismatch!")
-            print(f"   Your backend cannot release funds.")
-            print(f"   Update contract or use correct private key.")
-        
-        print(f"{'='*60}\n")
+            logger.critical("Oracle address mismatch! Backend cannot release funds. Update contract or use correct private key.")
         
         return {
             "exists": True,
@@ -298,31 +361,15 @@ async def check_project_on_chain(project_on_chain_id: int, db: Session):
         }
         
     except Exception as e:
-        print(f"❌ Project {p_id} does NOT exist on-chain: {e}")
+        logger.error("Project %s does NOT exist on-chain: %s", p_id, e)
         return {"exists": False, "error": str(e)}
 
-def extract_video_location(video_path: str):
-    try:
-        cmd = ['ffprobe', '-v', 'quiet', '-print_format', 'json', '-show_format', video_path]
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        metadata = json.loads(result.stdout)
-        tags = metadata.get('format', {}).get('tags', {})
-        
-        lat_keys = ['location-lat', 'GPS_LATITUDE', 'com.apple.quicktime.location.ISO6709']
-        lon_keys = ['location-lon', 'GPS_LONGITUDE', 'com.apple.quicktime.location.ISO6709']
-        
-        lat, lon = None, None
-        for key in lat_keys:
-            if key in tags:
-                lat = float(tags[key])
-                break
-        for key in lon_keys:
-            if key in tags:
-                lon = float(tags[key])
-                break
-        return lat, lon
-    except Exception:
-        return None, None
+def index_project(project: Project):
+    """Keep the spatial index and map clusters in step with any write to a project's location, name or budget"""
+    project_locations.upsert(
+        project.id, project.project_latitude, project.project_longitude,
+        project.location_tolerance_km, project.name, project.total_budget
+    )
 
 # --- MODELS ---
 class ContractorRegister(BaseModel):
@@ -358,6 +405,7 @@ class ProjectCreate(BaseModel):
 class MilestoneGenerate(BaseModel):
     project_description: str
     total_budget: float
+    budget_currency: str = "MNT"  # "NGN" or "MNT"
 
 class ProjectUpdate(BaseModel):
     name: Optional[str] = None
@@ -383,12 +431,26 @@ class ConvertRequest(BaseModel):
     from_currency: str  # "NGN" or "MNT"
     to_currency: str    # "NGN" or "MNT"
 
+class BatchConvertRequest(BaseModel):
+    amounts: List[float]
+    directions: List[str]  # "MNT_TO_NGN"/"NGN_TO_MNT" per amount, or a single entry for all
+
+class HistoricalConvertRequest(BaseModel):
+    amounts: List[float]
+    timestamps: List[datetime]  # naive values are treated as UTC
+    direction: str = "MNT_TO_NGN"  # "MNT_TO_NGN" or "NGN_TO_MNT"
+
 class ManualMilestoneCreate(BaseModel):
     project_id: int
     description: str
     amount: float
     order_index: int
 
+class UploadCreate(BaseModel):
+    filename: str
+    length: int  # total bytes
+    sha256: Optional[str] = None  # hex digest of the whole file, checked on finalize
+
 class DemoApprovalRequest(BaseModel):
     project_id: int
     milestone_id: int
@@ -426,6 +488,7 @@ async def demo_approve_milestone(request: DemoApprovalRequest, db: Session = Dep
         milestone.status = "verified"
         milestone.is_completed = True
         db.commit()
+        invalidate_project(project.id)
         
         return {
             "success": True,
@@ -437,9 +500,7 @@ async def demo_approve_milestone(request: DemoApprovalRequest, db: Session = Dep
     except HTTPException:
         raise
     except Exception as e:
-        print(f"CRITICAL PAYMENT ERROR: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Critical payment error: %s", e)
         raise HTTPException(status_code=500, detail=f"Payment failed: {str(e)}")
 
 @app.post("/register")
@@ -519,6 +580,8 @@ async def create_test_data(db: Session = Depends(get_db)):
             db.add(milestone)
         
         db.commit()
+        invalidate_project(test_project.id)
+        index_project(test_project)
         return {"message": "Test data created", "project_id": test_project.id, "contractor_id": test_contractor.id}
     except Exception as e:
         db.rollback()
@@ -550,22 +613,22 @@ async def test_gemini_connection():
 async def convert_currency(request: ConvertRequest):
     """Convert between NGN and MNT"""
     try:
-        rate = get_mnt_ngn_rate()
+        snapshot = rate_service.snapshot()
         
         if request.from_currency.upper() == "NGN" and request.to_currency.upper() == "MNT":
-            converted_amount = convert_ngn_to_mnt(request.amount)
+            converted_amount = convert_ngn_to_mnt(request.amount, snapshot)
             return CurrencyConversion(
                 naira_amount=request.amount,
                 mnt_amount=converted_amount,
-                exchange_rate=rate,
+                exchange_rate=snapshot.mnt_ngn,
                 timestamp=datetime.now().isoformat()
             )
         elif request.from_currency.upper() == "MNT" and request.to_currency.upper() == "NGN":
-            converted_amount = convert_mnt_to_ngn(request.amount)
+            converted_amount = convert_mnt_to_ngn(request.amount, snapshot)
             return CurrencyConversion(
                 naira_amount=converted_amount,
                 mnt_amount=request.amount,
-                exchange_rate=rate,
+                exchange_rate=snapshot.mnt_ngn,
                 timestamp=datetime.now().isoformat()
             )
         else:
@@ -576,24 +639,31 @@ async def convert_currency(request: ConvertRequest):
 
 @app.post("/generate-milestones")
 async def generate_milestones(request: MilestoneGenerate):
-    try:
+    async def generate():
         prompt = f"""Generate 4-6 construction milestones for: {request.project_description}
 Budget: ${request.total_budget:,.2f}
 
 Return ONLY a JSON array like: ["Foundation excavation", "Concrete pouring", "Steel reinforcement"]"""
         
-        response = model.generate_content(prompt)
+        response, _ = await model_router.generate(prompt, pipeline="milestones")
         response_text = response.text.strip()
         
         if '[' in response_text and ']' in response_text:
             start = response_text.find('[')
             end = response_text.rfind(']') + 1
             json_text = response_text[start:end]
-            milestones = json.loads(json_text)
-        else:
-            raise ValueError('AI did not return valid JSON')
-        
-        return {"milestones": milestones}
+            return json.loads(json_text)
+        raise ValueError('AI did not return valid JSON')
+
+    try:
+        # Near-identical projects ("construct borehole in X LGA") reuse one generated template
+        budget_mnt = request.total_budget
+        if request.budget_currency.upper() == "NGN":
+            budget_mnt = convert_ngn_to_mnt(request.total_budget)
+        milestones, cached = await milestone_cache.get_or_generate(
+            request.project_description, budget_mnt, generate
+        )
+        return {"milestones": milestones, "cached": cached}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"AI milestone generation failed: {str(e)}")
 
@@ -618,11 +688,12 @@ async def create_project(project: ProjectCreate, db: Session = Depends(get_db)):
     # Convert budget to MNT if provided in NGN
     budget_mnt = project.total_budget
     budget_ngn = project.total_budget
+    snapshot = rate_service.snapshot()
     
     if project.budget_currency.upper() == "NGN":
-        budget_mnt = convert_ngn_to_mnt(project.total_budget)
+        budget_mnt = convert_ngn_to_mnt(project.total_budget, snapshot)
     else:
-        budget_ngn = convert_mnt_to_ngn(project.total_budget)
+        budget_ngn = convert_mnt_to_ngn(project.total_budget, snapshot)
     
     # Create project (store MNT amount for blockchain consistency)
     db_project = Project(
@@ -635,7 +706,8 @@ async def create_project(project: ProjectCreate, db: Session = Depends(get_db)):
         project_longitude=project.project_longitude,
         location_tolerance_km=project.location_tolerance_km,
         gov_wallet=project.gov_wallet,
-        on_chain_id=project.on_chain_id
+        on_chain_id=project.on_chain_id,
+        exchange_rate_at_creation=snapshot.mnt_ngn
     )
     db.add(db_project)
     db.commit()
@@ -649,18 +721,19 @@ async def create_project(project: ProjectCreate, db: Session = Depends(get_db)):
     # If no milestones were sent, fall back to generating them (backward compatibility)
     if not milestone_descriptions and project.use_ai_milestones:
         try:
-            print(f"⚠️ WARNING: No milestones provided by frontend, generating new ones...")
+            logger.warning("No milestones provided by frontend, generating new ones")
             ai_response = await generate_milestones(MilestoneGenerate(
                 project_description=project.description,
-                total_budget=project.total_budget
+                total_budget=budget_mnt,
+                budget_currency="MNT"
             ))
             milestone_descriptions = ai_response["milestones"]
-            print(f"✨ AI Generated {len(milestone_descriptions)} milestones")
+            logger.info("AI generated %s milestones", len(milestone_descriptions))
         except Exception as e:
-            print(f"❌ AI Generation failed: {e}")
+            logger.error("AI milestone generation failed: %s", e)
             milestone_descriptions = ["Project Initial Phase", "Main Construction", "Final Inspection"]
     
-    print(f"📋 Creating {len(milestone_descriptions)} milestones in database")
+    logger.debug("Creating %s milestones in database", len(milestone_descriptions))
     
     # Create milestone records (use MNT amount for milestones)
     if milestone_descriptions:
@@ -675,23 +748,40 @@ async def create_project(project: ProjectCreate, db: Session = Depends(get_db)):
             db.add(milestone)
     
     db.commit()
+    invalidate_project(db_project.id)
+    index_project(db_project)
     
-    print(f"✅ Project {db_project.id} created with {len(milestone_descriptions)} milestones")
+    logger.info("Project %s created with %s milestones", db_project.id, len(milestone_descriptions))
     
     return {
         "project_id": db_project.id, 
         "milestones_created": len(milestone_descriptions),
         "budget_mnt": budget_mnt,
         "budget_ngn": budget_ngn,
-        "exchange_rate": get_mnt_ngn_rate()
+        "exchange_rate": snapshot.mnt_ngn
     }
 
+def project_creation_rates(projects, snapshot: RateSnapshot) -> List[float]:
+    """Stored creation-time rates, with one vectorized history lookup for projects that predate the column"""
+    rates = [p.exchange_rate_at_creation for p in projects]
+    missing = [i for i, rate in enumerate(rates) if rate is None]
+    if missing:
+        timestamps = [to_epoch(projects[i].created_at) if projects[i].created_at else 0.0 for i in missing]
+        for i, rate in zip(missing, rate_history.rates_at(timestamps, snapshot.mnt_ngn).tolist()):
+            rates[i] = rate
+    return rates
+
 @app.get("/projects")
-async def get_all_projects(db: Session = Depends(get_db)):
+async def get_all_projects(request: Request, db: Session = Depends(get_db)):
+    return cached_json_response(request, "projects", lambda: (build_projects_list(db), ("projects",)))
+
+def build_projects_list(db: Session):
     projects = db.query(Project).all()
+    snapshot = rate_service.snapshot()
+    creation_rates = project_creation_rates(projects, snapshot)
 
     projects_with_currency = []
-    for project in projects:
+    for project, creation_rate in zip(projects, creation_rates):
         # SAFEGUARD: Handle None budget
         budget_mnt = project.total_budget if project.total_budget is not None else 0.0
 
@@ -700,7 +790,9 @@ async def get_all_projects(db: Session = Depends(get_db)):
             "name": project.name,
             "description": project.description,
             "total_budget_mnt": budget_mnt, # RETURN AS MNT
-            "total_budget_ngn": convert_mnt_to_ngn(budget_mnt), # Now safe
+            "total_budget_ngn": convert_mnt_to_ngn(budget_mnt, snapshot), # Now safe
+            "total_budget_ngn_at_creation": budget_mnt * creation_rate,
+            "exchange_rate_at_creation": creation_rate,
             "contractor_id": project.contractor_id,
             "ai_generated": project.ai_generated,
             "project_latitude": project.project_latitude,
@@ -714,13 +806,82 @@ async def get_all_projects(db: Session = Depends(get_db)):
 
     return {
         "projects": projects_with_currency,
-        "exchange_rate": get_mnt_ngn_rate()
+        "exchange_rate": snapshot.mnt_ngn
     }
 
-# main.py
+@app.get("/projects/near")
+async def get_projects_near(lat: float, lon: float, radius: float = 5.0, limit: int = 50):
+    """Project sites within `radius` km of a point, nearest first"""
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise HTTPException(status_code=422, detail="lat must be within ±90 and lon within ±180")
+    if not 0 < radius <= 500:
+        raise HTTPException(status_code=422, detail="radius must be between 0 and 500 km")
+    limit = max(1, min(limit, 500))
+    matches = project_locations.near(lat, lon, radius, limit)
+    return {
+        "projects": [
+            {
+                "id": project_id,
+                "name": site[3],
+                "project_latitude": site[0],
+                "project_longitude": site[1],
+                "location_tolerance_km": site[2],
+                "distance_km": round(distance, 3),
+                "within_geofence": distance <= site[2],
+            }
+            for project_id, distance, site in matches
+        ],
+        "count": len(matches),
+    }
+
+@app.get("/projects/clusters")
+async def get_project_clusters(bbox: str, zoom: int):
+    """
+    Map clusters for the dashboard: `bbox` is west,south,east,north in degrees
+    (west > east crosses the antimeridian), `zoom` the map zoom level. Cells
+    holding a single site carry its project id and name.
+    """
+    try:
+        west, south, east, north = (float(v) for v in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=422, detail="bbox must be west,south,east,north")
+    if not -90 <= south <= north <= 90:
+        raise HTTPException(status_code=422, detail="bbox latitudes must lie within ±90, south first")
+    if east - west < 360:
+        # Panned maps report longitudes past ±180
+        west, east = (west + 180) % 360 - 180, (east + 180) % 360 - 180
+    if not 0 <= zoom <= 24:
+        raise HTTPException(status_code=422, detail="zoom must be between 0 and 24")
+    snapshot = rate_service.snapshot()
+    clusters = project_locations.clusters(zoom, west, south, east, north)
+    return {
+        "zoom": zoom,
+        "clusters": [
+            {
+                "id": cell_id,
+                "count": count,
+                "latitude": round(lat, 6),
+                "longitude": round(lon, 6),
+                "budget_mnt": round(budget, 6),
+                "budget_ngn": round(convert_mnt_to_ngn(budget, snapshot), 2),
+                "project_id": project_id,
+                "name": name,
+            }
+            for cell_id, count, budget, lat, lon, project_id, name in clusters
+        ],
+        "total": sum(c[1] for c in clusters),
+        "exchange_rate": snapshot.mnt_ngn,
+    }
 
 @app.get("/projects/{project_id}")
-async def get_project(project_id: int, db: Session = Depends(get_db)):
+async def get_project(project_id: int, request: Request, db: Session = Depends(get_db)):
+    return cached_json_response(
+        request,
+        f"project:{project_id}",
+        lambda: (build_project_dict(project_id, db), project_tags(project_id))
+    )
+
+def build_project_dict(project_id: int, db: Session):
     project = db.query(Project).filter(Project.id == project_id).first()
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
@@ -728,22 +889,28 @@ async def get_project(project_id: int, db: Session = Depends(get_db)):
     # Fetch milestones
     milestones = db.query(Milestone).filter(Milestone.project_id == project_id).all()
     
-    # 1. Calculate NGN equivalent using your existing conversion logic
-    # (Assuming you have a function called convert_mnt_to_ngn)
-    total_ngn = convert_mnt_to_ngn(project.total_budget)
+    # 1. Calculate NGN equivalents against one rate snapshot for the whole response
+    snapshot = rate_service.snapshot()
+    total_ngn = convert_mnt_to_ngn(project.total_budget, snapshot)
     
     project_dict = {c.name: getattr(project, c.name) for c in project.__table__.columns}
     
     # 2. Inject the calculated fields into the response
     project_dict["total_budget_mnt"] = project.total_budget
     project_dict["total_budget_ngn"] = total_ngn
+
+    # NGN figures as of creation don't move with the live rate
+    creation_rate = project_creation_rates([project], snapshot)[0]
+    project_dict["exchange_rate_at_creation"] = creation_rate
+    project_dict["total_budget_ngn_at_creation"] = (project.total_budget or 0.0) * creation_rate
     
     project_dict["milestones"] = [
         {
             "id": m.id,
             "description": m.description,
             "amount": m.amount,
-            "amount_ngn": convert_mnt_to_ngn(m.amount), # Convert per milestone too
+            "amount_ngn": convert_mnt_to_ngn(m.amount, snapshot), # Convert per milestone too
+            "amount_ngn_at_creation": m.amount * creation_rate,
             "status": m.status,
             "order_index": m.order_index
         } for m in milestones
@@ -752,14 +919,17 @@ async def get_project(project_id: int, db: Session = Depends(get_db)):
     return project_dict
 
 @app.get("/milestones/{milestone_id}/project")
-async def get_project_by_milestone(milestone_id: int, db: Session = Depends(get_db)):
+async def get_project_by_milestone(milestone_id: int, request: Request, db: Session = Depends(get_db)):
     """Get project data by milestone ID"""
-    milestone = db.query(Milestone).filter(Milestone.id == milestone_id).first()
-    if not milestone:
-        raise HTTPException(status_code=404, detail="Milestone not found")
-    
-    # Return the project data for this milestone
-    return await get_project(milestone.project_id, db)
+    def build():
+        milestone = db.query(Milestone).filter(Milestone.id == milestone_id).first()
+        if not milestone:
+            raise HTTPException(status_code=404, detail="Milestone not found")
+        
+        # Return the project data for this milestone
+        return build_project_dict(milestone.project_id, db), project_tags(milestone.project_id)
+
+    return cached_json_response(request, f"milestone-project:{milestone_id}", build)
 
 @app.put("/projects/{project_id}")
 async def update_project(project_id: int, project_update: ProjectUpdate, db: Session = Depends(get_db)):
@@ -772,6 +942,8 @@ async def update_project(project_id: int, project_update: ProjectUpdate, db: Ses
     
     db.commit()
     db.refresh(project)
+    invalidate_project(project_id)
+    index_project(project)
     return project
 
 @app.put("/projects/{project_id}/on-chain-id")
@@ -783,7 +955,8 @@ async def update_project_on_chain_id(project_id: int, on_chain_id: int, db: Sess
     
     project.on_chain_id = on_chain_id
     db.commit()
-    print(f"✅ Updated project {project_id} with on_chain_id: {on_chain_id}")
+    invalidate_project(project_id)
+    logger.info("Updated project %s with on_chain_id %s", project_id, on_chain_id)
     return {"success": True, "on_chain_id": on_chain_id}
 
 @app.delete("/projects/{project_id}")
@@ -795,6 +968,8 @@ async def delete_project(project_id: int, db: Session = Depends(get_db)):
     db.query(Milestone).filter(Milestone.project_id == project_id).delete()
     db.delete(project)
     db.commit()
+    invalidate_project(project_id)
+    project_locations.remove(project_id)
     return {"message": "Project deleted successfully"}
 
 class VerificationRequest(BaseModel):
@@ -802,42 +977,181 @@ class VerificationRequest(BaseModel):
     milestone_criteria: str
     project_id: int
     milestone_index: int
+    evidence_key: Optional[str] = None  # storage key from /upload-video; resolved from video_url when omitted
 
 class VerificationResponse(BaseModel):
     verified: bool
     confidence_score: int
     reasoning: str
     mantle_transaction: Optional[str] = None
+    evidence_cid: Optional[str] = None  # IPFS CID of the evidence, queued for on-chain anchoring
     primary_chain: Optional[str] = None
+    duplicate_of: Optional[List[dict]] = None  # earlier evidence this video nearly duplicates
+    geofence: Optional[dict] = None  # where the video was recorded relative to the project site
     error: Optional[str] = None
 
 # 2. Upload Endpoint
 @app.post("/upload-video")
 async def upload_video(video: UploadFile = File(...)):
     try:
-        file_extension = video.filename.split(".")[-1]
-        file_name = f"{uuid.uuid4()}.{file_extension}"
-        file_path = os.path.join(BASE_DIR, "static", "uploads", file_name)
-        
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(video.file, buffer)
-            
-        video_url = f"http://localhost:8000/static/uploads/{file_name}"
-        return {"video_url": video_url}
+        key = new_key(video.filename)
+        builder = CidBuilder()
+        # The IPFS CID is computed from the same read that stores the file
+        await storage.put_stream(CidReader(video.file, builder), key)
+        cid = builder.finish()
+        await asyncio.to_thread(evidence_manager.register, key, builder.size, cid)
+        return {"video_url": evidence_url(key), "evidence_key": key, "cid": cid}
     except Exception as e:
-        print(f"Upload Error: {e}")
+        logger.exception("Upload error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+# --- RESUMABLE UPLOADS ---
+# POST creates, HEAD reports the verified offset, PATCH appends a chunk at that
+# offset (Upload-Offset + Upload-Checksum headers), then POST .../finalize.
+
+def upload_headers(meta: dict) -> dict:
+    return {"Upload-Offset": str(meta["offset"]), "Upload-Length": str(meta["length"]), "Cache-Control": "no-store"}
+
+@app.post("/uploads", status_code=201)
+async def create_upload(upload: UploadCreate):
+    try:
+        meta = resumable_uploads.create(upload.filename, upload.length, upload.sha256)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return JSONResponse(
+        {"upload_id": meta["id"], "offset": 0, "length": meta["length"], "chunk_size": RESUMABLE_CHUNK_SIZE},
+        status_code=201,
+        headers={"Location": f"/uploads/{meta['id']}", **upload_headers(meta)}
+    )
+
+@app.head("/uploads/{upload_id}")
+async def upload_offset(upload_id: str):
+    try:
+        meta = resumable_uploads.status(upload_id)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return Response(status_code=200, headers=upload_headers(meta))
+
+@app.patch("/uploads/{upload_id}")
+async def upload_chunk(upload_id: str, request: Request):
+    try:
+        offset = int(request.headers["upload-offset"])
+        checksum = parse_checksum(request.headers["upload-checksum"])
+    except (KeyError, ValueError):
+        raise HTTPException(status_code=400, detail="Upload-Offset and Upload-Checksum headers are required")
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    try:
+        meta = await resumable_uploads.append(upload_id, offset, checksum, request.stream())
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return Response(status_code=204, headers=upload_headers(meta))
+
+@app.post("/uploads/{upload_id}/finalize")
+async def finalize_upload(upload_id: str):
+    async def store(path: str, filename: str, cid: str) -> str:
+        key = new_key(filename)
+        size = os.path.getsize(path)
+        await storage.put_file(path, key)
+        await asyncio.to_thread(evidence_manager.register, key, size, cid)
+        return key
+
+    try:
+        key, cid = await resumable_uploads.finalize(upload_id, store)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return {"video_url": evidence_url(key), "evidence_key": key, "cid": cid}
+
+@app.get("/evidence/{key}")
+async def get_evidence(key: str):
+    """Evidence bytes with Range support (local disk) or a presigned redirect (S3)"""
+    response = await storage.response(key)
+    evidence_manager.touch(key)
+    return response
+
+@app.delete("/uploads/{upload_id}")
+async def abort_upload(upload_id: str):
+    try:
+        resumable_uploads.abort(upload_id)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return {"message": "Upload aborted"}
+
 
 
-# Replace your verify_milestone endpoint with this version
 @app.post("/verify-milestone", response_model=VerificationResponse)
 async def verify_milestone(request: VerificationRequest, db: Session = Depends(get_db)):
-    print(f"\n{'='*60}\n🔍 STARTING VERIFICATION: Project {request.project_id}\n{'='*60}")
+    verification_id_var.set(uuid.uuid4().hex[:12])
+    return await run_verification(request, db)
+
+# Background verifications started through /verifications; kept referenced until done
+background_verifications = set()
+
+async def verify_in_background(verification_id: str, request: VerificationRequest):
+    verification_id_var.set(verification_id)
+    progress_bus.publish("started", project_id=request.project_id, milestone_index=request.milestone_index)
+    db = SessionLocal()
+    try:
+        result = await run_verification(request, db)
+        progress_bus.publish("completed", result=result.model_dump())
+    except HTTPException as e:
+        progress_bus.publish("failed", status_code=e.status_code, error=e.detail)
+    except Exception as e:
+        logger.exception("Background verification failed: %s", e)
+        progress_bus.publish("failed", status_code=500, error=str(e)[:200])
+    finally:
+        db.close()
+
+@app.post("/verifications", status_code=202)
+async def start_verification(request: VerificationRequest):
+    """
+    Starts a verification and returns at once; progress and the final result are
+    streamed from /verifications/{id}/events, so no client or proxy holds a request
+    open for the minutes Gemini and the payout can take.
+    """
+    verification_id = uuid.uuid4().hex[:12]
+    progress_bus.open(verification_id)
+    task = asyncio.create_task(verify_in_background(verification_id, request))
+    background_verifications.add(task)
+    task.add_done_callback(background_verifications.discard)
+    return {
+        "verification_id": verification_id,
+        "events_url": f"/verifications/{verification_id}/events",
+        "status_url": f"/verifications/{verification_id}",
+    }
+
+@app.get("/verifications/{verification_id}")
+async def get_verification(verification_id: str):
+    stream = progress_bus.get(verification_id)
+    if stream is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired verification")
+    stages = [stage for _, stage, _ in stream.events]
+    status = stages[-1] if stages and stages[-1] in TERMINAL_STAGES else "running"
+    return {"verification_id": verification_id, "status": status, "stages": stages, "result": stream.result}
+
+@app.get("/verifications/{verification_id}/events")
+async def verification_events(verification_id: str, request: Request, last_event_id: int = 0):
+    """Server-sent events, one per stage; reconnecting with Last-Event-ID resumes after that event"""
+    if progress_bus.get(verification_id) is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired verification")
+    header = request.headers.get("last-event-id")
+    if header and header.isdigit():
+        last_event_id = int(header)
+    return StreamingResponse(
+        progress_bus.events(verification_id, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def run_verification(request: VerificationRequest, db: Session) -> VerificationResponse:
+    logger.info("Starting verification: project=%s milestone=%s", request.project_id, request.milestone_index)
     
     temp_file_path = None
-    video_file = None
+    video_sha256 = None
+    geofence = None
+    video_hashes, duplicates, evidence_ref = [], [], None
     should_delete_temp = False  # Track if we need to delete temp file
+    pending_link = None  # (key, project id, milestone) linked "pending" and still awaiting a verdict
     
     try:
         # 1. Database Check
@@ -846,67 +1160,129 @@ async def verify_milestone(request: VerificationRequest, db: Session = Depends(g
             raise HTTPException(status_code=404, detail="Project not found")
 
         # 2. Get Video File Path
-        print("📁 Locating video file...")
-        
-        # Check if URL is local (served by this same server)
-        if "localhost:8000" in request.video_url or "127.0.0.1:8000" in request.video_url:
-            # Extract filename from URL and read directly from disk
-            video_filename = request.video_url.split("/")[-1]
-            temp_file_path = os.path.join(BASE_DIR, "static", "uploads", video_filename)
-            
-            if not os.path.exists(temp_file_path):
-                raise HTTPException(status_code=404, detail=f"Video file not found: {video_filename}")
-            
+        logger.debug("Locating video file")
+        stage_started = time.perf_counter()
+        
+        # Evidence we stored is read from storage by key, never fetched back over HTTP
+        evidence_key = request.evidence_key or key_from_url(request.video_url)
+        evidence_cid = None
+        if evidence_key:
+            temp_file_path, should_delete_temp = await storage.local_path(evidence_key)
+            evidence_manager.touch(evidence_key)
+            # Pending evidence is never evicted while the verification runs
+            await asyncio.to_thread(evidence_manager.link, evidence_key, project.id, request.milestone_index, "pending")
+            pending_link = (evidence_key, project.id, request.milestone_index)
+            evidence_cid = await asyncio.to_thread(evidence_manager.cid_for, evidence_key)
+            if evidence_cid and project.on_chain_id:
+                evidence_anchor.enqueue(int(project.on_chain_id), request.milestone_index - 1, evidence_cid)
             file_size = os.path.getsize(temp_file_path)
-            print(f"✅ Found local video: {file_size / 1024 / 1024:.2f} MB")
-            
-            # We'll use this file directly, no need to copy
-            should_delete_temp = False
+            logger.info("Found stored video %s: %.2f MB", evidence_key, file_size / 1024 / 1024)
+            progress_bus.publish("evidence_received", evidence_key=evidence_key, size_bytes=file_size, cid=evidence_cid)
         else:
-            # External URL - download it
-            print("📥 Downloading external video...")
-            response_video = requests.get(request.video_url, stream=True, timeout=60)
-            response_video.raise_for_status()
-            
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4")
-            temp_file_path = temp_file.name
-            
-            with open(temp_file_path, 'wb') as f:
-                for chunk in response_video.iter_content(chunk_size=8192):
-                    f.write(chunk)
-            
-            file_size = os.path.getsize(temp_file_path)
-            print(f"✅ Video downloaded: {file_size / 1024 / 1024:.2f} MB")
+            # External URL - stream it over the shared pool, hashing as it lands
+            logger.info("Downloading external video")
+            with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as temp_file:
+                temp_file_path = temp_file.name
             should_delete_temp = True
-        
-        # 3. Upload to Gemini
-        print("📤 Uploading to Gemini...")
-        try:
-            video_file = genai.upload_file(
-                path=temp_file_path, 
-                display_name=f"milestone-{request.project_id}-{request.milestone_index}"
+            
+            file_size, video_sha256 = await http_client.download(request.video_url, temp_file_path, timeout=60)
+            logger.info("Video downloaded: %.2f MB (sha256 %s)", file_size / 1024 / 1024, video_sha256[:12])
+            progress_bus.publish("evidence_received", size_bytes=file_size, sha256=video_sha256)
+        observe_stage("verification", "locate_download", stage_started)
+        
+        # Near-duplicate check: with PHASH_MODE=enforce, reused or re-encoded footage is rejected before any Gemini spend
+        if PHASH_ENABLED and not ffmpeg_available():
+            record_fallback("verification", "fingerprint_unavailable")
+        elif PHASH_ENABLED:
+            stage_started = time.perf_counter()
+            evidence_ref = evidence_key or f"sha256:{video_sha256}"
+            try:
+                video_hashes = await asyncio.to_thread(video_phashes, temp_file_path)
+            except Exception as e:
+                logger.warning("Could not fingerprint video: %s", e)
+                record_fallback("verification", "fingerprint_failed")
+                video_hashes = []
+            duplicates = fingerprint_index.find_duplicates(
+                video_hashes, evidence_ref, project.id, request.milestone_index
             )
-            print(f"✅ Uploaded to Gemini: {video_file.name}")
-        except Exception as upload_error:
-            print(f"❌ Gemini upload failed: {upload_error}")
-            raise Exception(f"Failed to upload video to AI: {str(upload_error)}")
-        
-        # 4. Wait for processing
-        print("⏳ Waiting for Gemini processing...")
-        max_wait = 60  # 60 seconds max
-        waited = 0
-        while video_file.state.name == "PROCESSING":
-            if waited >= max_wait:
-                raise Exception("Video processing timeout (60s)")
-            time.sleep(3)
-            waited += 3
-            video_file = genai.get_file(video_file.name)
-            print(f"   Status: {video_file.state.name} ({waited}s)")
-        
-        if video_file.state.name == "FAILED":
-            raise Exception(f"Gemini video processing failed: {video_file.state}")
-        
-        print(f"✅ Video ready: {video_file.state.name}")
+            observe_stage("verification", "fingerprint", stage_started)
+            progress_bus.publish("fingerprint_checked", duplicates=duplicates, mode=PHASH_MODE)
+            if duplicates:
+                logger.warning("Evidence %s nearly duplicates %s", evidence_ref, duplicates)
+            if duplicates and PHASH_MODE == "enforce":
+                record_outcome("verification", "duplicate_evidence")
+                if evidence_key:
+                    await asyncio.to_thread(evidence_manager.link, evidence_key, project.id, request.milestone_index, "rejected")
+                    pending_link = None
+                first = duplicates[0]
+                return VerificationResponse(
+                    verified=False,
+                    confidence_score=0,
+                    reasoning=(
+                        f"Video matches evidence already submitted for project {first['project_id']} "
+                        f"milestone {first['milestone_index']} ({first['matched_frames']:.0%} of frames)"
+                    ),
+                    evidence_cid=evidence_cid,
+                    duplicate_of=duplicates,
+                    error="Duplicate evidence"
+                )
+        
+        # Geofence: footage recorded away from the site is rejected before any Gemini spend
+        geofence_applies = (
+            GEOFENCE_MODE != "off" and project.project_latitude is not None and project.project_longitude is not None
+        )
+        if geofence_applies and not ffmpeg_available():
+            record_fallback("verification", "geofence_unavailable")
+        elif geofence_applies:
+            stage_started = time.perf_counter()
+            try:
+                track = await asyncio.to_thread(extract_gps_track, temp_file_path)
+            except Exception as e:
+                logger.warning("Could not read GPS track: %s", e)
+                track = None
+            if track is None:
+                record_fallback("verification", "no_location_metadata")
+            else:
+                geofence = validate_track(
+                    track, project.project_latitude, project.project_longitude, project.location_tolerance_km
+                )
+                geofence["matching_projects"] = [
+                    pid for pid, _, _ in project_locations.containing(geofence["latitude"], geofence["longitude"])
+                ][:10]
+                progress_bus.publish("geofence_checked", **geofence)
+            observe_stage("verification", "geofence", stage_started)
+            if geofence and not geofence["within"] and GEOFENCE_MODE == "enforce":
+                logger.warning(
+                    "Evidence track %.0f%% on site (max %.2f km) for project %s",
+                    geofence["on_site_fraction"] * 100, geofence["max_deviation_km"], project.id
+                )
+                record_outcome("verification", "outside_geofence")
+                if evidence_key:
+                    await asyncio.to_thread(evidence_manager.link, evidence_key, project.id, request.milestone_index, "rejected")
+                    pending_link = None
+                return VerificationResponse(
+                    verified=False,
+                    confidence_score=0,
+                    reasoning=(
+                        f"Only {geofence['on_site_fraction']:.0%} of the recording was made within "
+                        f"{geofence['tolerance_km']} km of the project site (typically "
+                        f"{geofence['distance_km']:.2f} km away, up to {geofence['max_deviation_km']:.2f} km)"
+                    ),
+                    evidence_cid=evidence_cid,
+                    geofence=geofence,
+                    error="Outside geofence"
+                )
+        
+        # 3-4. Upload to Gemini and wait for processing, unless this exact video is already there
+        logger.debug("Uploading to Gemini")
+        if video_sha256 is None:
+            video_sha256 = await asyncio.to_thread(file_sha256, temp_file_path)
+        video_file, reused = await gemini_files.get_or_upload(
+            temp_file_path, video_sha256,
+            display_name=f"milestone-{request.project_id}-{request.milestone_index}"
+        )
+        logger.info("Video ready: %s (%s)", video_file.name, "reused" if reused else "uploaded")
+        progress_bus.publish("gemini_ready", file=video_file.name, reused=reused)
         
         # 5. Create AI prompt
         prompt = f"""You are verifying construction milestone completion.
@@ -927,41 +1303,23 @@ Return ONLY valid JSON (no markdown, no code blocks):
 }}"""
 
         # 6. Call Gemini with retry logic
-        print("🤖 Asking Gemini for verification...")
+        logger.debug("Asking Gemini for verification")
+        progress_bus.publish("model_requested")
         response = None
-        last_error = None
-        
-        for attempt in range(3):
-            try:
-                print(f"   Attempt {attempt + 1}/3...")
-                
-                # Use generate_content with timeout
-                response = model.generate_content(
-                    [prompt, video_file],
-                    request_options={"timeout": 60}
-                )
-                
-                if response and response.text:
-                    print(f"✅ Gemini responded (attempt {attempt + 1})")
-                    break
-                else:
-                    print(f"⚠️ Empty response from Gemini")
-                    
-            except Exception as gen_error:
-                last_error = gen_error
-                print(f"⚠️ Attempt {attempt + 1} failed: {str(gen_error)[:100]}")
-                
-                # Check if it's a safety/blocking issue
-                if hasattr(response, 'prompt_feedback'):
-                    print(f"   Prompt feedback: {response.prompt_feedback}")
-                
-                if attempt < 2:  # Don't sleep on last attempt
-                    time.sleep(5)
-
-        # 7. Check if we got a response
-        if not response or not response.text:
-            error_msg = f"AI Oracle failed after 3 attempts. Last error: {str(last_error)[:200]}"
-            print(f"❌ {error_msg}")
+        stage_started = time.perf_counter()
+        try:
+            # Hedged across GEMINI_MODELS: first valid answer wins, the slower call is cancelled
+            response, model_used = await model_router.generate(
+                [prompt, video_file],
+                validate=lambda r: has_text(r) and "{" in r.text,
+                pipeline="verification"
+            )
+            logger.info("Gemini responded (%s)", model_used)
+            progress_bus.publish("model_answered", model=model_used)
+        except Exception as gen_error:
+            error_msg = f"AI Oracle failed on every configured model. Last error: {str(gen_error)[:200]}"
+            logger.error(error_msg)
+            record_outcome("verification", "ai_unavailable")
             
             # Return a safe default response instead of crashing
             return VerificationResponse(
@@ -970,9 +1328,12 @@ Return ONLY valid JSON (no markdown, no code blocks):
                 reasoning=error_msg,
                 error="AI verification service unavailable"
             )
+        finally:
+            observe_stage("verification", "generate_content", stage_started)
 
         # 8. Parse response
-        print("📝 Parsing AI response...")
+        logger.debug("Parsing AI response")
+        stage_started = time.perf_counter()
         response_text = response.text.strip()
         
         # Remove markdown code blocks if present
@@ -990,21 +1351,35 @@ Return ONLY valid JSON (no markdown, no code blocks):
                 result = json.loads(response_text)
                 
         except json.JSONDecodeError as je:
-            print(f"❌ JSON parse error: {je}")
-            print(f"   Raw response: {response_text[:500]}")
+            logger.error("JSON parse error: %s. Raw response: %s", je, response_text[:500])
             
             # Fallback: Try to extract key information
+            record_fallback("verification", "unparseable_ai_response")
             result = {
                 "verified": "true" in response_text.lower() or "verified" in response_text.lower(),
                 "confidence_score": 50,
                 "reasoning": f"Could not parse AI response properly. Raw: {response_text[:200]}"
             }
-
-        print(f"✅ Parsed result: verified={result.get('verified')}, score={result.get('confidence_score')}")
+        observe_stage("verification", "parse", stage_started)
+
+        logger.info("Parsed result: verified=%s score=%s", result.get('verified'), result.get('confidence_score'))
+        progress_bus.publish("verdict", verified=bool(result.get("verified")), confidence_score=result.get("confidence_score"))
+        if evidence_key:
+            verdict = "verified" if result.get("verified") and result.get("confidence_score", 0) >= 70 else "rejected"
+            await asyncio.to_thread(evidence_manager.link, evidence_key, project.id, request.milestone_index, verdict)
+            pending_link = None
+        result["evidence_cid"] = evidence_cid
+        result["geofence"] = geofence
+        result["duplicate_of"] = duplicates or None
 
         # 9. Blockchain Payout (if verified)
         if result.get("verified") and result.get("confidence_score", 0) >= 70:
-            print("💰 Verification passed! Attempting blockchain payout...")
+            logger.info("Verification passed, attempting blockchain payout")
+            # Only accepted evidence is fingerprinted, so a rejected upload never blocks later ones
+            if video_hashes:
+                await asyncio.to_thread(
+                    fingerprint_index.add, video_hashes, evidence_ref, project.id, request.milestone_index
+                )
             
             if project.on_chain_id:
                 try:
@@ -1017,6 +1392,7 @@ Return ONLY valid JSON (no markdown, no code blocks):
                     if tx_hash:
                         result["mantle_transaction"] = tx_hash
                         result["primary_chain"] = "mantle"
+                        record_outcome("verification", "paid")
                         
                         # Update local DB status
                         ms = db.query(Milestone).filter(
@@ -1028,20 +1404,25 @@ Return ONLY valid JSON (no markdown, no code blocks):
                             ms.status = "verified"
                             ms.is_completed = True
                             db.commit()
-                            print("✅ Database updated")
+                            invalidate_project(project.id)
+                            logger.debug("Milestone %s marked verified", ms.id)
                     else:
                         result["error"] = "AI verified, but blockchain transaction failed"
-                        print("❌ Blockchain transaction failed")
+                        logger.error("Blockchain transaction failed")
+                        record_outcome("verification", "payout_failed")
                         
                 except Exception as blockchain_error:
                     error_msg = f"Blockchain error: {str(blockchain_error)}"
                     result["error"] = error_msg
-                    print(f"❌ {error_msg}")
+                    logger.error(error_msg)
+                    record_outcome("verification", "payout_failed")
             else:
                 result["error"] = "Project not deployed to blockchain"
-                print("⚠️ No on_chain_id - skipping blockchain payout")
+                logger.warning("No on_chain_id - skipping blockchain payout")
+                record_outcome("verification", "verified_off_chain")
         else:
-            print(f"⏭️ Verification failed or low confidence - no payout")
+            logger.info("Verification failed or low confidence - no payout")
+            record_outcome("verification", "rejected")
 
         return VerificationResponse(**result)
         
@@ -1050,9 +1431,8 @@ Return ONLY valid JSON (no markdown, no code blocks):
         
     except Exception as e:
         error_msg = str(e)
-        print(f"🔥 CRITICAL FAILURE: {error_msg}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Verification failed: %s", error_msg)
+        record_outcome("verification", "error")
         
         # Return structured error instead of crashing
         return VerificationResponse(
@@ -1063,141 +1443,17 @@ Return ONLY valid JSON (no markdown, no code blocks):
         )
         
     finally:
+        # Evidence left "pending" (AI unavailable, errors) would never be evictable
+        if pending_link is not None:
+            await asyncio.to_thread(evidence_manager.link, *pending_link, "rejected")
         # Cleanup - only delete if we created a temp file
         if temp_file_path and should_delete_temp and os.path.exists(temp_file_path):
             try:
                 os.unlink(temp_file_path)
-                print("🧹 Cleaned up temp file")
+                logger.debug("Cleaned up temp file")
             except:
                 pass
-        
-        # Clean up Gemini file
-        if video_file:
-            try:
-                genai.delete_file(video_file.name)
-                print("🧹 Cleaned up Gemini file")
-            except:
-                pass
-
-        print(f"{'='*60}\n")
-
-@app.post("/verify-milestone", response_model=VerificationResponse)
-async def release_funds_mantle(project_on_chain_id: int, milestone_index: int):
-    """
-    Release milestone funds on Mantle blockchain
-    
-    Args:
-        project_on_chain_id: The on-chain project ID (integer)
-        milestone_index: The milestone index FROM YOUR DB (1-based)
-    """
-    try:
-        # Convert to pure integers
-        p_id = int(project_on_chain_id)
-        m_idx = int(milestone_index) - 1  # DB uses 1-based, blockchain uses 0-based
-        
-        print(f"🔄 RELEASING: Project {p_id}, Milestone {m_idx} (DB index: {milestone_index})")
-
-        # 1. CRITICAL: Check if milestone exists on-chain first
-        try:
-            milestone_info = optic_gov_contract.functions.getMilestone(p_id, m_idx).call()
-            print(f"📋 Milestone Info: Amount={milestone_info[1]}, Completed={milestone_info[2]}, Released={milestone_info[3]}")
-            
-            if milestone_info[2]:  # isCompleted
-                print(f"⚠️ WARNING: Milestone already marked as completed on-chain")
-                if milestone_info[3]:  # isReleased
-                    print(f"❌ ERROR: Funds already released for this milestone")
-                    return None
-        except Exception as e:
-            print(f"❌ ERROR: Could not fetch milestone info: {e}")
-            print(f"💡 TIP: Make sure project {p_id} exists on-chain with at least {m_idx + 1} milestones")
-            return None
-
-        # 2. Get the current nonce
-        nonce = w3.eth.get_transaction_count(ORACLE_ADDRESS)
-
-        # 3. FIXED: Let Web3 estimate the gas properly
-        # First, try to estimate gas to see what's actually needed
-        try:
-            estimated_gas = optic_gov_contract.functions.releaseMilestone(
-                p_id,
-                m_idx,
-                True
-            ).estimate_gas({
-                'from': ORACLE_ADDRESS,
-                'nonce': nonce
-            })
-            print(f"⛽ Estimated Gas: {estimated_gas}")
-            # Add 50% buffer to be safe
-            gas_limit = int(estimated_gas * 1.5)
-        except Exception as est_error:
-            print(f"⚠️ Gas estimation failed: {est_error}")
-            print(f"💡 Using fallback gas limit of 2,000,000")
-            gas_limit = 2_000_000
-
-        # 4. Get current gas price and add buffer for L2
-        base_gas_price = w3.eth.gas_price
-        gas_price = int(base_gas_price * 1.5)  # 50% buffer for L2 data fees
-        
-        print(f"⛽ Gas Limit: {gas_limit:,}")
-        print(f"💰 Gas Price: {gas_price:,} wei ({w3.from_wei(gas_price, 'gwei'):.2f} gwei)")
-
-        # 5. Build the transaction (Legacy style for Mantle compatibility)
-        tx_data = optic_gov_contract.functions.releaseMilestone(
-            p_id,
-            m_idx,
-            True
-        ).build_transaction({
-            'from': ORACLE_ADDRESS,
-            'nonce': nonce,
-            'gas': gas_limit,
-            'gasPrice': gas_price,
-            'chainId': 5003,  # Mantle Sepolia
-        })
-
-        # 6. Sign and Broadcast
-        signed_tx = w3.eth.account.sign_transaction(tx_data, ORACLE_PRIVATE_KEY)
-        tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
-        tx_hash_hex = "0x" + tx_hash.hex() if not tx_hash.hex().startswith("0x") else tx_hash.hex()
-        
-        print(f"🚀 BROADCASTED: {tx_hash_hex}")
-        print(f"🔗 View on Explorer: https://sepolia.mantlescan.xyz/tx/{tx_hash_hex}")
-        
-        # 7. Wait for receipt with longer timeout
-        print(f"⏳ Waiting for confirmation...")
-        receipt = w3.eth.wait_for_transaction_receipt(tx_hash, timeout=180)
-        
-        if receipt.status == 1:
-            print(f"✅ BLOCKCHAIN CONFIRMED")
-            print(f"   Gas Used: {receipt.gasUsed:,}")
-            print(f"   Block: {receipt.blockNumber}")
-            return "0x" + tx_hash.hex() if not tx_hash.hex().startswith("0x") else tx_hash.hex()
-        else:
-            print(f"❌ TRANSACTION REVERTED ON-CHAIN")
-            print(f"   Receipt: {receipt}")
-            return None
-
-    except ValueError as e:
-        error_data = str(e)
-        print(f"❌ TRANSACTION REJECTED: {error_data}")
-        
-        # Parse common errors
-        if "insufficient funds" in error_data.lower():
-            print(f"💡 FIX: Add more MNT to oracle wallet: {ORACLE_ADDRESS}")
-        elif "nonce too low" in error_data.lower():
-            print(f"💡 FIX: Another transaction is pending. Wait or increase nonce.")
-        elif "already known" in error_data.lower():
-            print(f"💡 FIX: Transaction already submitted. Check mempool.")
-        
-        return None
-        
-    except Exception as e:
-        print(f"❌ MANTLE FATAL ERROR: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return None
-
-
-
+        # The Gemini file stays registered for reuse; gemini_files expires it
 
 @app.get("/")
 async def root():
@@ -1207,26 +1463,63 @@ async def root():
 async def health_check():
     return {"status": "AI Oracle is watching"}
 
+@app.get("/readyz")
+async def readiness_check():
+    """Dependency readiness for load balancers: 503 when any required probe fails"""
+    result = await readiness.check()
+    return JSONResponse(result, status_code=200 if result["ready"] else 503)
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint"""
+    return metrics_response()
+
+@app.get("/admin/model-router", dependencies=[Depends(require_profile_token)])
+async def model_router_stats():
+    """Hedging rate, hedge wins and per-model latency behind the verification router"""
+    stats = dict(model_router.stats)
+    stats["hedge_rate"] = round(stats["hedges"] / stats["requests"], 3) if stats["requests"] else 0.0
+    return {"models": model_router.model_names, "stats": stats, "latency": model_router.latency_summary()}
+
+@app.get("/admin/profiles", dependencies=[Depends(require_profile_token)])
+async def list_profiles():
+    """Most recent request profiles, newest first"""
+    return {"profiles": profile_store.list()}
+
+@app.get("/admin/profiles/{profile_id}", dependencies=[Depends(require_profile_token)])
+async def download_profile(profile_id: str, format: str = "text", sort: str = "cumulative", limit: int = 50):
+    """format=text for a pstats report, format=pstats for a file loadable by pstats/snakeviz"""
+    profile = profile_store.get(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found (it may have been evicted)")
+    if format == "pstats":
+        return Response(
+            profile_as_pstats(profile),
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.prof"'}
+        )
+    return PlainTextResponse(profile_as_text(profile, sort, limit))
+
 @app.get("/mnt-rate")
 async def get_current_mnt_rate():
     """Get current MNT to NGN exchange rate"""
-    rate = get_mnt_ngn_rate()
+    snapshot = rate_service.snapshot()
     return {
-        "mnt_to_ngn_rate": rate,
+        "mnt_to_ngn_rate": snapshot.mnt_ngn,
         "timestamp": datetime.now().isoformat(),
-        "cache_age_seconds": time.time() - (mnt_ngn_cache["timestamp"] or 0)
+        "cache_age_seconds": snapshot.age
     }
 
 @app.get("/exchange-rate")
 async def get_exchange_rate_frontend():
     """Get current MNT to NGN exchange rate (frontend compatibility)"""
     try:
-        rate = get_mnt_ngn_rate()
+        snapshot = rate_service.snapshot()
         return {
-            "mnt_to_ngn": rate,
-            "ngn_to_mnt": 1 / rate if rate > 0 else 0,
+            "mnt_to_ngn": snapshot.mnt_ngn,
+            "ngn_to_mnt": snapshot.ngn_mnt,
             "timestamp": datetime.now().isoformat(),
-            "cached": time.time() - (mnt_ngn_cache["timestamp"] or 0) < CACHE_DURATION
+            "cached": snapshot.is_fresh()
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get exchange rate: {str(e)}")
@@ -1234,9 +1527,10 @@ async def get_exchange_rate_frontend():
 @app.get("/convert/ngn-to-mnt/{naira_amount}")
 async def convert_ngn_to_mnt_endpoint(naira_amount: float):
     """Quick convert NGN to MNT"""
-    rate = get_mnt_ngn_rate()
+    snapshot = rate_service.snapshot()
+    rate = snapshot.mnt_ngn
     if rate == 0: return {"error": "Rate unavailable"}
-    mnt_amount = naira_amount / rate
+    mnt_amount = snapshot.ngn_to_mnt(naira_amount)
     return {
         "naira_amount": naira_amount,
         "mnt_amount": mnt_amount,
@@ -1245,9 +1539,55 @@ async def convert_ngn_to_mnt_endpoint(naira_amount: float):
         "formatted_naira": f"₦{naira_amount:,.2f}"
     }
 
+@app.post("/convert/batch")
+async def convert_batch(request: BatchConvertRequest):
+    """Convert many amounts against a single rate snapshot in one round-trip"""
+    directions = [d.upper() for d in request.directions]
+    if any(d not in DIRECTIONS for d in directions):
+        raise HTTPException(status_code=400, detail="directions must be MNT_TO_NGN or NGN_TO_MNT")
+    if len(directions) not in (1, len(request.amounts)):
+        raise HTTPException(status_code=400, detail="directions must have one entry or one per amount")
+
+    snapshot = rate_service.snapshot()
+    amounts = np.asarray(request.amounts, dtype=np.float64)
+    to_ngn = np.broadcast_to(np.asarray(directions) == MNT_TO_NGN, amounts.shape)
+    converted = convert_amounts(amounts, np.full(amounts.shape, snapshot.mnt_ngn), to_ngn)
+
+    return {
+        "converted": converted.tolist(),
+        "exchange_rate": snapshot.mnt_ngn,
+        "rate_timestamp": datetime.utcfromtimestamp(snapshot.fetched_at).isoformat() + "Z" if snapshot.fetched_at else None,
+        "rate_source": snapshot.source
+    }
+
+@app.post("/convert/historical")
+async def convert_historical(request: HistoricalConvertRequest):
+    """Convert each amount at the exchange rate in force at its timestamp"""
+    direction = request.direction.upper()
+    if direction not in DIRECTIONS:
+        raise HTTPException(status_code=400, detail="direction must be MNT_TO_NGN or NGN_TO_MNT")
+    if len(request.amounts) != len(request.timestamps):
+        raise HTTPException(status_code=400, detail="amounts and timestamps must have the same length")
+
+    converted, rates = rate_history.convert_at(
+        request.amounts,
+        [to_epoch(ts) for ts in request.timestamps],
+        direction,
+        fallback=rate_service.snapshot().mnt_ngn
+    )
+    return {
+        "direction": direction,
+        "converted": converted.tolist(),
+        "exchange_rates": rates.tolist(),
+        "history_points": len(rate_history)
+    }
+
 @app.get("/milestones/{milestone_id}")
-async def get_milestone(milestone_id: int, db: Session = Depends(get_db)):
+async def get_milestone(milestone_id: int, request: Request, db: Session = Depends(get_db)):
     """Get milestone details"""
+    return cached_json_response(request, f"milestone:{milestone_id}", lambda: build_milestone_dict(milestone_id, db))
+
+def build_milestone_dict(milestone_id: int, db: Session):
     milestone = db.query(Milestone).filter(Milestone.id == milestone_id).first()
     if not milestone:
         raise HTTPException(status_code=404, detail="Milestone not found")
@@ -1262,7 +1602,7 @@ async def get_milestone(milestone_id: int, db: Session = Depends(get_db)):
         "order_index": milestone.order_index,
         "criteria": f"Verify completion of: {milestone.description}",
         "created_at": milestone.created_at
-    }
+    }, project_tags(milestone.project_id)
 
 @app.post("/milestones")
 async def create_manual_milestone(milestone: ManualMilestoneCreate, db: Session = Depends(get_db)):
@@ -1273,7 +1613,8 @@ async def create_manual_milestone(milestone: ManualMilestoneCreate, db: Session
         raise HTTPException(status_code=404, detail="Project not found")
 
     # Convert amount to MNT
-    amount_mnt = convert_ngn_to_mnt(milestone.amount) if milestone.amount > 0 else milestone.amount
+    snapshot = rate_service.snapshot()
+    amount_mnt = convert_ngn_to_mnt(milestone.amount, snapshot) if milestone.amount > 0 else milestone.amount
 
     # Create milestone
     db_milestone = Milestone(
@@ -1286,13 +1627,14 @@ async def create_manual_milestone(milestone: ManualMilestoneCreate, db: Session
     db.add(db_milestone)
     db.commit()
     db.refresh(db_milestone)
+    invalidate_project(milestone.project_id)
 
     return {
         "id": db_milestone.id,
         "project_id": db_milestone.project_id,
         "description": db_milestone.description,
         "amount": db_milestone.amount,
-        "amount_ngn": convert_mnt_to_ngn(db_milestone.amount),
+        "amount_ngn": convert_mnt_to_ngn(db_milestone.amount, snapshot),
         "status": db_milestone.status,
         "order_index": db_milestone.order_index,
         "created_at": db_milestone.created_at
@@ -1484,9 +1826,7 @@ async def sync_project_from_blockchain(project_id: int, db: Session = Depends(ge
         milestone_count = project_data[4]
         blockchain_total_budget = float(w3.from_wei(project_data[2], 'ether'))
         
-        print(f"\n{'='*60}")
-        print(f"🔄 SYNCING PROJECT {project_id} FROM BLOCKCHAIN")
-        print(f"{'='*60}")
+        logger.info("Syncing project %s from blockchain", project_id)
         
         # Get DB milestones
         db_milestones = db.query(Milestone).filter(
@@ -1497,7 +1837,7 @@ async def sync_project_from_blockchain(project_id: int, db: Session = Depends(ge
         
         for i, db_milestone in enumerate(db_milestones):
             if i >= milestone_count:
-                print(f"⚠️ Milestone {i} exists in DB but not on blockchain")
+                logger.warning("Milestone %s exists in DB but not on blockchain", i)
                 continue
             
             # Get blockchain milestone
@@ -1531,17 +1871,17 @@ async def sync_project_from_blockchain(project_id: int, db: Session = Depends(ge
                 "status": db_milestone.status
             })
             
-            print(f"✏️ Milestone {i}: {old_amount:.8f} → {bc_amount:.8f} MNT")
+            logger.debug("Milestone %s: %.8f -> %.8f MNT", i, old_amount, bc_amount)
         
         # Update project total budget
         old_budget = project.total_budget
         project.total_budget = blockchain_total_budget
         
         db.commit()
+        invalidate_project(project_id)
+        index_project(project)  # cluster budget sums follow the on-chain total
         
-        print(f"✅ Sync complete!")
-        print(f"   Budget: {old_budget:.8f} → {blockchain_total_budget:.8f} MNT")
-        print(f"{'='*60}\n")
+        logger.info("Sync complete: budget %.8f -> %.8f MNT", old_budget, blockchain_total_budget)
         
         return {
             "success": True,
@@ -1555,8 +1895,7 @@ async def sync_project_from_blockchain(project_id: int, db: Session = Depends(ge
         
     except Exception as e:
         db.rollback()
-        import traceback
-        traceback.print_exc()
+        logger.exception("Project sync failed: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
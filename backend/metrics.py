@@ -0,0 +1,111 @@
+import os
+import time
+
+from fastapi import Request, Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# Verification stages run from milliseconds (parse) to minutes (Gemini processing, receipts)
+STAGE_BUCKETS = (0.005, 0.025, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 90, 120, 180, 300)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "optic_http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+)
+STAGE_SECONDS = Histogram(
+    "optic_pipeline_stage_duration_seconds",
+    "Latency of individual verification/payout stages",
+    ["pipeline", "stage"],
+    buckets=STAGE_BUCKETS,
+)
+RETRIES = Counter(
+    "optic_pipeline_retries_total",
+    "Retried attempts within a pipeline stage",
+    ["pipeline", "stage"],
+)
+FALLBACKS = Counter(
+    "optic_pipeline_fallbacks_total",
+    "Times a stage fell back to a default instead of its primary path",
+    ["pipeline", "reason"],
+)
+HEDGES = Counter(
+    "optic_model_hedges_total",
+    "Hedged (second, concurrent) model requests sent after the latency threshold",
+    ["pipeline"],
+)
+MODEL_WINS = Counter(
+    "optic_model_wins_total",
+    "Model requests whose answer was used, by model and role (primary, hedge, fallback)",
+    ["pipeline", "model", "role"],
+)
+OUTCOMES = Counter(
+    "optic_pipeline_outcomes_total",
+    "Terminal outcome of each verification/payout run",
+    ["pipeline", "outcome"],
+)
+CACHE_LOOKUPS = Counter(
+    "optic_cache_lookups_total",
+    "Shared cache lookups by namespace and result (hit, miss, waited on another loader, backend error)",
+    ["namespace", "result"],
+)
+
+
+def observe_stage(pipeline: str, stage: str, started: float):
+    """Record a stage that began at `started` (a time.perf_counter() reading)"""
+    STAGE_SECONDS.labels(pipeline, stage).observe(time.perf_counter() - started)
+
+
+def record_retry(pipeline: str, stage: str):
+    RETRIES.labels(pipeline, stage).inc()
+
+
+def record_fallback(pipeline: str, reason: str):
+    FALLBACKS.labels(pipeline, reason).inc()
+
+
+def record_hedge(pipeline: str):
+    HEDGES.labels(pipeline).inc()
+
+
+def record_model_win(pipeline: str, model: str, role: str):
+    MODEL_WINS.labels(pipeline, model, role).inc()
+
+
+def record_outcome(pipeline: str, outcome: str):
+    OUTCOMES.labels(pipeline, outcome).inc()
+
+
+def record_cache(namespace: str, result: str):
+    CACHE_LOOKUPS.labels(namespace, result).inc()
+
+
+async def metrics_middleware(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template (/projects/{project_id}), never the raw path
+        route = request.scope.get("route")
+        route_label = getattr(route, "path", None) or "unmatched"
+        HTTP_REQUEST_SECONDS.labels(request.method, route_label, str(status)).observe(
+            time.perf_counter() - started
+        )
+
+
+def metrics_response() -> Response:
+    # Under several uvicorn workers, aggregate the per-process files instead
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
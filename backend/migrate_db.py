@@ -1,4 +1,4 @@
-from database import engine
+from database import engine, ExchangeRate, EvidenceFile, EvidenceFingerprint, MilestoneTemplate, GeminiFile
 from dotenv import load_dotenv
 from sqlalchemy import text
 
@@ -15,11 +15,24 @@ def migrate_db():
             conn.execute(text("ALTER TABLE projects ADD COLUMN IF NOT EXISTS location_tolerance_km FLOAT DEFAULT 1.0"))
             conn.execute(text("ALTER TABLE projects ADD COLUMN IF NOT EXISTS sui_project_id VARCHAR"))
             conn.execute(text("ALTER TABLE projects ADD COLUMN IF NOT EXISTS on_chain_id VARCHAR"))
+            conn.execute(text("ALTER TABLE projects ADD COLUMN IF NOT EXISTS exchange_rate_at_creation FLOAT"))
             
             # --- Milestones Table Updates (Fix for your current error) ---
             conn.execute(text("ALTER TABLE milestones ADD COLUMN IF NOT EXISTS status VARCHAR DEFAULT 'pending'"))
             
+            # --- Evidence Files Table Updates ---
+            conn.execute(text("ALTER TABLE IF EXISTS evidence_files ADD COLUMN IF NOT EXISTS cid VARCHAR"))
+            conn.execute(text("ALTER TABLE IF EXISTS evidence_files ALTER COLUMN size_bytes TYPE BIGINT"))
+            
             conn.commit()
+
+            # --- New Tables ---
+            ExchangeRate.__table__.create(bind=engine, checkfirst=True)
+            EvidenceFile.__table__.create(bind=engine, checkfirst=True)
+            EvidenceFingerprint.__table__.create(bind=engine, checkfirst=True)
+            MilestoneTemplate.__table__.create(bind=engine, checkfirst=True)
+            GeminiFile.__table__.create(bind=engine, checkfirst=True)
+
             print("✅ Database migration completed successfully")
         except Exception as e:
             print(f"❌ Migration error: {e}")
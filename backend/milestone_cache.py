@@ -0,0 +1,193 @@
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from sqlalchemy.orm import selectinload
+
+from database import SessionLocal, MilestoneTemplate, Project
+
+logger = logging.getLogger(__name__)
+
+MILESTONE_CACHE_SIZE = int(os.getenv("MILESTONE_CACHE_SIZE", "2048"))
+MILESTONE_CACHE_TTL = int(os.getenv("MILESTONE_CACHE_TTL", str(30 * 24 * 3600)))  # 30 days
+MILESTONE_CACHE_WARMUP = os.getenv("MILESTONE_CACHE_WARMUP", "false").lower() == "true"
+BUDGET_BUCKETS_PER_DECADE = 4  # budgets within ~1.8x of each other share a bucket
+
+# "in Ikeja LGA", "at Kuje community": the place rarely changes the milestones
+LOCATION_RE = re.compile(
+    r"\b(?:in|at|for)\s+[\w\s'-]{1,60}?\s+(?:lga|local government(?: area)?|state|community|ward|village|town)\b"
+)
+PUNCT_RE = re.compile(r"[^\w\s]")
+DIGITS_RE = re.compile(r"\d+")
+
+
+def normalize_description(text: str) -> str:
+    text = LOCATION_RE.sub(" ", text.lower())
+    text = DIGITS_RE.sub("#", PUNCT_RE.sub(" ", text))
+    return " ".join(text.split())
+
+
+def budget_bucket(budget: float) -> int:
+    if not budget or budget <= 0:
+        return -1
+    return math.floor(math.log10(budget) * BUDGET_BUCKETS_PER_DECADE)
+
+
+def template_key(description: str, budget_mnt: float) -> str:
+    # The unit is part of the key so templates seeded from NGN budgets never match MNT lookups
+    raw = f"{normalize_description(description)}|{budget_bucket(budget_mnt)}|MNT"
+    return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+
+class MilestoneCache:
+    """
+    Generated milestone lists keyed on (normalized description, MNT budget bucket).
+
+    A bounded in-memory LRU answers repeats without I/O; `milestone_templates`
+    keeps entries across restarts and workers. Entries expire after
+    MILESTONE_CACHE_TTL. Concurrent misses for the same key share one generation.
+    """
+
+    def __init__(self, size: int = MILESTONE_CACHE_SIZE, ttl: float = MILESTONE_CACHE_TTL):
+        self.size = size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (milestones, stored_at)
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+    def _get_memory(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry[1] > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def _put_memory(self, key: str, milestones: list, stored_at: float):
+        with self._lock:
+            self._entries[key] = (milestones, stored_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def _get_db(self, key: str):
+        db = SessionLocal()
+        try:
+            row = db.query(MilestoneTemplate).filter(MilestoneTemplate.key == key).first()
+            if row is None:
+                return None
+            # created_at is naive UTC (datetime.utcnow)
+            stored_at = row.created_at.replace(tzinfo=timezone.utc).timestamp() if row.created_at else 0
+            if time.time() - stored_at > self.ttl:
+                return None
+            row.hits = (row.hits or 0) + 1
+            row.last_used_at = datetime.utcnow()
+            db.commit()
+            return json.loads(row.milestones), stored_at
+        finally:
+            db.close()
+
+    def _put_db(self, key: str, description: str, budget_mnt: float, milestones: list):
+        db = SessionLocal()
+        try:
+            row = db.query(MilestoneTemplate).filter(MilestoneTemplate.key == key).first()
+            if row is None:
+                row = MilestoneTemplate(key=key, hits=0)
+                db.add(row)
+            row.description = normalize_description(description)
+            row.budget_bucket = budget_bucket(budget_mnt)
+            row.milestones = json.dumps(milestones)
+            row.created_at = datetime.utcnow()
+            row.last_used_at = row.created_at
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning("Could not persist milestone template: %s", e)
+        finally:
+            db.close()
+
+    async def get_or_generate(self, description: str, budget_mnt: float, generate):
+        """Returns (milestones, cached). Callers convert the budget to MNT; `generate` is an async callable producing the list."""
+        key = template_key(description, budget_mnt)
+        milestones = self._get_memory(key)
+        if milestones is not None:
+            return milestones, True
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight), True
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            try:
+                stored = await asyncio.to_thread(self._get_db, key)
+            except Exception as e:
+                logger.warning("Milestone template lookup failed: %s", e)
+                stored = None
+            if stored is not None:
+                milestones, cached = stored[0], True
+                self._put_memory(key, milestones, stored[1])
+            else:
+                milestones, cached = await generate(), False
+                self._put_memory(key, milestones, time.time())
+                await asyncio.to_thread(self._put_db, key, description, budget_mnt, milestones)
+            future.set_result(milestones)
+            return milestones, cached
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved so a lone failure isn't logged as unhandled
+            raise
+        finally:
+            del self._inflight[key]
+
+    def warm_up(self, limit: int = 5000):
+        """Blocking: seed templates from existing projects' milestone lists (Project.total_budget is MNT)"""
+        db = SessionLocal()
+        seeded = 0
+        try:
+            known = {k for (k,) in db.query(MilestoneTemplate.key)}
+            projects = (
+                db.query(Project).options(selectinload(Project.milestones))
+                .order_by(Project.id.desc()).limit(limit).all()
+            )
+            for project in projects:
+                if not project.description:
+                    continue
+                key = template_key(project.description, project.total_budget)
+                if key in known:
+                    continue
+                descriptions = [m.description for m in sorted(project.milestones, key=lambda m: m.order_index or 0)]
+                if len(descriptions) < 2:
+                    continue
+                db.add(MilestoneTemplate(
+                    key=key,
+                    description=normalize_description(project.description),
+                    budget_bucket=budget_bucket(project.total_budget),
+                    milestones=json.dumps(descriptions),
+                    hits=0,
+                ))
+                known.add(key)
+                seeded += 1
+            db.commit()
+        finally:
+            db.close()
+        logger.info("Seeded %s milestone templates from existing projects", seeded)
+        return seeded
+
+
+milestone_cache = MilestoneCache()
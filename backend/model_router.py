@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import google.generativeai as genai
+from google.generativeai import client as genai_client
+
+from metrics import record_hedge, record_model_win, record_retry
+
+logger = logging.getLogger(__name__)
+
+GEMINI_MODELS = [m.strip() for m in os.getenv("GEMINI_MODELS", "gemini-3-flash-preview,gemini-2.5-flash").split(",") if m.strip()]
+MODEL_TIMEOUT = float(os.getenv("MODEL_TIMEOUT", "60"))
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "0.9"))  # hedge once a call outlives p90
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))  # until then, hedge after HEDGE_DEFAULT_DELAY
+HEDGE_DEFAULT_DELAY = float(os.getenv("HEDGE_DEFAULT_DELAY", "20"))
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "2"))
+LATENCY_WINDOW = 200
+# Alternate API host, e.g. the offline stand-in in loadtest/fake_gemini.py. Plain-HTTP hosts
+# need the REST transport, whose async client can't be awaited, so calls then run in a thread.
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT", "").rstrip("/")
+GEMINI_REST_THREADS = int(os.getenv("GEMINI_REST_THREADS", "32"))  # hedges and hung calls each hold a thread
+
+
+def configure_gemini(api_key: str):
+    if not GEMINI_API_ENDPOINT:
+        genai.configure(api_key=api_key)
+        return
+    # The file service fetches its upload URLs from a discovery document on a fixed host
+    genai_client.GENAI_API_DISCOVERY_URL = f"{GEMINI_API_ENDPOINT}/$discovery/rest"
+    genai.configure(api_key=api_key, transport="rest", client_options={"api_endpoint": GEMINI_API_ENDPOINT})
+    logger.info("Gemini API calls go to %s", GEMINI_API_ENDPOINT)
+
+
+def has_text(response) -> bool:
+    try:
+        return bool(response and response.text)
+    except ValueError:  # blocked responses raise on .text
+        return False
+
+
+class ModelRouter:
+    """
+    Sends a request to the primary model and, if it outlives that model's recent
+    HEDGE_PERCENTILE latency, a hedged copy to the next model in GEMINI_MODELS.
+    The first valid answer wins and the other call is cancelled. A failed or
+    invalid answer falls through to the next model straight away; the primary
+    is tried once more at the end of the list.
+    """
+
+    def __init__(self, model_names=None):
+        self.model_names = list(model_names or GEMINI_MODELS)
+        self._models = {name: genai.GenerativeModel(name) for name in self.model_names}
+        # (seconds, censored): censored samples are calls cancelled or timed out before answering,
+        # so their latency is only known to be at least that long
+        self._latency = {name: deque(maxlen=LATENCY_WINDOW) for name in self.model_names}
+        self.stats = {"requests": 0, "hedges": 0, "hedge_wins": 0, "fallbacks": 0, "failures": 0}
+        self._executor = ThreadPoolExecutor(GEMINI_REST_THREADS, thread_name_prefix="gemini") if GEMINI_API_ENDPOINT else None
+
+    @property
+    def primary(self):
+        return self._models[self.model_names[0]]
+
+    def latency_percentile(self, name: str, q: float):
+        """
+        Kaplan-Meier estimate of the q-quantile of a model's latency. Counting only
+        winning calls would bias it low, since the slow calls are exactly the ones
+        that get hedged and cancelled. None when the window is empty. When censoring
+        hides the quantile, the longest observed wait is returned as a lower bound.
+        """
+        samples = sorted(self._latency[name])
+        if not samples:
+            return None
+        at_risk, survival = len(samples), 1.0
+        for seconds, censored in samples:
+            if not censored:
+                survival *= 1 - 1 / at_risk
+                if 1 - survival >= q:
+                    return seconds
+            at_risk -= 1
+        return samples[-1][0]
+
+    def hedge_delay(self, name: str) -> float:
+        if len(self._latency[name]) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY
+        return max(HEDGE_MIN_DELAY, self.latency_percentile(name, HEDGE_PERCENTILE))
+
+    async def _call(self, name: str, contents):
+        options = {"timeout": MODEL_TIMEOUT}
+        if GEMINI_API_ENDPOINT:
+            call = asyncio.get_running_loop().run_in_executor(
+                self._executor, lambda: self._models[name].generate_content(contents, request_options=options)
+            )
+        else:
+            call = self._models[name].generate_content_async(contents, request_options=options)
+        return await asyncio.wait_for(call, MODEL_TIMEOUT)
+
+    async def generate(self, contents, validate=has_text, pipeline: str = "verification"):
+        """Returns (response, model_name); raises the last error if every model failed"""
+        candidates = self.model_names + [self.model_names[0]]
+        running = {}  # task -> (model, role, started)
+        next_idx = 0
+        last_error = None
+        self.stats["requests"] += 1
+
+        def launch(role: str):
+            nonlocal next_idx
+            name = candidates[next_idx]
+            next_idx += 1
+            task = asyncio.ensure_future(self._call(name, contents))
+            running[task] = (name, role, time.perf_counter())
+            return time.monotonic() + self.hedge_delay(name)
+
+        hedge_at = launch("primary")
+        hedged = False
+        try:
+            while running:
+                timeout = None
+                if not hedged and next_idx < len(candidates):
+                    timeout = max(0.0, hedge_at - time.monotonic())
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    hedged = True
+                    self.stats["hedges"] += 1
+                    record_hedge(pipeline)
+                    logger.info("Hedging %s request to %s", pipeline, candidates[next_idx])
+                    launch("hedge")
+                    continue
+
+                for task in done:
+                    name, role, started = running.pop(task)
+                    try:
+                        response = task.result()
+                        valid = validate(response)
+                        if not valid:
+                            last_error = ValueError(f"{name} returned an empty or invalid response")
+                    except asyncio.TimeoutError as e:
+                        last_error, valid = e, False
+                        self._latency[name].append((time.perf_counter() - started, True))
+                    except Exception as e:
+                        last_error, valid = e, False
+                    if valid:
+                        self._latency[name].append((time.perf_counter() - started, False))
+                        if role == "hedge":
+                            self.stats["hedge_wins"] += 1
+                        record_model_win(pipeline, name, role)
+                        return response, name
+                    logger.warning("%s call to %s failed: %s", pipeline, name, str(last_error)[:100] or type(last_error).__name__)
+                    record_retry(pipeline, "generate_content")
+
+                if not running and next_idx < len(candidates):
+                    self.stats["fallbacks"] += 1
+                    hedge_at = launch("fallback")
+                    hedged = False
+        finally:
+            # Losers are cancelled; their late results or errors are discarded
+            for task, (name, _, started) in running.items():
+                self._latency[name].append((time.perf_counter() - started, True))
+                task.cancel()
+                task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+        self.stats["failures"] += 1
+        raise last_error or RuntimeError("No model returned a valid response")
+
+    def latency_summary(self) -> dict:
+        summary = {}
+        for name, samples in self._latency.items():
+            p50 = self.latency_percentile(name, 0.5)
+            summary[name] = {
+                "samples": len(samples),
+                "censored": sum(1 for _, censored in samples if censored),
+                "p50_s": round(p50, 2) if p50 is not None else None,
+                "hedge_after_s": round(self.hedge_delay(name), 2),
+            }
+        return summary
+
+
+model_router = ModelRouter()
@@ -0,0 +1,116 @@
+import cProfile
+import hmac
+import io
+import marshal
+import os
+import pstats
+import random
+import time
+import uuid
+from collections import deque
+from typing import Optional
+
+from fastapi import Header, HTTPException, Request
+
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")  # unset disables on-demand profiling and the admin endpoints
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))  # 0.01 = profile 1% of requests
+PROFILE_BUFFER_SIZE = int(os.getenv("PROFILE_BUFFER_SIZE", "20"))
+
+
+def token_matches(candidate: Optional[str]) -> bool:
+    return bool(PROFILE_TOKEN and candidate) and hmac.compare_digest(candidate, PROFILE_TOKEN)
+
+
+class ProfileStore:
+    """
+    The last PROFILE_BUFFER_SIZE request profiles, oldest evicted first.
+
+    cProfile measures the whole thread, so concurrent requests on the event loop
+    show up in a profile too; only one request is profiled at a time to keep that
+    noise bounded (and because Python 3.12+ allows a single active profiler).
+    """
+
+    def __init__(self, size: int = PROFILE_BUFFER_SIZE):
+        self._profiles = deque(maxlen=size)
+        self.busy = False
+
+    def list(self):
+        return [{k: v for k, v in p.items() if k != "stats"} for p in reversed(self._profiles)]
+
+    def get(self, profile_id: str):
+        for p in self._profiles:
+            if p["id"] == profile_id:
+                return p
+        return None
+
+    def add(self, request: Request, status: int, trigger: str, started: float, profiler: cProfile.Profile):
+        profiler.create_stats()
+        self._profiles.append({
+            "id": uuid.uuid4().hex[:12],
+            "method": request.method,
+            "path": request.url.path,
+            "status": status,
+            "trigger": trigger,
+            "started_at": started,
+            "duration_ms": round((time.time() - started) * 1000, 2),
+            "stats": profiler.stats,
+        })
+
+
+profile_store = ProfileStore()
+
+
+def profile_trigger(request: Request) -> Optional[str]:
+    if token_matches(request.headers.get("x-profile-token")) or token_matches(request.query_params.get("profile")):
+        return "requested"
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        return "sampled"
+    return None
+
+
+async def profiling_middleware(request: Request, call_next):
+    trigger = profile_trigger(request)
+    if trigger is None or profile_store.busy:
+        return await call_next(request)
+
+    profile_store.busy = True
+    profiler = cProfile.Profile()
+    started = time.time()
+    status = 500
+    profiler.enable()
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        profiler.disable()
+        profile_store.busy = False
+        profile_store.add(request, status, trigger, started, profiler)
+
+
+def require_profile_token(x_profile_token: Optional[str] = Header(None)):
+    """Dependency for the admin profile endpoints"""
+    if not token_matches(x_profile_token):
+        raise HTTPException(status_code=403, detail="Invalid or missing X-Profile-Token")
+
+
+def profile_as_text(profile: dict, sort: str = "cumulative", limit: int = 50) -> str:
+    out = io.StringIO()
+    stats = pstats.Stats(_StatsHolder(profile["stats"]), stream=out)
+    stats.sort_stats(sort).print_stats(limit)
+    return out.getvalue()
+
+
+def profile_as_pstats(profile: dict) -> bytes:
+    """Same bytes as Profile.dump_stats, loadable by pstats/snakeviz"""
+    return marshal.dumps(profile["stats"])
+
+
+class _StatsHolder:
+    """pstats.Stats accepts any object exposing create_stats()/stats"""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
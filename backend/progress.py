@@ -0,0 +1,99 @@
+import asyncio
+import json
+import logging
+import os
+import time
+
+from logging_config import verification_id_var
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_RETENTION = float(os.getenv("PROGRESS_RETENTION", "900"))  # finished streams stay replayable this long
+PROGRESS_MAX_STREAMS = int(os.getenv("PROGRESS_MAX_STREAMS", "1000"))
+PROGRESS_KEEPALIVE = float(os.getenv("PROGRESS_KEEPALIVE", "15"))  # below common proxy idle timeouts
+
+TERMINAL_STAGES = ("completed", "failed")
+
+
+class VerificationStream:
+    def __init__(self):
+        self.events = []  # (event_id, stage, data)
+        self.subscribers = set()
+        self.result = None
+        self.finished_at = None
+
+
+class ProgressBus:
+    """
+    Stage events for running verifications, keyed by verification id.
+
+    Every event is kept until the stream has been finished for
+    PROGRESS_RETENTION seconds, so a client that connects late or reconnects
+    with Last-Event-ID gets the full history before live events. Streams live in
+    this process: with several workers, the events request must reach the worker
+    that runs the verification (sticky sessions), as with any in-memory state here.
+    """
+
+    def __init__(self):
+        self._streams = {}
+
+    def open(self, verification_id: str):
+        self._prune()
+        self._streams[verification_id] = VerificationStream()
+
+    def get(self, verification_id: str):
+        return self._streams.get(verification_id)
+
+    def publish(self, stage: str, **data):
+        """Adds an event to the current verification's stream (from verification_id_var); no-op outside one"""
+        stream = self._streams.get(verification_id_var.get())
+        if stream is None or stream.finished_at is not None:
+            return
+        event = (len(stream.events) + 1, stage, {"stage": stage, "at": time.time(), **data})
+        stream.events.append(event)
+        if stage in TERMINAL_STAGES:
+            stream.result = data.get("result")
+            stream.finished_at = time.monotonic()
+        for queue in stream.subscribers:
+            queue.put_nowait(event)
+
+    async def events(self, verification_id: str, last_event_id: int = 0):
+        """Server-sent events: history after last_event_id, then live events until a terminal stage"""
+        stream = self._streams.get(verification_id)
+        if stream is None:
+            return
+        queue = asyncio.Queue()
+        stream.subscribers.add(queue)
+        try:
+            for event in list(stream.events):
+                if event[0] > last_event_id:
+                    queue.put_nowait(event)
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event_id, stage, data = await asyncio.wait_for(queue.get(), PROGRESS_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if event_id <= last_event_id:
+                    continue
+                last_event_id = event_id
+                yield f"id: {event_id}\nevent: {stage}\ndata: {json.dumps(data, default=str)}\n\n"
+                if stage in TERMINAL_STAGES:
+                    return
+        finally:
+            stream.subscribers.discard(queue)
+
+    def _prune(self):
+        now = time.monotonic()
+        for vid in [v for v, s in self._streams.items() if s.finished_at and now - s.finished_at > PROGRESS_RETENTION]:
+            del self._streams[vid]
+        # Oldest finished streams go first when there are too many
+        overflow = len(self._streams) - PROGRESS_MAX_STREAMS + 1
+        if overflow > 0:
+            finished = sorted((s.finished_at, v) for v, s in self._streams.items() if s.finished_at)
+            for _, vid in finished[:overflow]:
+                del self._streams[vid]
+
+
+progress_bus = ProgressBus()
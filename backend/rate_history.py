@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+
+from database import SessionLocal, ExchangeRate
+from rates import RateSnapshot
+
+logger = logging.getLogger(__name__)
+
+MNT_TO_NGN = "MNT_TO_NGN"
+NGN_TO_MNT = "NGN_TO_MNT"
+DIRECTIONS = (MNT_TO_NGN, NGN_TO_MNT)
+
+
+def to_epoch(dt: datetime) -> float:
+    """DB timestamps are naive UTC (datetime.utcnow); aware datetimes are converted"""
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def convert_amounts(amounts: np.ndarray, rates: np.ndarray, to_ngn: np.ndarray) -> np.ndarray:
+    """Element-wise MNT<->NGN conversion; `to_ngn` is a bool mask, rates are MNT->NGN"""
+    safe_rates = np.where(rates > 0, rates, np.inf)  # NGN->MNT at a zero rate yields 0
+    return np.where(to_ngn, amounts * rates, amounts / safe_rates)
+
+
+class RateHistory:
+    """
+    Every fetched rate, persisted to `exchange_rates` and mirrored in memory as two
+    sorted NumPy arrays so historical lookups are a single searchsorted.
+    """
+
+    def __init__(self):
+        # (times, rates) swapped as one tuple so readers always see a matching pair
+        self._series = (np.empty(0), np.empty(0))
+        self._lock = threading.Lock()
+        self._pending_writes = set()
+
+    def __len__(self):
+        return len(self._series[0])
+
+    def load(self):
+        db = SessionLocal()
+        try:
+            rows = db.query(ExchangeRate.fetched_at, ExchangeRate.mnt_ngn).order_by(ExchangeRate.fetched_at).all()
+        finally:
+            db.close()
+        times = np.fromiter((to_epoch(r.fetched_at) for r in rows), dtype=np.float64, count=len(rows))
+        rates = np.fromiter((r.mnt_ngn for r in rows), dtype=np.float64, count=len(rows))
+        with self._lock:
+            self._series = (times, rates)
+        logger.info("Loaded %s historical exchange rates", len(rows))
+
+    def latest(self):
+        times, rates = self._series
+        if not len(times):
+            return None
+        return RateSnapshot(float(rates[-1]), float(times[-1]), "persisted")
+
+    def append(self, snapshot: RateSnapshot):
+        with self._lock:
+            times, rates = self._series
+            if len(times) and snapshot.fetched_at <= times[-1]:
+                return
+            self._series = (np.append(times, snapshot.fetched_at), np.append(rates, snapshot.mnt_ngn))
+
+    def persist(self, snapshot: RateSnapshot):
+        db = SessionLocal()
+        try:
+            db.add(ExchangeRate(
+                mnt_ngn=snapshot.mnt_ngn,
+                fetched_at=datetime.fromtimestamp(snapshot.fetched_at, tz=timezone.utc).replace(tzinfo=None)
+            ))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning("Failed to persist exchange rate: %s", e)
+        finally:
+            db.close()
+
+    def record(self, snapshot: RateSnapshot):
+        """RateService.on_update hook: update memory now, write the row off the event loop"""
+        self.append(snapshot)
+        if snapshot.source == "shared":
+            return  # the worker that fetched it writes the row
+        task = asyncio.get_running_loop().create_task(asyncio.to_thread(self.persist, snapshot))
+        self._pending_writes.add(task)
+        task.add_done_callback(self._pending_writes.discard)
+
+    def rates_at(self, timestamps, fallback: float) -> np.ndarray:
+        """Rate in force at each unix timestamp; times before the first record use the earliest rate"""
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        times, rates = self._series
+        if not len(times):
+            return np.full(timestamps.shape, fallback, dtype=np.float64)
+        idx = np.searchsorted(times, timestamps, side="right") - 1
+        return rates[np.clip(idx, 0, len(rates) - 1)]
+
+    def convert_at(self, amounts, timestamps, direction: str, fallback: float):
+        """Convert each amount at the rate in force at its timestamp. Returns (converted, rates)."""
+        amounts = np.asarray(amounts, dtype=np.float64)
+        rates = self.rates_at(timestamps, fallback)
+        converted = convert_amounts(amounts, rates, np.full(amounts.shape, direction == MNT_TO_NGN))
+        return converted, rates
+
+
+rate_history = RateHistory()
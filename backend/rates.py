@@ -0,0 +1,186 @@
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+
+from cache_backend import cache_namespace
+from http_client import http_client
+
+logger = logging.getLogger(__name__)
+
+COINGECKO_URL = os.getenv(
+    "COINGECKO_URL",
+    "https://api.coingecko.com/api/v3/simple/price?ids=mantle&vs_currencies=usd"
+)
+USD_RATES_URL = os.getenv("USD_RATES_URL", "https://api.exchangerate-api.com/v4/latest/USD")
+
+RATE_TTL = int(os.getenv("RATE_TTL", "300"))  # 5 minutes
+RATE_REFRESH_AHEAD = float(os.getenv("RATE_REFRESH_AHEAD", "0.8"))  # refresh at 80% of TTL
+RATE_RETRY_DELAY = int(os.getenv("RATE_RETRY_DELAY", "30"))  # first retry after a failed fetch, doubling per failure
+RATE_RETRY_MAX_DELAY = int(os.getenv("RATE_RETRY_MAX_DELAY", "600"))
+RATE_STARTUP_TIMEOUT = float(os.getenv("RATE_STARTUP_TIMEOUT", "5"))
+FALLBACK_MNT_NGN_RATE = 1200
+RATE_CACHE_KEY = "mnt_ngn"
+
+# Shared between workers when CACHE_URL points at Redis
+rate_cache = cache_namespace("rates")
+
+
+@dataclass(frozen=True)
+class RateSnapshot:
+    """One immutable MNT/NGN reading; a request converts every amount against the same snapshot"""
+    mnt_ngn: float
+    fetched_at: float  # unix time, 0 for the built-in fallback
+    source: str = "live"
+
+    @property
+    def ngn_mnt(self) -> float:
+        return 1 / self.mnt_ngn if self.mnt_ngn > 0 else 0
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+    def is_fresh(self, ttl: float = RATE_TTL) -> bool:
+        return self.fetched_at > 0 and self.age < ttl
+
+    def mnt_to_ngn(self, mnt_amount: float) -> float:
+        return mnt_amount * self.mnt_ngn
+
+    def ngn_to_mnt(self, ngn_amount: float) -> float:
+        if self.mnt_ngn == 0: return 0
+        return ngn_amount / self.mnt_ngn
+
+
+async def fetch_mnt_ngn_rate() -> float:
+    """Upstream fetch: MNT/USD from CoinGecko times USD/NGN, both on the shared pool. Raises on any failure."""
+    status, data = await http_client.get_json(COINGECKO_URL, timeout=5)
+    if data is None:
+        raise ValueError(f"CoinGecko Error: {status}")
+    if "mantle" not in data or "usd" not in data["mantle"]:
+        raise ValueError("CoinGecko malformed response")
+    mnt_usd = data["mantle"]["usd"]
+
+    status, data = await http_client.get_json(USD_RATES_URL, timeout=5)
+    if data is None:
+        raise ValueError(f"Exchange rate API Error: {status}")
+    usd_ngn = data.get("rates", {}).get("NGN", 1500)
+
+    return mnt_usd * usd_ngn
+
+
+class RateService:
+    """
+    Serves the current rate from memory and refreshes it in the background.
+
+    - snapshot() never blocks: it returns the last good reading, even if stale
+      (stale-while-revalidate), and kicks off a refresh when it is.
+    - refresh() is single-flight: concurrent callers share one upstream fetch.
+    - After a failed fetch neither requests nor the loop try again until the
+      backoff (RATE_RETRY_DELAY, doubling up to RATE_RETRY_MAX_DELAY) has passed.
+    - start() runs a loop that refreshes ahead of expiry, so requests normally
+      never see a stale rate at all.
+    - Readings go through the shared cache: with several workers, the first one
+      due for a refresh fetches upstream and the rest adopt its reading
+      (source "shared"), so upstream traffic doesn't grow with the worker count.
+    """
+
+    def __init__(self, ttl: float = RATE_TTL):
+        self.ttl = ttl
+        self._snapshot = RateSnapshot(FALLBACK_MNT_NGN_RATE, 0.0, "fallback")
+        self._inflight = None
+        self._loop_task = None
+        self._failures = 0
+        self._retry_at = 0.0  # monotonic time before which no refresh is attempted after a failure
+        self.on_update = []  # callables taking the new RateSnapshot
+
+    def seed(self, snapshot: RateSnapshot):
+        """Start from a persisted reading instead of the built-in fallback"""
+        if snapshot and snapshot.fetched_at > self._snapshot.fetched_at:
+            self._snapshot = snapshot
+
+    def snapshot(self) -> RateSnapshot:
+        snap = self._snapshot
+        if not snap.is_fresh(self.ttl) and time.monotonic() >= self._retry_at:
+            self._refresh_in_background()
+        return snap
+
+    def _refresh_in_background(self):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return  # called off the event loop; the refresh loop will catch up
+        self.refresh()
+
+    def refresh(self) -> asyncio.Task:
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.get_running_loop().create_task(self._refresh())
+        return self._inflight
+
+    async def _refresh(self) -> RateSnapshot:
+        fetched_here = False
+
+        async def load():
+            nonlocal fetched_here
+            rate = await fetch_mnt_ngn_rate()
+            fetched_here = True
+            return {"mnt_ngn": rate, "fetched_at": time.time()}
+
+        try:
+            # Entries expire when a refresh-ahead is due, so whichever worker wakes first fetches
+            reading = await rate_cache.get_or_set(RATE_CACHE_KEY, load, self.ttl * RATE_REFRESH_AHEAD)
+        except Exception as e:
+            self._failures += 1
+            backoff = min(RATE_RETRY_DELAY * 2 ** (self._failures - 1), RATE_RETRY_MAX_DELAY)
+            self._retry_at = time.monotonic() + backoff
+            logger.warning(
+                "Exchange rate fetch failed (serving last rate, retrying in %ss): %s", backoff, str(e)[:50]
+            )
+            return self._snapshot
+        self._failures, self._retry_at = 0, 0.0
+        if reading["fetched_at"] <= self._snapshot.fetched_at:
+            return self._snapshot
+
+        snap = RateSnapshot(reading["mnt_ngn"], reading["fetched_at"], "live" if fetched_here else "shared")
+        self._snapshot = snap
+        for callback in self.on_update:
+            try:
+                callback(snap)
+            except Exception as e:
+                logger.exception("Rate update callback failed: %s", e)
+        return snap
+
+    def _next_delay(self) -> float:
+        if self._failures:
+            return max(self._retry_at - time.monotonic(), 1)
+        snap = self._snapshot
+        if snap.is_fresh(self.ttl):
+            return max(snap.fetched_at + self.ttl * RATE_REFRESH_AHEAD - time.time(), 1)
+        return RATE_RETRY_DELAY
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self._next_delay())
+            await asyncio.shield(self.refresh())
+
+    async def start(self):
+        # Give the first fetch a short window so early requests see a live rate
+        if not self._snapshot.is_fresh(self.ttl):
+            try:
+                await asyncio.wait_for(asyncio.shield(self.refresh()), RATE_STARTUP_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.warning("Initial exchange rate fetch timed out, serving last known rate until it lands")
+        self._loop_task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._loop_task:
+            self._loop_task.cancel()
+            try:
+                await self._loop_task
+            except asyncio.CancelledError:
+                pass
+            self._loop_task = None
+
+
+rate_service = RateService()
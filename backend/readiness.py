@@ -0,0 +1,71 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+READINESS_TTL = float(os.getenv("READINESS_TTL", "5"))  # seconds a result is reused for load balancer polls
+READINESS_PROBE_TIMEOUT = float(os.getenv("READINESS_PROBE_TIMEOUT", "2"))
+READINESS_THREADS = int(os.getenv("READINESS_THREADS", "4"))
+# Probes that are reported but don't take the instance out of rotation, e.g. "gemini,oracle_balance"
+READINESS_OPTIONAL = {p.strip() for p in os.getenv("READINESS_OPTIONAL", "").split(",") if p.strip()}
+
+
+class ReadinessChecker:
+    """
+    Runs blocking dependency probes concurrently in worker threads, each under its
+    own timeout, and caches the combined result for READINESS_TTL. Concurrent
+    callers during a check share it (single-flight).
+
+    Probes run on their own small executor, so a hung dependency can't take
+    threads from the rest of the app, and a probe whose previous run is still
+    stuck is reported as failing instead of being started again. The timeout
+    here only stops waiting; probes should also pass per-call timeouts to their
+    clients so the thread itself comes back.
+
+    A probe is a callable returning a detail value (or None) and raising on failure.
+    """
+
+    def __init__(self, probes: dict, ttl: float = READINESS_TTL, timeout: float = READINESS_PROBE_TIMEOUT):
+        self.probes = probes
+        self.ttl = ttl
+        self.timeout = timeout
+        self._result = None
+        self._checked_at = 0.0
+        self._inflight = None
+        self._executor = ThreadPoolExecutor(max_workers=READINESS_THREADS, thread_name_prefix="readiness")
+        self._running = {}  # probe name -> (concurrent future, started at)
+
+    async def _probe(self, name: str, probe):
+        started = time.perf_counter()
+        entry = {"ok": True, "required": name not in READINESS_OPTIONAL}
+        previous = self._running.get(name)
+        if previous is not None and not previous[0].done():
+            entry.update(ok=False, error=f"previous probe still running after {time.monotonic() - previous[1]:.0f}s")
+            return name, entry
+        future = self._executor.submit(probe)
+        self._running[name] = (future, time.monotonic())
+        try:
+            detail = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+            if detail is not None:
+                entry["detail"] = detail
+        except asyncio.TimeoutError:
+            entry.update(ok=False, error=f"timed out after {self.timeout}s")
+        except Exception as e:
+            entry.update(ok=False, error=str(e)[:200])
+        entry["latency_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return name, entry
+
+    async def _check(self):
+        results = dict(await asyncio.gather(*(self._probe(n, p) for n, p in self.probes.items())))
+        ready = all(r["ok"] for r in results.values() if r["required"])
+        self._result = {"ready": ready, "checked_at": time.time(), "probes": results}
+        self._checked_at = time.monotonic()
+        return self._result
+
+    async def check(self) -> dict:
+        if self._result is not None and time.monotonic() - self._checked_at < self.ttl:
+            return self._result
+        if self._inflight is None:
+            self._inflight = asyncio.ensure_future(self._check())
+            self._inflight.add_done_callback(lambda _: setattr(self, "_inflight", None))
+        return await asyncio.shield(self._inflight)
@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+# Serialized project/milestone views. Entries expire after the exchange-rate
+# cache window so NGN figures never lag the rate by more than one refresh.
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "300"))
+
+
+class CachedResponse:
+    __slots__ = ("body", "etag", "tags", "expires_at")
+
+    def __init__(self, body: bytes, tags, ttl: float):
+        self.body = body
+        self.etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        self.tags = frozenset(tags)
+        self.expires_at = time.monotonic() + ttl
+
+
+class ResponseCache:
+    """Thread-safe LRU of serialized JSON bodies, invalidated by tag"""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE, ttl: float = RESPONSE_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped on every invalidation so a build that raced a write is not stored
+        self.generation = 0
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, body: bytes, tags, generation: int):
+        entry = CachedResponse(body, tags, self.ttl)
+        with self._lock:
+            if generation != self.generation:
+                return entry
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, *tags: str):
+        tags = set(tags)
+        with self._lock:
+            self.generation += 1
+            stale = [k for k, e in self._entries.items() if e.tags & tags]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+
+response_cache = ResponseCache()
+
+
+def project_tags(project_id: int):
+    """Tags touched by any write to a project or its milestones"""
+    return ("projects", f"project:{project_id}")
+
+
+def invalidate_project(project_id: int):
+    response_cache.invalidate(*project_tags(project_id))
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [c.strip() for c in header.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def cached_json_response(request: Request, key: str, build) -> Response:
+    """
+    Serve `key` from the cache, calling `build()` (which may hit the DB) only on a miss.
+    `build` returns (payload, tags); a matching If-None-Match short-circuits to 304.
+    """
+    entry = response_cache.get(key)
+    if entry is None:
+        generation = response_cache.generation
+        payload, tags = build()
+        body = json.dumps(jsonable_encoder(payload), separators=(",", ":")).encode()
+        entry = response_cache.put(key, body, tags, generation)
+
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
@@ -0,0 +1,203 @@
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+
+from cid import CidBuilder
+
+RESUMABLE_UPLOAD_DIR = os.getenv(
+    "RESUMABLE_UPLOAD_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "uploads_partial")
+)
+RESUMABLE_MAX_SIZE = int(os.getenv("RESUMABLE_MAX_SIZE", str(2 * 1024 ** 3)))  # 2 GiB
+RESUMABLE_CHUNK_SIZE = int(os.getenv("RESUMABLE_CHUNK_SIZE", str(8 * 1024 ** 2)))  # suggested to clients
+RESUMABLE_UPLOAD_TTL = int(os.getenv("RESUMABLE_UPLOAD_TTL", str(24 * 3600)))  # abandoned uploads are purged
+
+UPLOAD_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+class UploadError(Exception):
+    """Carries the HTTP status the endpoint should answer with"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def parse_checksum(header: str) -> bytes:
+    """`Upload-Checksum: sha256 <base64 digest>` (the tus checksum extension format)"""
+    try:
+        algorithm, encoded = header.split(" ", 1)
+        digest = base64.b64decode(encoded.strip(), validate=True)
+    except Exception:
+        raise UploadError(400, "Upload-Checksum must be 'sha256 <base64 digest>'")
+    if algorithm.lower() != "sha256" or len(digest) != 32:
+        raise UploadError(400, "Only sha256 chunk checksums are supported")
+    return digest
+
+
+class ResumableUploads:
+    """
+    tus-style resumable uploads kept on local disk.
+
+    Each upload is `<id>.part` (the bytes) plus `<id>.json` (length and verified
+    offset). A chunk only advances the offset once its checksum matches; a failed
+    or interrupted chunk is truncated away, so a client resumes from the last
+    verified byte and never resends anything the server already has.
+
+    The IPFS CID is computed as chunks arrive: the builder state is saved with the
+    offset, and only the partial CID chunk at the tail is re-read on the next PATCH.
+    """
+
+    def __init__(self, directory: str = RESUMABLE_UPLOAD_DIR):
+        self.directory = directory
+        self._locks = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, upload_id: str):
+        if not UPLOAD_ID_RE.match(upload_id):
+            raise UploadError(404, "Upload not found")
+        base = os.path.join(self.directory, upload_id)
+        return base + ".part", base + ".json"
+
+    def _read_meta(self, upload_id: str) -> dict:
+        _, meta_path = self._paths(upload_id)
+        try:
+            with open(meta_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise UploadError(404, "Upload not found")
+
+    def _write_meta(self, meta: dict):
+        _, meta_path = self._paths(meta["id"])
+        tmp_path = meta_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)  # atomic: a crash never leaves half-written metadata
+
+    def _lock(self, upload_id: str) -> asyncio.Lock:
+        lock = self._locks.get(upload_id)
+        if lock is None:
+            lock = self._locks[upload_id] = asyncio.Lock()
+        return lock
+
+    def create(self, filename: str, length: int, sha256: str = None) -> dict:
+        if length <= 0 or length > RESUMABLE_MAX_SIZE:
+            raise UploadError(413, f"Upload length must be between 1 and {RESUMABLE_MAX_SIZE} bytes")
+        self.purge_expired()
+        meta = {
+            "id": uuid.uuid4().hex,
+            "filename": os.path.basename(filename),
+            "length": length,
+            "offset": 0,
+            "sha256": sha256.lower() if sha256 else None,
+            "created_at": time.time(),
+            "cid_state": CidBuilder().state(),
+        }
+        part_path, _ = self._paths(meta["id"])
+        open(part_path, "wb").close()
+        self._write_meta(meta)
+        return meta
+
+    def status(self, upload_id: str) -> dict:
+        return self._read_meta(upload_id)
+
+    async def append(self, upload_id: str, offset: int, checksum: bytes, chunks) -> dict:
+        """Write an async iterable of bytes at `offset`. Returns the updated metadata."""
+        async with self._lock(upload_id):
+            meta = self._read_meta(upload_id)
+            if offset != meta["offset"]:
+                raise UploadError(409, f"Upload-Offset {offset} does not match server offset {meta['offset']}")
+
+            part_path, _ = self._paths(upload_id)
+            digest = hashlib.sha256()
+            written = 0
+            with open(part_path, "r+b") as f:
+                # Drop any unverified tail left by an interrupted chunk
+                await asyncio.to_thread(f.truncate, offset)
+                builder = await asyncio.to_thread(self._restore_cid, meta, f)
+                f.seek(offset)
+                try:
+                    async for chunk in chunks:
+                        written += len(chunk)
+                        if offset + written > meta["length"]:
+                            raise UploadError(413, "Chunk runs past the declared upload length")
+                        digest.update(chunk)
+                        builder.update(chunk)
+                        await asyncio.to_thread(f.write, chunk)
+                    if digest.digest() != checksum:
+                        raise UploadError(460, "Chunk checksum mismatch")  # tus: 460 Checksum Mismatch
+                    await asyncio.to_thread(os.fsync, f.fileno())
+                except BaseException:
+                    f.truncate(offset)
+                    raise
+
+            meta["offset"] = offset + written
+            meta["cid_state"] = builder.state()
+            self._write_meta(meta)
+            return meta
+
+    @staticmethod
+    def _restore_cid(meta: dict, f) -> CidBuilder:
+        """Blocking: rebuild the CID builder, re-reading at most one partial CID chunk"""
+        state = meta.get("cid_state") or CidBuilder().state()
+        f.seek(state["size"])
+        return CidBuilder.restore(state, f.read(meta["offset"] - state["size"]))
+
+    async def finalize(self, upload_id: str, store):
+        """
+        Hand a complete upload to `store(path, filename, cid)`, an async callable that
+        takes ownership of the file and returns its storage key. Returns (key, cid).
+        """
+        async with self._lock(upload_id):
+            meta = self._read_meta(upload_id)
+            if meta["offset"] != meta["length"]:
+                raise UploadError(409, f"Upload incomplete: {meta['offset']} of {meta['length']} bytes")
+
+            part_path, meta_path = self._paths(upload_id)
+            if meta["sha256"]:
+                actual = await asyncio.to_thread(file_sha256, part_path)
+                if actual != meta["sha256"]:
+                    raise UploadError(460, "Assembled file does not match the declared sha256")
+
+            with open(part_path, "rb") as f:
+                cid = (await asyncio.to_thread(self._restore_cid, meta, f)).finish()
+            key = await store(part_path, meta["filename"], cid)
+            os.remove(meta_path)
+        self._locks.pop(upload_id, None)
+        return key, cid
+
+    def abort(self, upload_id: str):
+        part_path, meta_path = self._paths(upload_id)
+        self._read_meta(upload_id)
+        for path in (part_path, meta_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self._locks.pop(upload_id, None)
+
+    def purge_expired(self):
+        cutoff = time.time() - RESUMABLE_UPLOAD_TTL
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".json") and entry.stat().st_mtime < cutoff:
+                upload_id = entry.name[:-5]
+                if not self._lock(upload_id).locked():
+                    try:
+                        self.abort(upload_id)
+                    except UploadError:
+                        pass
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+resumable_uploads = ResumableUploads()
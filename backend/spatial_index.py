@@ -0,0 +1,266 @@
+import asyncio
+import logging
+import math
+import os
+import threading
+
+import numpy as np
+
+from database import SessionLocal, Project
+
+logger = logging.getLogger(__name__)
+
+SPATIAL_CELL_DEG = float(os.getenv("SPATIAL_CELL_DEG", "0.1"))  # ~11 km cells at the equator
+SPATIAL_INDEX_REFRESH = int(os.getenv("SPATIAL_INDEX_REFRESH", "300"))  # picks up writes made by other workers
+# report only attaches the geofence result; enforce rejects footage recorded off site; off skips the check
+GEOFENCE_MODE = os.getenv("GEOFENCE_MODE", "report").lower()
+DEFAULT_TOLERANCE_KM = 1.0
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEG_LAT = 111.32
+MAP_CLUSTER_MAX_ZOOM = int(os.getenv("MAP_CLUSTER_MAX_ZOOM", "16"))  # deeper zooms reuse this level
+MAP_CLUSTER_CELL_SHIFT = 2  # 4x4 cells per 256px map tile, i.e. 64px clusters
+MERCATOR_MAX_LAT = 85.05112878
+
+
+def haversine_km(lat, lon, lats, lons):
+    """Great-circle distance from one point to arrays of points; within ~0.5% of geodesic"""
+    lat1, lon1 = np.radians(lat), np.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def mercator_xy(lat: float, lon: float):
+    """Web Mercator position scaled to [0, 1), as used by map tiles"""
+    lat = max(-MERCATOR_MAX_LAT, min(MERCATOR_MAX_LAT, lat))
+    x = ((lon + 180.0) / 360.0) % 1.0
+    y = (1.0 - math.log(math.tan(math.radians(lat)) + 1 / math.cos(math.radians(lat))) / math.pi) / 2
+    return x, min(max(y, 0.0), 1.0 - 1e-12)
+
+
+class ClusterPyramid:
+    """
+    Per-zoom grid aggregates of project sites for the dashboard map.
+
+    Every zoom level from 0 to MAP_CLUSTER_MAX_ZOOM keeps, per 64px map cell,
+    the site count, budget sum, coordinate sums (for the centroid) and the sum
+    of project ids, which is the project id itself when a cell holds one site.
+    A write touches one cell per level, and a map query only reads the cells
+    inside the viewport, so responses stay a few hundred clusters at most
+    whatever the number of projects. Not thread-safe; ProjectLocationIndex
+    guards it with its lock.
+    """
+
+    def __init__(self, max_zoom: int = MAP_CLUSTER_MAX_ZOOM):
+        self.max_zoom = max_zoom
+        self.levels = [{} for _ in range(max_zoom + 1)]  # (x, y) -> [count, budget, lat_sum, lon_sum, id_sum]
+
+    def _cell(self, lat: float, lon: float):
+        """Cell at max_zoom; lower levels drop low bits"""
+        n = 1 << (self.max_zoom + MAP_CLUSTER_CELL_SHIFT)
+        x, y = mercator_xy(lat, lon)
+        return int(x * n), int(y * n)
+
+    def _apply(self, project_id: int, lat: float, lon: float, budget: float, sign: int):
+        x, y = self._cell(lat, lon)
+        for zoom in range(self.max_zoom, -1, -1):
+            shift = self.max_zoom - zoom
+            key = (x >> shift, y >> shift)
+            level = self.levels[zoom]
+            agg = level.get(key)
+            if agg is None:
+                agg = level[key] = [0, 0.0, 0.0, 0.0, 0]
+            agg[0] += sign
+            agg[1] += sign * budget
+            agg[2] += sign * lat
+            agg[3] += sign * lon
+            agg[4] += sign * project_id
+            if agg[0] <= 0:
+                del level[key]
+
+    def add(self, project_id: int, lat: float, lon: float, budget: float):
+        self._apply(project_id, lat, lon, budget, 1)
+
+    def discard(self, project_id: int, lat: float, lon: float, budget: float):
+        self._apply(project_id, lat, lon, budget, -1)
+
+    def query(self, zoom: int, west: float, south: float, east: float, north: float) -> list:
+        """[(cell_key, aggregate)] for cells overlapping the box; west > east crosses the antimeridian"""
+        zoom = max(0, min(zoom, self.max_zoom))
+        level = self.levels[zoom]
+        n = 1 << (zoom + MAP_CLUSTER_CELL_SHIFT)
+        x0, y0 = mercator_xy(north, west)
+        x1, y1 = mercator_xy(south, east)
+        if east - west >= 360:
+            x0, x1 = 0.0, 1.0 - 1e-12
+        cx0, cx1, cy0, cy1 = int(x0 * n), int(x1 * n), int(y0 * n), int(y1 * n)
+        x_ranges = [(cx0, cx1)] if cx0 <= cx1 else [(cx0, n - 1), (0, cx1)]
+        cells = sum(hi - lo + 1 for lo, hi in x_ranges) * (cy1 - cy0 + 1)
+        if cells > len(level):
+            return [
+                (key, agg) for key, agg in level.items()
+                if cy0 <= key[1] <= cy1 and any(lo <= key[0] <= hi for lo, hi in x_ranges)
+            ]
+        found = []
+        for lo, hi in x_ranges:
+            for cx in range(lo, hi + 1):
+                for cy in range(cy0, cy1 + 1):
+                    agg = level.get((cx, cy))
+                    if agg is not None:
+                        found.append(((cx, cy), agg))
+        return found
+
+
+class ProjectLocationIndex:
+    """
+    In-memory grid over project sites for radius and geofence lookups.
+
+    Sites are bucketed into SPATIAL_CELL_DEG cells; a query only measures the
+    sites in cells overlapping its bounding box, so lookups stay sub-millisecond
+    with tens of thousands of sites. Radii covering more cells than there are
+    sites fall back to one vectorized pass over every site.
+
+    Writes through this process update the index (and its map cluster pyramid)
+    directly; a periodic reload picks up writes made by other workers.
+    """
+
+    def __init__(self, cell_deg: float = SPATIAL_CELL_DEG):
+        self.cell_deg = cell_deg
+        self.lon_cells = int(round(360 / cell_deg))
+        self._lock = threading.Lock()
+        self._sites = {}  # project_id -> (lat, lon, tolerance_km, name, budget)
+        self._cells = {}  # (lat_cell, lon_cell) -> set of project ids
+        self._max_tolerance = 0.0  # only grows between reloads; a stale value just widens geofence searches
+        self._clusters = ClusterPyramid()
+        self._task = None
+
+    def __len__(self):
+        return len(self._sites)
+
+    def _cell(self, lat: float, lon: float):
+        return math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg) % self.lon_cells
+
+    def _add(self, project_id: int, site):
+        self._sites[project_id] = site
+        self._max_tolerance = max(self._max_tolerance, site[2])
+        self._cells.setdefault(self._cell(site[0], site[1]), set()).add(project_id)
+        self._clusters.add(project_id, site[0], site[1], site[4])
+
+    def _discard(self, project_id: int):
+        site = self._sites.pop(project_id, None)
+        if site is None:
+            return
+        self._clusters.discard(project_id, site[0], site[1], site[4])
+        cell = self._cell(site[0], site[1])
+        members = self._cells.get(cell)
+        if members is not None:
+            members.discard(project_id)
+            if not members:
+                del self._cells[cell]
+
+    def upsert(self, project_id: int, lat, lon, tolerance_km=None, name: str = None, budget=None):
+        with self._lock:
+            self._discard(project_id)
+            if lat is not None and lon is not None:
+                self._add(project_id, (
+                    float(lat), float(lon), float(tolerance_km or DEFAULT_TOLERANCE_KM), name, float(budget or 0.0)
+                ))
+
+    def remove(self, project_id: int):
+        with self._lock:
+            self._discard(project_id)
+
+    def load(self):
+        """Blocking: rebuild from the projects table"""
+        db = SessionLocal()
+        try:
+            rows = db.query(
+                Project.id, Project.name, Project.project_latitude,
+                Project.project_longitude, Project.location_tolerance_km, Project.total_budget
+            ).filter(Project.project_latitude.isnot(None), Project.project_longitude.isnot(None)).all()
+        finally:
+            db.close()
+        fresh = ProjectLocationIndex(self.cell_deg)
+        for row in rows:
+            fresh._add(row.id, (row.project_latitude, row.project_longitude,
+                                row.location_tolerance_km or DEFAULT_TOLERANCE_KM, row.name, row.total_budget or 0.0))
+        with self._lock:
+            self._sites, self._cells, self._max_tolerance = fresh._sites, fresh._cells, fresh._max_tolerance
+            self._clusters = fresh._clusters
+        logger.debug("Spatial index loaded with %s project sites", len(rows))
+
+    def _candidates(self, lat: float, lon: float, radius_km: float):
+        lat_span = radius_km / KM_PER_DEG_LAT
+        cos_lat = math.cos(math.radians(min(89.0, abs(lat) + lat_span)))
+        lon_span = min(180.0, radius_km / (KM_PER_DEG_LAT * max(cos_lat, 1e-6)))
+        lat_lo, lat_hi = math.floor((lat - lat_span) / self.cell_deg), math.floor((lat + lat_span) / self.cell_deg)
+        lon_lo, lon_hi = math.floor((lon - lon_span) / self.cell_deg), math.floor((lon + lon_span) / self.cell_deg)
+        lon_count = min(self.lon_cells, lon_hi - lon_lo + 1)
+        if (lat_hi - lat_lo + 1) * lon_count > len(self._sites):
+            return list(self._sites)
+        ids = []
+        for lat_cell in range(lat_lo, lat_hi + 1):
+            for lon_cell in range(lon_lo, lon_lo + lon_count):
+                members = self._cells.get((lat_cell, lon_cell % self.lon_cells))
+                if members:
+                    ids.extend(members)
+        return ids
+
+    def near(self, lat: float, lon: float, radius_km: float, limit: int = 50) -> list:
+        """Sites within radius_km, nearest first: [(project_id, distance_km, site)]"""
+        with self._lock:
+            ids = self._candidates(lat, lon, radius_km)
+            sites = [self._sites[i] for i in ids]
+        if not ids:
+            return []
+        coords = np.array([(s[0], s[1]) for s in sites], dtype=np.float64)
+        distances = haversine_km(lat, lon, coords[:, 0], coords[:, 1])
+        inside = np.flatnonzero(distances <= radius_km)
+        order = inside[np.argsort(distances[inside], kind="stable")][:limit]
+        return [(ids[i], float(distances[i]), sites[i]) for i in order]
+
+    def containing(self, lat: float, lon: float) -> list:
+        """Sites whose geofence (location_tolerance_km) contains the point, nearest first"""
+        return [
+            (project_id, distance, site)
+            for project_id, distance, site in self.near(lat, lon, self._max_tolerance, limit=len(self._sites))
+            if distance <= site[2]
+        ]
+
+    def clusters(self, zoom: int, west: float, south: float, east: float, north: float) -> list:
+        """
+        Map clusters in a bounding box at a zoom level:
+        [(cell_id, count, budget_sum, centroid_lat, centroid_lon, single project id or None, name)]
+        """
+        zoom = max(0, min(zoom, self._clusters.max_zoom))
+        out = []
+        with self._lock:
+            for (cx, cy), (count, budget, lat_sum, lon_sum, id_sum) in self._clusters.query(zoom, west, south, east, north):
+                project_id = id_sum if count == 1 else None
+                name = self._sites[project_id][3] if project_id in self._sites else None
+                out.append((f"{zoom}/{cx}/{cy}", count, budget, lat_sum / count, lon_sum / count, project_id, name))
+        return out
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(SPATIAL_INDEX_REFRESH)
+            try:
+                await asyncio.to_thread(self.load)
+            except Exception as e:
+                logger.warning("Spatial index refresh failed: %s", e)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+project_locations = ProjectLocationIndex()
@@ -0,0 +1,214 @@
+import asyncio
+import gzip
+import os
+import re
+import shutil
+import tempfile
+import uuid
+from urllib.parse import urlsplit
+
+from fastapi import HTTPException
+from fastapi.responses import FileResponse, RedirectResponse
+
+try:
+    import boto3
+    from botocore.exceptions import ClientError
+    BOTO3_AVAILABLE = True
+except ImportError:
+    BOTO3_AVAILABLE = False
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")  # "local" or "s3"
+LOCAL_STORAGE_DIR = os.getenv(
+    "LOCAL_STORAGE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "uploads")
+)
+EVIDENCE_COLD_DIR = os.getenv(
+    "EVIDENCE_COLD_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "cold_storage")
+)
+PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", "http://localhost:8000").rstrip("/")
+S3_BUCKET = os.getenv("S3_BUCKET")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")  # e.g. http://localhost:9000 for MinIO
+S3_REGION = os.getenv("S3_REGION", "us-east-1")
+S3_PRESIGN_TTL = int(os.getenv("S3_PRESIGN_TTL", "900"))
+
+KEY_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]{0,200}$")
+# Paths evidence has been served under; the host is ignored so any deployment URL resolves
+EVIDENCE_PATH_PREFIXES = ("/evidence/", "/static/uploads/")
+# Keys are random and never rewritten, so clients may cache the bytes forever
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+
+
+def new_key(filename: str) -> str:
+    extension = filename.rsplit(".", 1)[-1].lower() if "." in filename else "bin"
+    if not extension.isalnum():
+        extension = "bin"
+    return f"{uuid.uuid4()}.{extension}"
+
+
+def check_key(key: str) -> str:
+    if not KEY_RE.match(key):
+        raise HTTPException(status_code=404, detail="Evidence not found")
+    return key
+
+
+def key_from_url(url: str):
+    """Storage key for a URL this API handed out, or None for external URLs"""
+    path = urlsplit(url).path
+    for prefix in EVIDENCE_PATH_PREFIXES:
+        if path.startswith(prefix):
+            key = path[len(prefix):]
+            return key if KEY_RE.match(key) else None
+    return None
+
+
+def evidence_url(key: str) -> str:
+    return f"{PUBLIC_BASE_URL}/evidence/{key}"
+
+
+class LocalStorage:
+    """
+    Evidence on local disk. Served with Starlette's FileResponse, which answers
+    Range requests and uses the ASGI pathsend extension (zero-copy sendfile) on
+    servers that offer it, falling back to chunked reads elsewhere.
+
+    Files evicted by the lifecycle sweeper live in `cold_directory`, optionally
+    gzipped; they are moved back (rehydrated) the next time they are read.
+    """
+
+    def __init__(self, directory: str = LOCAL_STORAGE_DIR, cold_directory: str = EVIDENCE_COLD_DIR):
+        self.directory = directory
+        self.cold_directory = cold_directory
+        os.makedirs(directory, exist_ok=True)
+        os.makedirs(cold_directory, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, check_key(key))
+
+    def cold_path(self, key: str, compressed: bool = False) -> str:
+        return os.path.join(self.cold_directory, check_key(key) + (".gz" if compressed else ""))
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self.path(key)) or self._cold_file(key) is not None
+
+    def _cold_file(self, key: str):
+        for compressed in (False, True):
+            path = self.cold_path(key, compressed)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def to_cold(self, key: str, compress: bool = False) -> int:
+        """Move a hot file to cold storage. Blocking; returns the bytes freed on the hot disk."""
+        src = self.path(key)
+        size = os.path.getsize(src)
+        if compress:
+            with open(src, "rb") as f_in, gzip.open(self.cold_path(key, True), "wb", compresslevel=6) as f_out:
+                shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+            os.remove(src)
+        else:
+            shutil.move(src, self.cold_path(key))
+        return size
+
+    def rehydrate(self, key: str) -> bool:
+        """Bring a cold file back to the hot directory. Blocking; False if there is no cold copy."""
+        cold = self._cold_file(key)
+        if cold is None:
+            return False
+        if cold.endswith(".gz"):
+            tmp = self.path(key) + ".rehydrating"
+            with gzip.open(cold, "rb") as f_in, open(tmp, "wb") as f_out:
+                shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+            os.replace(tmp, self.path(key))
+            os.remove(cold)
+        else:
+            shutil.move(cold, self.path(key))
+        return True
+
+    async def put_file(self, src_path: str, key: str):
+        """Store a file already on disk; the source is moved, not copied"""
+        await asyncio.to_thread(shutil.move, src_path, self.path(key))
+
+    async def put_stream(self, fileobj, key: str):
+        def copy():
+            with open(self.path(key), "wb") as buffer:
+                shutil.copyfileobj(fileobj, buffer, 1024 * 1024)
+        await asyncio.to_thread(copy)
+
+    async def local_path(self, key: str):
+        """(path, is_temp): local evidence is read in place"""
+        path = self.path(key)
+        if not os.path.exists(path) and not await asyncio.to_thread(self.rehydrate, key):
+            raise HTTPException(status_code=404, detail=f"Video file not found: {key}")
+        return path, False
+
+    async def response(self, key: str):
+        path = self.path(key)
+        if not os.path.exists(path) and not await asyncio.to_thread(self.rehydrate, key):
+            raise HTTPException(status_code=404, detail="Evidence not found")
+        return FileResponse(path, headers={"Cache-Control": IMMUTABLE_CACHE})
+
+    async def delete(self, key: str):
+        for path in (self.path(key), self.cold_path(key), self.cold_path(key, True)):
+            if os.path.exists(path):
+                await asyncio.to_thread(os.remove, path)
+
+
+class S3Storage:
+    """
+    Evidence in an S3-compatible bucket (AWS, MinIO). Clients are redirected to a
+    presigned URL, so Range requests and the bytes themselves never touch the API.
+    """
+
+    def __init__(self, bucket: str = S3_BUCKET):
+        if not BOTO3_AVAILABLE:
+            raise RuntimeError("STORAGE_BACKEND=s3 requires boto3 (pip install boto3)")
+        if not bucket:
+            raise RuntimeError("STORAGE_BACKEND=s3 requires S3_BUCKET")
+        self.bucket = bucket
+        self.client = boto3.client("s3", endpoint_url=S3_ENDPOINT_URL, region_name=S3_REGION)
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=check_key(key))
+            return True
+        except ClientError:
+            return False
+
+    async def put_file(self, src_path: str, key: str):
+        await asyncio.to_thread(self.client.upload_file, src_path, self.bucket, check_key(key))
+        os.remove(src_path)
+
+    async def put_stream(self, fileobj, key: str):
+        await asyncio.to_thread(self.client.upload_fileobj, fileobj, self.bucket, check_key(key))
+
+    async def local_path(self, key: str):
+        """(path, is_temp): downloads to a temp file the caller must delete"""
+        if not await asyncio.to_thread(self.exists, key):
+            raise HTTPException(status_code=404, detail=f"Video file not found: {key}")
+        fd, path = tempfile.mkstemp(suffix=os.path.splitext(key)[1])
+        os.close(fd)
+        await asyncio.to_thread(self.client.download_file, self.bucket, key, path)
+        return path, True
+
+    async def response(self, key: str):
+        url = self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": check_key(key)},
+            ExpiresIn=S3_PRESIGN_TTL,
+        )
+        return RedirectResponse(url, status_code=307)
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self.client.delete_object, Bucket=self.bucket, Key=check_key(key))
+
+
+def create_storage():
+    if STORAGE_BACKEND == "s3":
+        return S3Storage()
+    if STORAGE_BACKEND != "local":
+        raise RuntimeError(f"Unknown STORAGE_BACKEND {STORAGE_BACKEND!r}; use 'local' or 's3'")
+    return LocalStorage()
+
+
+storage = create_storage()
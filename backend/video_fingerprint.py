@@ -0,0 +1,219 @@
+import json
+import logging
+import os
+import shutil
+import subprocess
+import threading
+from collections import defaultdict
+
+import numpy as np
+
+from database import SessionLocal, EvidenceFingerprint
+
+logger = logging.getLogger(__name__)
+
+# enforce rejects near-duplicates before Gemini; report only attaches the matches; off skips fingerprinting
+PHASH_MODE = os.getenv("PHASH_MODE", "report").lower()
+PHASH_ENABLED = PHASH_MODE != "off"
+PHASH_FPS = float(os.getenv("PHASH_FPS", "1"))  # frames sampled per second of video
+PHASH_MAX_FRAMES = int(os.getenv("PHASH_MAX_FRAMES", "60"))
+PHASH_MAX_DISTANCE = int(os.getenv("PHASH_MAX_DISTANCE", "10"))  # bits out of 64 for a frame match
+PHASH_MATCH_RATIO = float(os.getenv("PHASH_MATCH_RATIO", "0.5"))  # share of frames that must match
+
+FRAME_SIZE = 32
+HASH_SIZE = 8
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    m = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    m[0] /= np.sqrt(2)
+    return m
+
+
+DCT = _dct_matrix(FRAME_SIZE)
+BIT_WEIGHTS = 1 << np.arange(HASH_SIZE * HASH_SIZE - 1, -1, -1, dtype=np.uint64)
+
+
+def phash_frames(frames: np.ndarray) -> list:
+    """
+    64-bit pHash of each 32x32 grayscale frame, all frames at once: 2-D DCT,
+    keep the 8x8 low frequencies, one bit per coefficient above the median
+    (the DC term is left out of the median so overall brightness doesn't matter).
+    """
+    coeffs = DCT @ frames.astype(np.float64) @ DCT.T
+    low = coeffs[:, :HASH_SIZE, :HASH_SIZE].reshape(len(frames), -1)
+    medians = np.median(low[:, 1:], axis=1, keepdims=True)
+    bits = (low > medians).astype(np.uint64)
+    return [int(h) for h in (bits * BIT_WEIGHTS).sum(axis=1, dtype=np.uint64)]
+
+
+def sample_frames(video_path: str) -> np.ndarray:
+    """Grayscale 32x32 frames at PHASH_FPS (fewer for long videos), decoded by ffmpeg"""
+    probe = subprocess.run(
+        ["ffprobe", "-v", "quiet", "-print_format", "json", "-show_format", video_path],
+        capture_output=True, text=True, timeout=30
+    )
+    duration = float(json.loads(probe.stdout or "{}").get("format", {}).get("duration", 0) or 0)
+    fps = PHASH_FPS if duration <= 0 else min(PHASH_FPS, PHASH_MAX_FRAMES / duration)
+    result = subprocess.run(
+        ["ffmpeg", "-v", "error", "-i", video_path,
+         "-vf", f"fps={fps},scale={FRAME_SIZE}:{FRAME_SIZE},format=gray",
+         "-frames:v", str(PHASH_MAX_FRAMES), "-f", "rawvideo", "-"],
+        capture_output=True, timeout=120
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {result.stderr.decode(errors='replace')[:200]}")
+    raw = np.frombuffer(result.stdout, dtype=np.uint8)
+    return raw[: len(raw) // (FRAME_SIZE * FRAME_SIZE) * FRAME_SIZE * FRAME_SIZE].reshape(-1, FRAME_SIZE, FRAME_SIZE)
+
+
+def video_phashes(video_path: str) -> list:
+    frames = sample_frames(video_path)
+    return phash_frames(frames) if len(frames) else []
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    """Metric tree over Hamming distance; a radius query only visits children within d±r"""
+
+    def __init__(self):
+        self.root = None  # [hash, payloads, {distance: child}]
+        self.size = 0
+
+    def add(self, value: int, payload):
+        self.size += 1
+        if self.root is None:
+            self.root = [value, [payload], {}]
+            return
+        node = self.root
+        while True:
+            d = hamming(value, node[0])
+            if d == 0:
+                node[1].append(payload)
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [value, [payload], {}]
+                return
+            node = child
+
+    def search(self, value: int, radius: int):
+        """Yields (distance, payload) for every stored hash within `radius` bits"""
+        if self.root is None:
+            return
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            d = hamming(value, node[0])
+            if d <= radius:
+                for payload in node[1]:
+                    yield d, payload
+            for child_d, child in node[2].items():
+                if d - radius <= child_d <= d + radius:
+                    stack.append(child)
+
+
+def to_signed64(value: int) -> int:
+    """Postgres BIGINT is signed"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def to_unsigned64(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+
+class FingerprintIndex:
+    """
+    Frame pHashes of every verified-against video, persisted in
+    `evidence_fingerprints` and held in a BK-tree for millisecond lookups.
+
+    A video is a near-duplicate of earlier evidence when at least
+    PHASH_MATCH_RATIO of its sampled frames are within PHASH_MAX_DISTANCE bits of
+    frames from that evidence, which survives re-encoding, rescaling and trimming.
+    """
+
+    def __init__(self):
+        self._tree = BKTree()
+        self._lock = threading.Lock()
+        self._owners = {}  # evidence_ref -> (project_id, milestone_index)
+
+    def __len__(self):
+        return len(self._owners)
+
+    def load(self):
+        db = SessionLocal()
+        try:
+            rows = db.query(
+                EvidenceFingerprint.evidence_ref, EvidenceFingerprint.project_id,
+                EvidenceFingerprint.milestone_index, EvidenceFingerprint.phash
+            ).yield_per(5000)
+            tree, owners = BKTree(), {}
+            for row in rows:
+                tree.add(to_unsigned64(row.phash), row.evidence_ref)
+                owners[row.evidence_ref] = (row.project_id, row.milestone_index)
+        finally:
+            db.close()
+        with self._lock:
+            self._tree, self._owners = tree, owners
+        logger.info("Loaded fingerprints for %s evidence videos", len(owners))
+
+    def find_duplicates(self, hashes: list, evidence_ref: str, project_id: int, milestone_index: int) -> list:
+        """Earlier evidence this video nearly duplicates, excluding resubmissions for the same milestone"""
+        if not hashes:
+            return []
+        matched = defaultdict(set)
+        with self._lock:
+            for i, h in enumerate(hashes):
+                for _, ref in self._tree.search(h, PHASH_MAX_DISTANCE):
+                    if ref != evidence_ref and self._owners.get(ref) != (project_id, milestone_index):
+                        matched[ref].add(i)
+            owners = dict(self._owners)
+        duplicates = []
+        for ref, frames in matched.items():
+            ratio = len(frames) / len(hashes)
+            if ratio >= PHASH_MATCH_RATIO:
+                owner_project, owner_milestone = owners[ref]
+                duplicates.append({
+                    "evidence_ref": ref,
+                    "project_id": owner_project,
+                    "milestone_index": owner_milestone,
+                    "matched_frames": round(ratio, 2),
+                })
+        return sorted(duplicates, key=lambda d: -d["matched_frames"])
+
+    def add(self, hashes: list, evidence_ref: str, project_id: int, milestone_index: int):
+        """Blocking: persist and index a video's frame hashes (once per evidence_ref)"""
+        if not hashes or evidence_ref in self._owners:
+            return
+        db = SessionLocal()
+        try:
+            db.add_all(
+                EvidenceFingerprint(
+                    evidence_ref=evidence_ref, project_id=project_id, milestone_index=milestone_index,
+                    frame_index=i, phash=to_signed64(h)
+                )
+                for i, h in enumerate(hashes)
+            )
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning("Could not persist fingerprints for %s: %s", evidence_ref, e)
+            return
+        finally:
+            db.close()
+        with self._lock:
+            for h in hashes:
+                self._tree.add(h, evidence_ref)
+            self._owners[evidence_ref] = (project_id, milestone_index)
+
+
+def ffmpeg_available() -> bool:
+    return shutil.which("ffmpeg") is not None and shutil.which("ffprobe") is not None
+
+
+fingerprint_index = FingerprintIndex()
@@ -8,6 +8,23 @@ import { TransactionNotification } from '@/components/ui/TransactionNotification
 import { useWallet } from '@/hooks/useWallet';
 import { aiService } from '@/services/aiService';
 
+// Share of the progress bar reached when the backend reports each verification stage
+const STAGE_PROGRESS: Record<string, number> = {
+  started: 22,
+  evidence_received: 28,
+  fingerprint_checked: 34,
+  geofence_checked: 36,
+  gemini_uploading: 38,
+  gemini_uploaded: 50,
+  gemini_processing: 55,
+  gemini_ready: 62,
+  model_requested: 66,
+  model_answered: 82,
+  verdict: 86,
+  payout_broadcast: 90,
+  payout_confirmed: 98,
+};
+
 export const MilestoneSubmission = () => {
   const { milestoneId } = useParams();
   const navigate = useNavigate();
@@ -94,19 +111,17 @@ export const MilestoneSubmission = () => {
         setUploadProgress(progress);
       });
   
-      // 2. AI Processing Phase (Fake 60% -> 95%)
-      const processingInterval = setInterval(() => {
-        setUploadProgress(prev => (prev < 95 ? prev + 1 : prev));
-      }, 800);
-  
-      const result = await aiService.verifyMilestone({
+      // 2. AI Processing Phase, driven by the backend's stage events
+      const result = await aiService.verifyMilestoneStreaming({
         video_url: videoUrl,
         milestone_criteria: milestone.description,
         project_id: Number(project.id),      // Ensure this is a number
         milestone_index: Number(milestone.order_index), // Ensure this is a number
+      }, (event) => {
+        const target = STAGE_PROGRESS[event.stage];
+        if (target) setUploadProgress(prev => Math.max(prev, target));
       });
   
-      clearInterval(processingInterval);
       setUploadProgress(100);
       setVerificationResult(result);
     
@@ -22,6 +22,33 @@ export interface AIAnalysisRequest {
   milestone_index: number; // Backend uses this for ordering/payouts
 }
 
+/**
+ * One server-sent event from /verifications/{id}/events
+ */
+export interface VerificationEvent {
+  stage: string;
+  at: number;
+  [detail: string]: unknown;
+}
+
+// Stages the backend emits, in order; "completed" and "failed" end the stream
+export const VERIFICATION_STAGES = [
+  "started",
+  "evidence_received",
+  "fingerprint_checked",
+  "geofence_checked",
+  "gemini_uploading",
+  "gemini_uploaded",
+  "gemini_processing",
+  "gemini_ready",
+  "model_requested",
+  "model_answered",
+  "verdict",
+  "payout_broadcast",
+  "payout_confirmed",
+  "payout_reverted",
+] as const;
+
 export interface MilestoneGenerateRequest {
   project_description: string;
   total_budget: number;
@@ -85,6 +112,49 @@ class AIService {
     return await response.json();
   }
 
+  /**
+   * Starts a background verification and follows its progress over SSE, so no
+   * request is held open while Gemini and the payout run
+   */
+  async verifyMilestoneStreaming(
+    request: AIAnalysisRequest,
+    onEvent: (event: VerificationEvent) => void
+  ): Promise<VerificationResult> {
+    const response = await fetch(`${this.baseUrl}/verifications`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify(request),
+    });
+
+    if (!response.ok) {
+      const errorData = await response.json();
+      throw new Error(errorData.detail || "AI Oracle verification failed");
+    }
+
+    const { events_url } = await response.json();
+
+    return new Promise((resolve, reject) => {
+      // EventSource reconnects by itself and resumes with Last-Event-ID
+      const source = new EventSource(`${this.baseUrl}${events_url}`);
+      const parse = (e: Event) => JSON.parse((e as MessageEvent).data) as VerificationEvent;
+
+      VERIFICATION_STAGES.forEach((stage) => source.addEventListener(stage, (e) => onEvent(parse(e))));
+      source.addEventListener("completed", (e) => {
+        source.close();
+        resolve(parse(e).result as VerificationResult);
+      });
+      source.addEventListener("failed", (e) => {
+        source.close();
+        reject(new Error(String(parse(e).error || "AI Oracle verification failed")));
+      });
+      source.onerror = () => {
+        if (source.readyState === EventSource.CLOSED) {
+          reject(new Error("Lost connection to the AI Oracle"));
+        }
+      };
+    });
+  }
+
   async generateMilestones(request: MilestoneGenerateRequest): Promise<MilestoneGenerateResponse> {
     try {
       const response = await fetch(`${this.baseUrl}/generate-milestones`, {
@@ -9,6 +9,14 @@ export interface CurrencyConversion {
   timestamp: string;
 }
 
+export type ConversionDirection = 'MNT_TO_NGN' | 'NGN_TO_MNT';
+
+export interface BatchConversion {
+  converted: number[];
+  exchange_rate: number;
+  rate_timestamp: string | null;
+}
+
 export interface ExchangeRate {
   mnt_to_ngn: number;
   ngn_to_mnt: number;
@@ -106,6 +114,39 @@ class CurrencyService {
     return amount * rate.mnt_to_ngn;
   }
 
+  /**
+   * Convert many amounts in one round-trip against a single rate snapshot
+   * Maps to POST /convert/batch. `directions` may hold one entry for every amount.
+   */
+  async convertBatch(amounts: number[], directions: ConversionDirection[]): Promise<BatchConversion> {
+    if (amounts.length === 0) {
+      return { converted: [], exchange_rate: 0, rate_timestamp: null };
+    }
+    try {
+      const response = await fetch(`${API_BASE_URL}/convert/batch`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ amounts, directions })
+      });
+      if (response.ok) {
+        return await response.json();
+      }
+    } catch (e) {
+      console.warn('Backend batch conversion failed, calculating locally');
+    }
+    // Local fallback logic
+    const rate = await this.getExchangeRate();
+    return {
+      converted: amounts.map((amount, i) =>
+        (directions[directions.length === 1 ? 0 : i] === 'MNT_TO_NGN')
+          ? amount * rate.mnt_to_ngn
+          : amount * rate.ngn_to_mnt
+      ),
+      exchange_rate: rate.mnt_to_ngn,
+      rate_timestamp: rate.timestamp
+    };
+  }
+
   async quickConvertNgnToSui(amount: number): Promise<number> {
     return this.quickConvertNgnToMnt(amount);
   }
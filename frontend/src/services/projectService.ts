@@ -4,6 +4,7 @@ const API_BASE_URL =
 import type {
   Project,
   ProjectsResponse,
+  ProjectClustersResponse,
   ProjectCreateRequest,
 } from "@/types/project";
 
@@ -26,6 +27,22 @@ class ProjectService {
     }
   }
 
+  // Map markers for the visible area; payload size depends on the viewport, not the project count
+  async getProjectClusters(
+    bounds: { west: number; south: number; east: number; north: number },
+    zoom: number
+  ): Promise<ProjectClustersResponse> {
+    const bbox = [bounds.west, bounds.south, bounds.east, bounds.north]
+      .map((v) => v.toFixed(5))
+      .join(",");
+    const response = await fetch(
+      `${API_BASE_URL}/projects/clusters?bbox=${bbox}&zoom=${Math.round(zoom)}`
+    );
+    if (!response.ok)
+      throw new Error(`HTTP ${response.status}: Failed to fetch project clusters`);
+    return response.json();
+  }
+
   async getProject(projectId: number): Promise<Project> {
     if (!projectId || isNaN(projectId) || projectId <= 0) {
       throw new Error(`Invalid project ID: ${projectId}`);
@@ -47,6 +47,24 @@ export interface ProjectsResponse {
   exchange_rate: number;
 }
 
+export interface ProjectCluster {
+  id: string; // zoom/x/y map cell
+  count: number;
+  latitude: number;
+  longitude: number;
+  budget_mnt: number;
+  budget_ngn: number;
+  project_id: number | null; // set when the cell holds a single project
+  name: string | null;
+}
+
+export interface ProjectClustersResponse {
+  zoom: number;
+  clusters: ProjectCluster[];
+  total: number;
+  exchange_rate: number;
+}
+
 export interface ProjectCreateRequest {
   name: string;
   description: string;